@@ -1,21 +1,1672 @@
+import os
 import sys
+import gzip
+import json
+import math
+import random
+import time
+import shutil
+import hashlib
 import sqlite3
+import smtplib
+import argparse
+import tempfile
+import uuid
+import threading
+import multiprocessing
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, BrokenExecutor, as_completed, wait
 from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+try:
+    import numpy as np
+except ImportError:
+    # Reports fall back to SQL aggregates
+    np = None
  
 
 
-from PyQt5.QtCore import (Qt, QPropertyAnimation, QEasingCurve, QParallelAnimationGroup, 
-                         QDate, QTimer, QRect, QSize, QPoint)
-from PyQt5.QtGui import (QColor, QLinearGradient, QPainter, QFont, QIcon, 
-                         QPixmap, QBrush, QPalette)
+from PyQt5.QtCore import (Qt, QPropertyAnimation, QEasingCurve, QParallelAnimationGroup, 
+                         QDate, QTimer, QRect, QSize, QPoint, QStringListModel, QObject, QEvent)
+from PyQt5.QtGui import (QColor, QLinearGradient, QPainter, QFont, QIcon, 
+                         QPixmap, QBrush, QPalette, QDoubleValidator)
+
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
+    QLabel, QPushButton, QStackedWidget, QLineEdit, QComboBox, 
+    QDateEdit, QTableWidget, QTableWidgetItem, QHeaderView, 
+    QScrollArea, QFrame, QMessageBox, QSizePolicy, QSpacerItem,
+    QGraphicsDropShadowEffect, QToolButton, QTabWidget, QDialog,QTabWidget,  QFormLayout, QDialog,
+    QCheckBox, QSpinBox, QProgressDialog, QCompleter
+)
+
+
+DATABASE_PATH = "gym_management.db"
+
+# Several workstations share the database file. A writer waits up to the busy
+# timeout for another workstation's lock, and a write transaction that still
+# can't start is retried with jittered backoff so waiting desks don't collide.
+BUSY_TIMEOUT_SECONDS = 2
+WRITE_RETRIES = 4
+WRITE_RETRY_DELAY_SECONDS = 0.05
+
+# Rows fetched per page for the members, attendance and payments tables
+PAGE_SIZE = 100
+
+PAYMENT_METHODS = ["Cash", "Credit Card", "Debit Card", "Bank Transfer", "Other"]
+
+# Plans written to a fresh database; after that membership_plans is the source
+DEFAULT_MEMBERSHIP_PLANS = [("Basic", 1, 30.0), ("Standard", 3, 80.0), ("Premium", 12, 250.0)]
+
+# Members billed per transaction by the billing run; each chunk commits
+# together with its checkpoint so an interrupted run resumes where it stopped
+BILLING_CHUNK_SIZE = 5000
+
+# Set-based renewal: every targeted member's expiry moves forward by their
+# plan's duration, counting from today if the membership has already lapsed.
+# Members on a plan that no longer exists are left alone.
+RENEWAL_SQL = """
+UPDATE members SET
+    expiry_date = date(
+        MAX(COALESCE(expiry_date, ''), :today),
+        '+' || (SELECT p.duration_months FROM membership_plans p
+                WHERE p.name = members.membership_type) || ' months'
+    ),
+    status = 'Active'
+WHERE membership_type IN (SELECT name FROM membership_plans)
+  AND id IN (SELECT id FROM temp.bulk_ids)
+"""
+
+# SQL expressions behind each sortable table column, with the position of
+# each in the fetched row. Clicking a header turns into an ORDER BY on these,
+# and pages seek past the last row's values, so every key needs an index in
+# init_db; member names and durations on the joined lists have none, so
+# those columns don't sort. Keys of more than one expression must be NOT
+# NULL in practice - only single-expression keys page over NULLs.
+SORT_COLUMNS = {
+    "members": {
+        0: (("id", 0),),
+        1: (("name", 1),),
+        2: (("phone", 2),),
+        3: (("membership_type", 3),),
+        4: (("join_date", 4),),
+        5: (("expiry_date", 5),),
+        6: (("status", 6),),
+    },
+    "attendance": {
+        0: (("a.id", 0),),
+        2: (("a.date", 2), ("a.time_in", 3)),
+    },
+    "payments": {
+        0: (("p.id", 0),),
+        2: (("p.amount", 2),),
+        3: (("p.payment_date", 3),),
+        4: (("p.due_date", 4),),
+        5: (("p.status", 5),),
+        6: (("p.payment_method", 6),),
+    },
+}
+
+# Unique column appended to every ORDER BY so paging is deterministic; it is
+# the first column of every fetched row
+SORT_TIEBREAKERS = {
+    "members": "id",
+    "attendance": "a.id",
+    "payments": "p.id",
+}
+
+# Column order of the members table, shared by the cache and its records
+MEMBER_COLUMNS = (
+    "id", "name", "gender", "dob", "phone", "email", "address",
+    "membership_type", "join_date", "expiry_date", "status",
+    "last_visit", "engagement_key", "row_version"
+)
+
+# Member fields edited in the Edit Member dialog, with their labels. Any
+# change to them bumps row_version, which is how edits made at the same time
+# on another workstation are detected.
+MEMBER_EDIT_FIELDS = {
+    "name": "Full Name",
+    "gender": "Gender",
+    "dob": "Date of Birth",
+    "phone": "Phone",
+    "email": "Email",
+    "address": "Address",
+    "membership_type": "Membership Type",
+    "join_date": "Join Date",
+    "expiry_date": "Expiry Date",
+    "status": "Status",
+}
+
+# Engagement is an exponentially decayed visit count: each visit adds 1 and
+# the total halves every ENGAGEMENT_HALF_LIFE_DAYS. It is stored as
+# log2(score) + day / half-life, which does not change as time passes, so
+# ranking and "score below X today" are plain comparisons on an index.
+ENGAGEMENT_HALF_LIFE_DAYS = 30
+AT_RISK_SCORE = 1.0
+
+# Suggestions shown by the member typeahead
+MEMBER_PICKER_LIMIT = 20
+
+# Rows fetched per scroll step in the member details history tabs
+HISTORY_PAGE_SIZE = 50
+
+# Columnar attendance snapshots used by the reports when numpy is installed
+ATTENDANCE_COLUMNS_DIR = "attendance_columns"
+ATTENDANCE_COLUMN_DTYPES = {"id": "int64", "member_id": "int32", "day": "int32", "time_in": "int32", "duration": "int32"}
+ATTENDANCE_MAX_SEGMENTS = 16
+ATTENDANCE_MAX_DROPPED_MEMBERS = 256
+EPOCH_DATE = datetime(1970, 1, 1)
+
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Report worker processes check for Cancel every this many SQLite VM steps,
+# and the progress dialog only appears for reports slower than the delay
+REPORT_PROGRESS_OPCODES = 20000
+REPORT_PROGRESS_DELAY_MS = 400
+
+# Date-range scans longer than two partitions are split across worker
+# processes that read a snapshot of the database; shorter ones run inline
+REPORT_PARTITION_MIN_DAYS = 90
+REPORT_WORKERS = os.cpu_count() or 1
+REPORT_SNAPSHOT_PAGES = 1024
+REPORT_POLL_SECONDS = 0.05
+
+# Named report date ranges, shared by the reports page and the nightly
+# precompute so that their parameters line up
+REPORT_WINDOWS = ["Last Month", "Last 30 Days", "Month to Date", "Quarter to Date"]
+
+# Report datasets computed ahead of time after close, by report type, and
+# the hour after which that happens (-1 = never)
+DEFAULT_PRECOMPUTED_REPORTS = {
+    "Attendance Summary": "Last 30 Days",
+    "Revenue Analysis": "Month to Date",
+    "Member Growth": "Quarter to Date"
+}
+DEFAULT_PRECOMPUTE_HOUR = 22
+REPORT_PRECOMPUTE_CHECK_MS = 10 * 60 * 1000
+
+# Tables each report reads: the row date that places a change in a report
+# range, the columns whose updates matter, and the reports affected. Writes
+# drop the affected precomputed results, except that rows dated on or after
+# a result's watermark are merged in when it is served (see
+# precomputed_report) for the reports that add up day by day.
+REPORT_SOURCES = {
+    "attendance": ("date", "member_id, date, time_in, time_out",
+                   ["Attendance Summary", "Peak Hours", "Retention Cohorts"]),
+    "members": (None, "membership_type, join_date, expiry_date, status",
+                ["Membership Types", "Member Growth", "Retention Cohorts"]),
+    "payments": ("payment_date", "amount, payment_date, payment_method, status", ["Revenue Analysis"]),
+}
+
+# Closed attendance and paid payments older than the cutoff move into one
+# archive database per year, attached at startup and read back through the
+# all_attendance / all_payments views. SQLite attaches at most 10 databases
+# by default, so that is also the number of archived years.
+ARCHIVE_DIR = "archive"
+ARCHIVE_CHUNK_SIZE = 2000
+DEFAULT_ARCHIVE_MONTHS = 24
+HISTORY_TABLES = {
+    "attendance": ("date", "time_out IS NOT NULL", "id, member_id, date, time_in, time_out, auto_closed"),
+    "payments": ("payment_date", "status = 'Paid'", "id, member_id, amount, payment_date, due_date, payment_method, status"),
+}
+
+# Online backups: each set is a directory holding copies of the main and
+# archive databases plus a manifest with their checksums. Copies are made
+# BACKUP_PAGES pages at a time with a pause in between so writers are never
+# held up, and only the newest sets are kept.
+BACKUP_DIR = "backups"
+BACKUP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.01
+DEFAULT_BACKUP_KEEP = 7
+DEFAULT_BACKUP_INTERVAL_HOURS = 24
+BACKUP_CHECK_MS = 30 * 60 * 1000
+
+# Other workstations' writes are found by polling PRAGMA data_version, which
+# only moves when another connection commits. Writes to these tables are
+# logged by per-connection TEMP triggers, tagged with the workstation, so
+# each desk replays just the others' rows as change events.
+CHANGE_LOG_TABLES = ("members", "attendance", "payments")
+CHANGE_POLL_MS = 1000
+CHANGE_LOG_KEEP = 20000
+CHANGE_LOG_PRUNE_POLLS = 600
+
+# How often the auto-checkout job looks for stale open sessions
+AUTO_CHECKOUT_INTERVAL_MS = 15 * 60 * 1000
+
+# Reminder outbox rows handed to one worker at a time, and the pool size
+REMINDER_BATCH_SIZE = 200
+REMINDER_WORKERS = 4
+REMINDER_MAX_ATTEMPTS = 3
+REMINDER_POLL_MS = 500
+
+REMINDER_TEMPLATES = {
+    "expiry": (
+        "Your {gym} membership expires on {ref_date}",
+        "Hi {name},\n\nYour {plan} membership at {gym} expires on {ref_date}. "
+        "Renew at the front desk to keep training without interruption.\n"
+    ),
+    "payment_due": (
+        "Payment due on {ref_date}",
+        "Hi {name},\n\nA payment of ${amount:.2f} for your {plan} membership at {gym} "
+        "is due on {ref_date}.\n"
+    ),
+    "overdue": (
+        "Overdue payment",
+        "Hi {name},\n\nYour payment of ${amount:.2f} to {gym} was due on {ref_date} "
+        "and is now overdue. Please settle it at your next visit.\n"
+    )
+}
+
+
+def format_duration(time_in, time_out):
+    if not time_out:
+        return "In Progress"
+    
+    duration = datetime.strptime(time_out, "%H:%M:%S") - datetime.strptime(time_in, "%H:%M:%S")
+    hours, remainder = divmod(duration.seconds, 3600)
+    minutes, _ = divmod(remainder, 60)
+    return f"{hours}h {minutes}m"
+
+
+def check_no_transaction(conn, action):
+    # Committing here would commit the caller's half-finished work and
+    # leave its rollback with nothing to undo
+    if conn.in_transaction:
+        raise RuntimeError(f"{action} while a transaction is open")
+
+
+@contextmanager
+def write_transaction(conn):
+    # Takes the write lock up front so the statements inside can't hit a
+    # busy error half-way through. Kept short: no dialogs inside, and never
+    # nested.
+    check_no_transaction(conn, "write_transaction")
+    cursor = conn.cursor()
+    
+    for attempt in range(WRITE_RETRIES):
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            break
+        except sqlite3.OperationalError as e:
+            if attempt == WRITE_RETRIES - 1 or not ("locked" in str(e) or "busy" in str(e)):
+                raise
+            time.sleep(WRITE_RETRY_DELAY_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5))
+    
+    try:
+        yield cursor
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+class ChangeBus:
+    # Row-level change notifications. Writers emit (table, action, ids) after
+    # committing, with action one of "insert", "update" or "delete", and
+    # subscribers apply just those rows instead of reloading everything.
+    def __init__(self):
+        self.subscribers = []
+    
+    def subscribe(self, callback, tables=None):
+        self.subscribers.append((tables, callback))
+    
+    def emit(self, table, action, ids):
+        ids = list(ids)
+        for tables, callback in self.subscribers:
+            if tables is None or table in tables:
+                callback(table, action, ids)
+
+
+class MemberRecord:
+    __slots__ = MEMBER_COLUMNS
+    
+    def __init__(self, row):
+        for field, value in zip(MEMBER_COLUMNS, row):
+            setattr(self, field, value)
+
+
+class MemberCache:
+    # Process-wide cache of member rows keyed by id, plus a name index kept
+    # sorted incrementally. Writers invalidate the ids they touched and only
+    # those rows are re-read on the next access.
+    def __init__(self, conn):
+        self.conn = conn
+        self.by_id = {}
+        self.name_index = []  # sorted (casefolded name, id) pairs
+        self.active_index = []  # sorted (casefolded name word, id) pairs, active members only
+        self.status_counts = Counter()
+        self.stale_ids = set()
+        self.loaded = False
+    
+    def load(self):
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT {', '.join(MEMBER_COLUMNS)} FROM members")
+        self.by_id = {row[0]: MemberRecord(row) for row in cursor}
+        self.name_index = sorted((record.name.casefold(), record.id) for record in self.by_id.values())
+        self.active_index = sorted(
+            (word, record.id) for record in self.by_id.values() if record.status == "Active"
+            for word in record.name.casefold().split()
+        )
+        self.status_counts = Counter(record.status for record in self.by_id.values())
+        self.stale_ids.clear()
+        self.loaded = True
+    
+    def on_change(self, table, action, ids):
+        self.invalidate(ids)
+    
+    def invalidate(self, member_ids=None):
+        if member_ids is None:
+            self.loaded = False
+        else:
+            self.stale_ids.update(member_ids)
+    
+    def refresh(self):
+        if not self.loaded:
+            self.load()
+            return
+        
+        if not self.stale_ids:
+            return
+        
+        stale_ids = list(self.stale_ids)
+        self.stale_ids.clear()
+        
+        cursor = self.conn.cursor()
+        rows = {}
+        for i in range(0, len(stale_ids), 500):
+            chunk = stale_ids[i:i + 500]
+            cursor.execute(
+                f"SELECT {', '.join(MEMBER_COLUMNS)} FROM members WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            rows.update((row[0], row) for row in cursor)
+        
+        for member_id in stale_ids:
+            self.remove(member_id)
+            if member_id in rows:
+                self.add(MemberRecord(rows[member_id]))
+    
+    def add(self, record):
+        self.by_id[record.id] = record
+        insort(self.name_index, (record.name.casefold(), record.id))
+        self.status_counts[record.status] += 1
+        if record.status == "Active":
+            for word in record.name.casefold().split():
+                insort(self.active_index, (word, record.id))
+    
+    def remove(self, member_id):
+        record = self.by_id.pop(member_id, None)
+        if record is not None:
+            self.status_counts[record.status] -= 1
+            key = (record.name.casefold(), member_id)
+            index = bisect_left(self.name_index, key)
+            if index < len(self.name_index) and self.name_index[index] == key:
+                del self.name_index[index]
+            
+            if record.status == "Active":
+                for word in record.name.casefold().split():
+                    index = bisect_left(self.active_index, (word, member_id))
+                    if index < len(self.active_index) and self.active_index[index] == (word, member_id):
+                        del self.active_index[index]
+    
+    def counts(self):
+        self.refresh()
+        return self.status_counts
+    
+    def records(self):
+        self.refresh()
+        return list(self.by_id.values())
+    
+    def get(self, member_id):
+        self.refresh()
+        return self.by_id.get(member_id)
+    
+    def find_by_name(self, name):
+        self.refresh()
+        key = name.casefold()
+        index = bisect_left(self.name_index, (key,))
+        matches = []
+        while index < len(self.name_index) and self.name_index[index][0] == key:
+            matches.append(self.by_id[self.name_index[index][1]])
+            index += 1
+        return matches
+    
+    def search_active(self, text, limit):
+        # Active members having a name word that starts with each typed word,
+        # in name order. The longest typed word picks the index range.
+        self.refresh()
+        words = text.casefold().split()
+        if not words:
+            return []
+        
+        probe = max(words, key=len)
+        index = bisect_left(self.active_index, (probe,))
+        candidates = set()
+        while index < len(self.active_index) and self.active_index[index][0].startswith(probe):
+            candidates.add(self.active_index[index][1])
+            index += 1
+        
+        matches = []
+        for member_id in candidates:
+            record = self.by_id[member_id]
+            name_words = record.name.casefold().split()
+            if all(any(name_word.startswith(word) for name_word in name_words) for word in words):
+                matches.append(record)
+        
+        matches.sort(key=lambda record: (record.name.casefold(), record.id))
+        return matches[:limit]
+
+
+class MemberPicker(QLineEdit):
+    # Typeahead over the member cache's active index. Suggestions are
+    # worked out as the user types, so opening a dialog loads nothing.
+    def __init__(self, member_cache, parent=None):
+        super().__init__(parent)
+        self.member_cache = member_cache
+        self.suggestions = {}  # display text -> member id
+        self.setPlaceholderText("Type a member name...")
+        
+        self.model = QStringListModel(self)
+        completer = QCompleter(self.model, self)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setCompleter(completer)
+        
+        self.textEdited.connect(self.update_suggestions)
+    
+    def update_suggestions(self, text):
+        matches = self.member_cache.search_active(text, MEMBER_PICKER_LIMIT)
+        
+        # The id tells apart members who share a name
+        self.suggestions = {f"{record.name} (#{record.id})": record.id for record in matches}
+        self.model.setStringList(list(self.suggestions))
+        if self.suggestions:
+            self.completer().complete()
+    
+    def member_id(self):
+        # The picked suggestion, or the only one left for what was typed
+        if self.text() in self.suggestions:
+            return self.suggestions[self.text()]
+        if len(self.suggestions) == 1:
+            return next(iter(self.suggestions.values()))
+        return None
+
+
+class AttendanceBitmaps:
+    # One bitset per day of which member ids attended, held in memory as
+    # Python ints (bit n = member n). On disk each day is stored in whichever
+    # container is smaller: a sorted uint32 id array for sparse days or the
+    # raw bitmap for dense ones. Unique members over a range is an OR of the
+    # day bitsets plus a popcount.
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.bitmaps = {}
+        self.days = []  # sorted day keys
+        self.loaded = False
+    
+    @staticmethod
+    def encode(bits):
+        bitmap = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        if bin(bits).count("1") * 4 >= len(bitmap):
+            return b"B" + bitmap
+        
+        # Sparse: peel off set bits lowest first
+        ids = array("I")
+        while bits:
+            lowest = bits & -bits
+            ids.append(lowest.bit_length() - 1)
+            bits ^= lowest
+        return b"A" + ids.tobytes()
+    
+    @staticmethod
+    def decode(blob):
+        if blob[:1] == b"A":
+            ids = array("I", blob[1:])
+            bitmap = bytearray((max(ids) >> 3) + 1 if ids else 0)
+            for member_id in ids:
+                bitmap[member_id >> 3] |= 1 << (member_id & 7)
+            return int.from_bytes(bitmap, "little")
+        return int.from_bytes(blob[1:], "little")
+    
+    def load(self):
+        self.cursor.execute("SELECT COUNT(*) FROM attendance_bitmaps")
+        if self.cursor.fetchone()[0] == 0:
+            self.rebuild()
+        
+        self.cursor.execute("SELECT day, members FROM attendance_bitmaps ORDER BY day")
+        self.bitmaps = {day: self.decode(blob) for day, blob in self.cursor.fetchall()}
+        self.days = list(self.bitmaps)
+        self.loaded = True
+    
+    def rebuild(self):
+        # One grouped pass over attendance, read under the write lock so no
+        # check-in lands between the read and the replace
+        with write_transaction(self.conn):
+            bitmaps = {}
+            self.cursor.execute("SELECT DISTINCT date, member_id FROM all_attendance WHERE member_id IS NOT NULL")
+            for day, member_id in self.cursor.fetchall():
+                bitmaps[day] = bitmaps.get(day, 0) | 1 << member_id
+            
+            self.cursor.execute("DELETE FROM attendance_bitmaps")
+            self.cursor.executemany(
+                "INSERT INTO attendance_bitmaps (day, members) VALUES (?, ?)",
+                [(day, self.encode(bits)) for day, bits in bitmaps.items()]
+            )
+    
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    def add(self, day, member_id):
+        # Written in the caller's check-in transaction. The stored day is
+        # re-read there so check-ins from other workstations are kept; the
+        # caller passes the result to set_day once the transaction commits.
+        self.cursor.execute("SELECT members FROM attendance_bitmaps WHERE day = ?", (day,))
+        row = self.cursor.fetchone()
+        bits = (self.decode(row[0]) if row else 0) | 1 << member_id
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO attendance_bitmaps (day, members) VALUES (?, ?)", (day, self.encode(bits))
+        )
+        return bits
+    
+    def set_day(self, day, bits):
+        if not self.loaded:
+            return
+        
+        if day not in self.bitmaps:
+            insort(self.days, day)
+        self.bitmaps[day] = bits
+    
+    def reload_days(self, days):
+        # Re-read just these days after another workstation wrote them
+        if not self.loaded or not days:
+            return
+        
+        placeholders = ", ".join("?" * len(days))
+        self.cursor.execute(f"SELECT day, members FROM attendance_bitmaps WHERE day IN ({placeholders})", list(days))
+        for day, blob in self.cursor.fetchall():
+            self.set_day(day, self.decode(blob))
+    
+    def on_change(self, table, action, ids):
+        # Deleted members' attendance is gone, so clear their bits everywhere,
+        # on disk too when nothing has been loaded yet
+        if action != "delete":
+            return
+        
+        self.ensure_loaded()
+        mask = 0
+        for member_id in ids:
+            mask |= 1 << member_id
+        
+        # The stored days are re-read under the write lock, so bits other
+        # workstations set since they were loaded are kept
+        days = [day for day, bits in self.bitmaps.items() if bits & mask]
+        if not days:
+            return
+        
+        placeholders = ", ".join("?" * len(days))
+        with write_transaction(self.conn):
+            self.cursor.execute(f"SELECT day, members FROM attendance_bitmaps WHERE day IN ({placeholders})", days)
+            changed = [(day, self.decode(blob) & ~mask) for day, blob in self.cursor.fetchall()]
+            self.cursor.executemany(
+                "UPDATE attendance_bitmaps SET members = ? WHERE day = ?",
+                [(self.encode(bits), day) for day, bits in changed]
+            )
+        
+        for day, bits in changed:
+            self.bitmaps[day] = bits
+    
+    def unique_members(self, start_date, end_date):
+        # Also called from the report thread; days is sliced into a copy and
+        # a day dropped meanwhile just counts as empty
+        self.ensure_loaded()
+        combined = 0
+        for day in self.days[bisect_left(self.days, start_date):bisect_right(self.days, end_date)]:
+            combined |= self.bitmaps.get(day, 0)
+        return bin(combined).count("1")
+    
+    def attended(self, member_id, day):
+        return self.bitmaps.get(day, 0) >> member_id & 1
+    
+    def streak(self, member_id, as_of):
+        # Consecutive days attended, ending today or yesterday
+        self.ensure_loaded()
+        day = datetime.strptime(as_of, "%Y-%m-%d")
+        if not self.attended(member_id, as_of):
+            day -= timedelta(days=1)
+        
+        streak = 0
+        while self.attended(member_id, day.strftime("%Y-%m-%d")):
+            streak += 1
+            day -= timedelta(days=1)
+        return streak
+    
+    def days_attended(self, member_id, as_of, window):
+        # "Visited N of the last M days"
+        self.ensure_loaded()
+        end = datetime.strptime(as_of, "%Y-%m-%d")
+        return sum(
+            self.attended(member_id, (end - timedelta(days=offset)).strftime("%Y-%m-%d"))
+            for offset in range(window)
+        )
+
+
+class OccupancyTracker:
+    # Who is in the building right now: today's open attendance sessions,
+    # read once from the partial index and then kept up to date by the
+    # check-in and check-out paths
+    def __init__(self, conn):
+        self.cursor = conn.cursor()
+        self.day = None
+        self.session_by_member = {}
+        self.member_by_session = {}
+    
+    def load(self, day):
+        self.day = day
+        self.cursor.execute(
+            "SELECT id, member_id FROM attendance WHERE time_out IS NULL AND date = ?", (day,)
+        )
+        self.session_by_member = {member_id: session_id for session_id, member_id in self.cursor.fetchall()}
+        self.member_by_session = {session_id: member_id for member_id, session_id in self.session_by_member.items()}
+    
+    def sync(self, day):
+        # Sessions left open on an earlier day don't count as occupancy
+        if day != self.day:
+            self.load(day)
+    
+    def check_in(self, member_id, session_id):
+        self.session_by_member[member_id] = session_id
+        self.member_by_session[session_id] = member_id
+    
+    def check_out(self, session_id):
+        member_id = self.member_by_session.pop(session_id, None)
+        if member_id is not None:
+            self.session_by_member.pop(member_id, None)
+    
+    def remove_members(self, member_ids):
+        for member_id in member_ids:
+            session_id = self.session_by_member.pop(member_id, None)
+            if session_id is not None:
+                self.member_by_session.pop(session_id, None)
+    
+    def session_for(self, member_id):
+        return self.session_by_member.get(member_id)
+    
+    def count(self):
+        return len(self.session_by_member)
+
+
+class AttendanceColumnStore:
+    # Attendance as typed numpy columns: day is days since 1970-01-01,
+    # time_in and duration are seconds. Each refresh appends the newly closed
+    # rows as an immutable .npy segment; segments are opened memory-mapped.
+    # Rows still open are only remembered by id in meta.json, kept in memory
+    # with a duration of -1, and written out once they have a time out.
+    # Queries aggregate segment by segment, so the mapped files are never
+    # copied into one array. Deleted members' rows are masked out at read
+    # time until the next compaction drops them. Reports query it from the
+    # report thread while change events arrive on the GUI thread, so meta
+    # and parts are only touched under the lock.
+    def __init__(self, conn, directory=ATTENDANCE_COLUMNS_DIR):
+        self.cursor = conn.cursor()
+        self.directory = directory
+        self.lock = threading.RLock()
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.parts = None  # one dict of columns per segment, plus the open rows
+        self.load_meta()
+    
+    def load_meta(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as meta_file:
+                self.meta = json.load(meta_file)
+        except (OSError, ValueError):
+            self.meta = self.empty_meta()
+    
+    @staticmethod
+    def empty_meta():
+        # next_segment numbers segment files so no name is ever written twice
+        return {"last_id": 0, "open_ids": [], "segments": [], "next_segment": 0, "dropped_members": []}
+    
+    def save_meta(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.meta_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as meta_file:
+            json.dump(self.meta, meta_file)
+        os.replace(temp_path, self.meta_path)
+    
+    def on_change(self, table, action, ids):
+        # Member deletes cascade into rows already in the snapshot; ids are
+        # never reused, so their rows are just skipped from now on
+        if action == "delete":
+            with self.lock:
+                self.meta.setdefault("dropped_members", []).extend(ids)
+                self.save_meta()
+    
+    def reset(self):
+        with self.lock:
+            for segment in self.meta["segments"]:
+                for column in ATTENDANCE_COLUMN_DTYPES:
+                    try:
+                        os.remove(os.path.join(self.directory, f"{segment}_{column}.npy"))
+                    except OSError:
+                        pass
+            
+            self.meta = self.empty_meta()
+            self.save_meta()
+            self.parts = None
+    
+    def read_parts(self, cursor=None):
+        # Brings the segments up to date through cursor, the report's read
+        # transaction, and returns them for the caller to aggregate
+        with self.lock:
+            self.refresh(cursor or self.cursor)
+            return self.parts
+    
+    def refresh(self, cursor):
+        # New rows past the high-water mark plus the ones that were open last
+        # time; dates and times are parsed by SQLite, not per row in Python
+        open_ids = self.meta["open_ids"]
+        cursor.execute(f"""
+        SELECT id, member_id,
+            CAST(julianday(date) - 2440587.5 AS INTEGER),
+            CAST(substr(time_in, 1, 2) AS INTEGER) * 3600 + CAST(substr(time_in, 4, 2) AS INTEGER) * 60
+                + CAST(substr(time_in, 7, 2) AS INTEGER),
+            CAST(substr(time_out, 1, 2) AS INTEGER) * 3600 + CAST(substr(time_out, 4, 2) AS INTEGER) * 60
+                + CAST(substr(time_out, 7, 2) AS INTEGER),
+            time_out IS NULL
+        FROM all_attendance
+        WHERE id > ? OR id IN ({", ".join("?" * len(open_ids))})
+        """, [self.meta["last_id"]] + open_ids)
+        rows = cursor.fetchall()
+        
+        if not rows and self.parts is not None:
+            return
+        
+        open_rows = np.array([row[:4] + (-1,) for row in rows if row[5]], dtype="int64").reshape(-1, 5)
+        
+        if rows:
+            self.meta["last_id"] = max(self.meta["last_id"], max(row[0] for row in rows))
+            self.meta["open_ids"] = open_rows[:, 0].tolist()
+            
+            closed = np.array([row[:5] for row in rows if not row[5]], dtype="int64").reshape(-1, 5)
+            if len(closed):
+                closed[:, 4] = np.maximum(closed[:, 4] - closed[:, 3], 0)
+                self.write_segment(closed)
+            
+            self.save_meta()
+        
+        try:
+            if (len(self.meta["segments"]) > ATTENDANCE_MAX_SEGMENTS
+                    or len(self.meta.get("dropped_members", [])) > ATTENDANCE_MAX_DROPPED_MEMBERS):
+                self.compact()
+            self.parts = self.read_segments()
+        except (OSError, ValueError):
+            # A segment file is missing or unreadable: start over from SQL
+            self.reset()
+            self.refresh(cursor)
+            return
+        
+        if len(open_rows):
+            self.parts.append({
+                column: open_rows[:, index].astype(dtype)
+                for index, (column, dtype) in enumerate(ATTENDANCE_COLUMN_DTYPES.items())
+            })
+    
+    def write_segment(self, block):
+        os.makedirs(self.directory, exist_ok=True)
+        number = self.meta.get("next_segment", 0)
+        segment = f"segment_{number:06d}"
+        self.meta["next_segment"] = number + 1
+        
+        for index, (column, dtype) in enumerate(ATTENDANCE_COLUMN_DTYPES.items()):
+            np.save(os.path.join(self.directory, f"{segment}_{column}.npy"), block[:, index].astype(dtype))
+        
+        self.meta["segments"].append(segment)
+    
+    def read_segments(self):
+        return [
+            {
+                column: np.load(os.path.join(self.directory, f"{segment}_{column}.npy"), mmap_mode="r")
+                for column in ATTENDANCE_COLUMN_DTYPES
+            }
+            for segment in self.meta["segments"]
+        ]
+    
+    def compact(self):
+        # Fold all segments into one, minus deleted members' rows, so reads
+        # stay a handful of files; the only time the segments are read into
+        # memory together. The new segment is listed in meta before any old
+        # file goes, and only names no longer listed are removed.
+        parts = self.read_segments()
+        block = np.column_stack([
+            np.concatenate([part[column] for part in parts]) for column in ATTENDANCE_COLUMN_DTYPES
+        ])
+        block = block[self.kept_rows(block[:, 1])]
+        
+        old_segments = self.meta["segments"]
+        self.meta["segments"] = []
+        self.write_segment(block)
+        self.meta["dropped_members"] = []
+        self.save_meta()
+        
+        for segment in set(old_segments) - set(self.meta["segments"]):
+            for column in ATTENDANCE_COLUMN_DTYPES:
+                try:
+                    os.remove(os.path.join(self.directory, f"{segment}_{column}.npy"))
+                except OSError:
+                    pass
+    
+    def kept_rows(self, member_id):
+        dropped = self.meta.get("dropped_members")
+        if not dropped:
+            return np.ones(len(member_id), dtype=bool)
+        return ~np.isin(member_id, dropped)
+    
+    def day_number(self, date_text):
+        return (datetime.strptime(date_text, "%Y-%m-%d") - EPOCH_DATE).days
+    
+    def day_mask(self, part, start_date, end_date):
+        day = part["day"]
+        in_range = (day >= self.day_number(start_date)) & (day <= self.day_number(end_date))
+        return in_range & self.kept_rows(part["member_id"])
+    
+    def summary(self, start_date, end_date, cursor=None):
+        # Total visits and per-day counts in the date range
+        parts = self.read_parts(cursor)
+        start_day = self.day_number(start_date)
+        days = max(self.day_number(end_date) - start_day + 1, 0)
+        
+        daily = np.zeros(days, dtype="int64")
+        for part in parts:
+            daily += np.bincount(part["day"][self.day_mask(part, start_date, end_date)] - start_day, minlength=days)
+        
+        daily_data = [
+            ((EPOCH_DATE + timedelta(days=start_day + offset)).strftime("%Y-%m-%d"), int(count))
+            for offset, count in enumerate(daily) if count
+        ]
+        return int(daily.sum()), daily_data
+    
+    def peak_hours(self, start_date, end_date, cursor=None):
+        # Weekday x hour check-in counts, and person-minutes present per
+        # weekday x hour from a +1/-1 difference array over the minutes of
+        # the week, accumulated with one cumsum
+        parts = self.read_parts(cursor)
+        checkins = np.zeros(7 * 24, dtype="int64")
+        diff = np.zeros(7 * 1440 + 1, dtype="int64")
+        
+        for part in parts:
+            mask = self.day_mask(part, start_date, end_date)
+            weekday = (part["day"][mask] + 3) % 7  # 1970-01-01 was a Thursday
+            time_in = part["time_in"][mask]
+            duration = part["duration"][mask]
+            
+            checkins += np.bincount(weekday * 24 + time_in // 3600, minlength=7 * 24)[:7 * 24]
+            
+            closed = duration >= 0
+            day_start = weekday[closed] * 1440
+            start_minute = day_start + time_in[closed] // 60
+            end_minute = day_start + np.minimum((time_in[closed] + duration[closed]) // 60, 1440)
+            
+            diff += np.bincount(start_minute, minlength=7 * 1440 + 1) - np.bincount(end_minute, minlength=7 * 1440 + 1)
+        
+        present = np.cumsum(diff)[:7 * 1440].reshape(7, 24, 60).sum(axis=2)
+        return checkins.reshape(7, 24).tolist(), present.tolist()
+    
+    def retention(self, join_months, first_cohort, months, cursor=None):
+        # Distinct (member, month offset since joining) pairs over all of
+        # attendance, counted per cohort x offset in one bincount
+        parts = self.read_parts(cursor)
+        member_ids = np.fromiter(join_months.keys(), dtype="int64", count=len(join_months))
+        lookup = np.full(int(member_ids.max()) + 1, -1, dtype="int64")
+        lookup[member_ids] = np.fromiter(join_months.values(), dtype="int64", count=len(join_months))
+        
+        # Distinct per segment first, then across segments
+        found = [np.empty(0, dtype="int64")]
+        for part in parts:
+            in_lookup = part["member_id"] < len(lookup)
+            member = part["member_id"][in_lookup].astype("int64")
+            joined = lookup[member]
+            
+            visit_month = part["day"][in_lookup]
+            visit_month = visit_month.astype("datetime64[D]").astype("datetime64[M]").astype("int64")
+            
+            offset = visit_month - joined
+            keep = (joined >= 0) & (offset >= 0) & (offset < months)
+            found.append(np.unique(member[keep] * months + offset[keep]))
+        
+        pairs = np.unique(np.concatenate(found))
+        
+        cohort = lookup[pairs // months] - first_cohort
+        counts = np.bincount(cohort * months + pairs % months)
+        
+        grid = {}
+        for index in np.flatnonzero(counts):
+            grid[(first_cohort + int(index) // months, int(index) % months)] = int(counts[index])
+        return grid
+
+
+class HistoryPager(QObject):
+    # Fills a table one page at a time and fetches the next page when the
+    # user scrolls to the bottom, instead of loading a whole history up front.
+    # A viewport taller than the rows loaded has no scroll bar to scroll, so
+    # it is topped up whenever the table is shown or resized.
+    def __init__(self, conn, table, query, params, format_row):
+        super().__init__(table)
+        self.cursor = conn.cursor()
+        self.table = table
+        self.query = query
+        self.params = list(params)
+        self.format_row = format_row
+        self.exhausted = False
+        
+        table.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        table.viewport().installEventFilter(self)
+        self.load_next_page()
+    
+    def eventFilter(self, watched, event):
+        if event.type() in (QEvent.Show, QEvent.Resize):
+            self.fill_viewport()
+        return False
+    
+    def fill_viewport(self):
+        # Row heights are known as soon as rows are added, unlike the scroll
+        # bar range, which only updates on the next layout pass
+        while not self.exhausted and self.table.verticalHeader().length() <= self.table.viewport().height():
+            self.load_next_page()
+    
+    def on_scroll(self, value):
+        if value >= self.table.verticalScrollBar().maximum():
+            self.load_next_page()
+    
+    def load_next_page(self):
+        if self.exhausted:
+            return
+        
+        offset = self.table.rowCount()
+        self.cursor.execute(self.query + " LIMIT ? OFFSET ?", self.params + [HISTORY_PAGE_SIZE, offset])
+        records = self.cursor.fetchall()
+        self.exhausted = len(records) < HISTORY_PAGE_SIZE
+        
+        self.table.setRowCount(offset + len(records))
+        for i, record in enumerate(records):
+            for col, value in enumerate(self.format_row(record)):
+                self.table.setItem(offset + i, col, QTableWidgetItem(value))
+
+
+class HistoryArchive:
+    # Per-year archive databases for old attendance and payments. The hot
+    # tables keep recent and open rows; the views union both tiers.
+    def __init__(self, conn, directory=ARCHIVE_DIR):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.directory = directory
+        self.aliases = {}
+        
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.startswith("gym_archive_") and name.endswith(".db"):
+                    self.attach(name[len("gym_archive_"):-len(".db")])
+        self.create_views()
+    
+    def path(self, year):
+        return os.path.abspath(os.path.join(self.directory, f"gym_archive_{year}.db"))
+    
+    def attach(self, year):
+        if year in self.aliases:
+            return self.aliases[year]
+        
+        # ATTACH is not allowed inside a transaction
+        check_no_transaction(self.conn, "ATTACH")
+        
+        os.makedirs(self.directory, exist_ok=True)
+        alias = f"archive_{year}"
+        self.cursor.execute("ATTACH DATABASE ? AS " + alias, (self.path(year),))
+        self.cursor.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {alias}.attendance (
+            id INTEGER PRIMARY KEY,
+            member_id INTEGER,
+            date TEXT,
+            time_in TEXT,
+            time_out TEXT,
+            auto_closed INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS {alias}.payments (
+            id INTEGER PRIMARY KEY,
+            member_id INTEGER,
+            amount REAL,
+            payment_date TEXT,
+            due_date TEXT,
+            payment_method TEXT,
+            status TEXT
+        );
+        CREATE INDEX IF NOT EXISTS {alias}.idx_attendance_date ON attendance(date, time_in);
+        CREATE INDEX IF NOT EXISTS {alias}.idx_attendance_member ON attendance(member_id, date, time_in);
+        CREATE INDEX IF NOT EXISTS {alias}.idx_payments_date ON payments(payment_date);
+        CREATE INDEX IF NOT EXISTS {alias}.idx_payments_member ON payments(member_id, payment_date);
+        """)
+        
+        self.aliases[year] = alias
+        return alias
+    
+    def create_views(self):
+        create_history_views(self.cursor, self.aliases.values())
+    
+    def archive_paths(self):
+        return [(alias, self.path(year)) for year, alias in self.aliases.items()]
+    
+    def archive(self, cutoff, cancelled=None):
+        # Moves closed rows dated before cutoff, ARCHIVE_CHUNK_SIZE at a time
+        # so no write transaction is held for long
+        moved = 0
+        for table, (date_column, closed, columns) in HISTORY_TABLES.items():
+            while cancelled is None or not cancelled():
+                self.cursor.execute(
+                    f"SELECT id, substr({date_column}, 1, 4) FROM main.{table} WHERE {date_column} < ? AND {closed} LIMIT ?",
+                    (cutoff, ARCHIVE_CHUNK_SIZE)
+                )
+                rows = self.cursor.fetchall()
+                if not rows:
+                    break
+                
+                years = sorted(set(year for _, year in rows))
+                if any(year not in self.aliases for year in years):
+                    for year in years:
+                        self.attach(year)
+                    self.create_views()
+                
+                # Copies are committed before the hot rows are deleted: after
+                # a crash in between the rows exist twice until the next run,
+                # whose INSERT OR IGNORE skips them, but are never lost
+                with write_transaction(self.conn):
+                    self.cursor.execute("DELETE FROM temp.bulk_ids")
+                    self.cursor.executemany(
+                        "INSERT INTO temp.bulk_ids (id) VALUES (?)", [(row_id,) for row_id, _ in rows]
+                    )
+                    for year in years:
+                        self.cursor.execute(f"""
+                        INSERT OR IGNORE INTO {self.aliases[year]}.{table} ({columns})
+                        SELECT {columns} FROM main.{table}
+                        WHERE id IN (SELECT id FROM temp.bulk_ids) AND substr({date_column}, 1, 4) = ?
+                        """, (year,))
+                
+                with write_transaction(self.conn):
+                    self.delete_hot_rows(table)
+                moved += len(rows)
+        
+        return moved
+    
+    def delete_hot_rows(self, table):
+        if table != "payments":
+            self.cursor.execute("DELETE FROM main.attendance WHERE id IN (SELECT id FROM temp.bulk_ids)")
+            return
+        
+        # member_stats holds lifetime totals, so add back what the payment
+        # delete trigger takes off for the archived rows
+        self.cursor.execute("""
+        SELECT member_id, SUM(amount), MAX(payment_date) FROM main.payments
+        WHERE id IN (SELECT id FROM temp.bulk_ids)
+        GROUP BY member_id
+        """)
+        totals = self.cursor.fetchall()
+        
+        self.cursor.execute("DELETE FROM main.payments WHERE id IN (SELECT id FROM temp.bulk_ids)")
+        self.cursor.executemany("""
+        UPDATE member_stats SET
+            total_paid = total_paid + ?,
+            last_payment_date = NULLIF(MAX(COALESCE(last_payment_date, ''), COALESCE(?, '')), '')
+        WHERE member_id = ?
+        """, [(amount, last_date, member_id) for member_id, amount, last_date in totals])
+    
+    def on_change(self, table, action, ids):
+        # Foreign keys don't reach into the archives, so deleted members'
+        # archived rows are removed here
+        if action != "delete" or not self.aliases:
+            return
+        
+        placeholders = ", ".join("?" * len(ids))
+        with write_transaction(self.conn):
+            for alias in self.aliases.values():
+                for history_table in HISTORY_TABLES:
+                    self.cursor.execute(f"DELETE FROM {alias}.{history_table} WHERE member_id IN ({placeholders})", ids)
+    
+    def counts(self):
+        # year -> (archived visits, archived payments)
+        counts = {}
+        for year, alias in sorted(self.aliases.items()):
+            self.cursor.execute(f"SELECT (SELECT COUNT(*) FROM {alias}.attendance), (SELECT COUNT(*) FROM {alias}.payments)")
+            counts[year] = self.cursor.fetchone()
+        return counts
+
+
+def day_number(date_text):
+    return (datetime.strptime(date_text[:10], "%Y-%m-%d") - EPOCH_DATE).days
+
+
+def engagement_key_after_visit(key, day):
+    # O(1) update: decay the current score to the visit day and add one
+    score = engagement_score(key, day) + 1
+    return math.log2(score) + day / ENGAGEMENT_HALF_LIFE_DAYS
+
+
+def engagement_score(key, day):
+    if key is None:
+        return 0.0
+    return 2 ** (key - day / ENGAGEMENT_HALF_LIFE_DAYS)
+
+
+def at_risk_key(day):
+    # Keys below this have a current score under AT_RISK_SCORE
+    return math.log2(AT_RISK_SCORE) + day / ENGAGEMENT_HALF_LIFE_DAYS
+
+
+def merge_member_edits(base, theirs, mine):
+    # Three-way merge of an edit against changes saved elsewhere since the
+    # dialog opened. A field only one side changed takes that side's value;
+    # fields both sides changed to different values are conflicts.
+    def same(a, b):
+        return ("" if a is None else str(a)) == ("" if b is None else str(b))
+    
+    merged = {}
+    conflicts = []
+    for field in MEMBER_EDIT_FIELDS:
+        if same(mine[field], base[field]):
+            merged[field] = theirs[field]
+        elif same(theirs[field], base[field]) or same(theirs[field], mine[field]):
+            merged[field] = mine[field]
+        else:
+            merged[field] = mine[field]
+            conflicts.append(field)
+    return merged, conflicts
+
+
+def month_number(date_text):
+    # Months since 1970-01, matching numpy's datetime64[M]
+    return (int(date_text[:4]) - 1970) * 12 + int(date_text[5:7]) - 1
+
+
+def month_label(month):
+    return f"{1970 + month // 12}-{month % 12 + 1:02d}"
+
+
+def weekday_counts(start_date, end_date):
+    # How many of each weekday (Monday first) fall in the date range
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    days = (datetime.strptime(end_date, "%Y-%m-%d") - start).days + 1
+    counts = [max(days, 0) // 7] * 7
+    for offset in range(max(days, 0) % 7):
+        counts[(start.weekday() + offset) % 7] += 1
+    return counts
+
+
+def report_window(window, day):
+    # (start, end) dates of a named range ending on day, a QDate
+    if window == "Last 30 Days":
+        start = day.addDays(-29)
+    elif window == "Month to Date":
+        start = QDate(day.year(), day.month(), 1)
+    elif window == "Quarter to Date":
+        start = QDate(day.year(), (day.month() - 1) // 3 * 3 + 1, 1)
+    else:
+        start = day.addMonths(-1)
+    return start.toString("yyyy-MM-dd"), day.toString("yyyy-MM-dd")
+
+
+def render_reminder(reminder, gym_name):
+    outbox_id, kind, ref_date, name, email, plan, amount = reminder
+    subject, body = REMINDER_TEMPLATES[kind]
+    fields = {"name": name, "gym": gym_name, "ref_date": ref_date, "plan": plan, "amount": amount or 0.0}
+    
+    message = EmailMessage()
+    message["To"] = email
+    message["Subject"] = subject.format(**fields)
+    message.set_content(body.format(**fields))
+    return message
+
+
+class FileReminderSender:
+    # Appends rendered reminders to a local mailbox file
+    def __init__(self, path, from_address):
+        self.path = path
+        self.from_address = from_address
+        self.lock = threading.Lock()
+    
+    def send_batch(self, messages):
+        # One error (or None) per message
+        stamp = datetime.now().strftime("%a %b %d %H:%M:%S %Y")
+        for message in messages:
+            message["From"] = self.from_address
+        
+        # mbox layout: each message starts with a "From " separator line
+        text = "".join(f"From {self.from_address} {stamp}\n{message.as_string()}\n" for message in messages)
+        try:
+            with self.lock:
+                with open(self.path, "a", encoding="utf-8") as mailbox:
+                    mailbox.write(text)
+        except OSError as e:
+            return [str(e)] * len(messages)
+        return [None] * len(messages)
+
+
+class SmtpReminderSender:
+    # Delivers through an SMTP server, one connection per batch
+    def __init__(self, host, port, from_address):
+        self.host = host
+        self.port = port
+        self.from_address = from_address
+    
+    def send_batch(self, messages):
+        # One error (or None) per message. A refused message doesn't stop
+        # the batch; a lost connection fails only what wasn't sent yet.
+        errors = []
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+                for message in messages:
+                    message["From"] = self.from_address
+                    try:
+                        smtp.send_message(message)
+                        errors.append(None)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        errors.append(str(e))
+        except (smtplib.SMTPException, OSError) as e:
+            errors += [str(e)] * (len(messages) - len(errors))
+        return errors
+
+
+def dispatch_reminder_batch(sender, reminders, gym_name):
+    # Runs on a worker thread: render and send only, the database is
+    # updated on the main thread. Returns (outbox id, error or None) pairs.
+    messages = [render_reminder(reminder, gym_name) for reminder in reminders]
+    return list(zip([reminder[0] for reminder in reminders], sender.send_batch(messages)))
+
+
+class ReminderService:
+    # Sends reminders from a background thread, batches in parallel on a
+    # worker pool; each message's outcome is queued for the GUI to record
+    def __init__(self):
+        self.thread = None
+        self.outcomes = deque()
+    
+    def start(self, sender, reminders, gym_name):
+        if self.running():
+            return False
+        
+        self.thread = threading.Thread(target=self.run, args=(sender, reminders, gym_name), daemon=True)
+        self.thread.start()
+        return True
+    
+    def run(self, sender, reminders, gym_name):
+        batches = [reminders[i:i + REMINDER_BATCH_SIZE] for i in range(0, len(reminders), REMINDER_BATCH_SIZE)]
+        
+        with ThreadPoolExecutor(max_workers=REMINDER_WORKERS) as pool:
+            futures = {pool.submit(dispatch_reminder_batch, sender, batch, gym_name): batch for batch in batches}
+            
+            for future in as_completed(futures):
+                try:
+                    self.outcomes.extend(future.result())
+                except Exception as e:
+                    # Failed before anything in the batch was sent
+                    self.outcomes.extend((reminder[0], str(e)) for reminder in futures[future])
+    
+    def take(self):
+        outcomes = []
+        while self.outcomes:
+            outcomes.append(self.outcomes.popleft())
+        return outcomes
+    
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+
+def attendance_daily_rows(cursor, start_date, end_date):
+    cursor.execute("""
+    SELECT date, COUNT(*) 
+    FROM all_attendance 
+    WHERE date BETWEEN ? AND ?
+    GROUP BY date
+    ORDER BY date
+    """, (start_date, end_date))
+    return cursor.fetchall()
+
+
+def peak_hours_rows(cursor, start_date, end_date):
+    # One scan joined to the 24 hours. A session counts as a check-in in its
+    # starting hour and adds its overlap with every hour it spans; open
+    # sessions only count as check-ins.
+    cursor.execute("""
+    WITH RECURSIVE hours(h) AS (SELECT 0 UNION ALL SELECT h + 1 FROM hours WHERE h < 23),
+    sessions AS (
+        SELECT (CAST(strftime('%w', date) AS INTEGER) + 6) % 7 AS weekday,
+            CAST(substr(time_in, 1, 2) AS INTEGER) * 60 + CAST(substr(time_in, 4, 2) AS INTEGER) AS start_minute,
+            CAST(substr(time_out, 1, 2) AS INTEGER) * 60 + CAST(substr(time_out, 4, 2) AS INTEGER) AS end_minute
+        FROM all_attendance
+        WHERE date BETWEEN ? AND ?
+    )
+    SELECT weekday, h,
+        SUM(start_minute / 60 = h),
+        SUM(CASE WHEN end_minute IS NULL THEN 0
+                 ELSE MAX(0, MIN(end_minute, h * 60 + 60) - MAX(start_minute, h * 60)) END)
+    FROM sessions JOIN hours
+        ON start_minute / 60 = h OR (start_minute < h * 60 + 60 AND end_minute > h * 60)
+    GROUP BY weekday, h
+    """, (start_date, end_date))
+    return cursor.fetchall()
+
+
+def revenue_rows(cursor, start_date, end_date):
+    cursor.execute("""
+    SELECT strftime('%Y-%m', payment_date) AS month, payment_method, SUM(amount)
+    FROM all_payments
+    WHERE payment_date BETWEEN ? AND ? AND status = 'Paid'
+    GROUP BY month, payment_method
+    ORDER BY month
+    """, (start_date, end_date))
+    return cursor.fetchall()
+
+
+def growth_rows(cursor, start_date, end_date):
+    # Conditional aggregation: a member can count as a join in one month and
+    # an expiry in another, and over split ranges each half only counts the
+    # events inside it, so partial sums add up
+    cursor.execute("""
+    SELECT strftime('%Y-%m', join_date), strftime('%Y-%m', expiry_date),
+        SUM(join_date BETWEEN :start AND :end),
+        SUM(status = 'Expired' AND expiry_date BETWEEN :start AND :end)
+    FROM members
+    WHERE join_date BETWEEN :start AND :end
+       OR (status = 'Expired' AND expiry_date BETWEEN :start AND :end)
+    GROUP BY 1, 2
+    """, {"start": start_date, "end": end_date})
+    return cursor.fetchall()
+
+
+# Report scans that can run over any slice of a date range. Each returns
+# grouped rows; results for consecutive slices are concatenated in order.
+REPORT_SCANS = {
+    "attendance_daily": attendance_daily_rows,
+    "peak_hours": peak_hours_rows,
+    "revenue": revenue_rows,
+    "growth": growth_rows,
+}
+
+
+def date_partitions(start_date, end_date, parts):
+    # Splits an inclusive date range into up to `parts` consecutive slices
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    days = (datetime.strptime(end_date, "%Y-%m-%d") - start).days + 1
+    parts = max(min(parts, days), 1)
+    
+    partitions = []
+    for part in range(parts):
+        first = start + timedelta(days=days * part // parts)
+        last = start + timedelta(days=days * (part + 1) // parts - 1)
+        partitions.append((first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")))
+    return partitions
+
+
+def create_history_views(cursor, aliases):
+    # all_attendance / all_payments: the hot table plus every attached
+    # archive. UNION ALL views let SQLite push date and member filters down
+    # into each branch's indexes.
+    for table, (_, _, columns) in HISTORY_TABLES.items():
+        branches = [f"SELECT {columns} FROM main.{table}"]
+        branches += [f"SELECT {columns} FROM {alias}.{table}" for alias in aliases]
+        cursor.execute(f"DROP VIEW IF EXISTS temp.all_{table}")
+        cursor.execute(f"CREATE TEMP VIEW all_{table} AS " + " UNION ALL ".join(branches))
+
+
+def run_report_compute(conn, compute, start_date, end_date):
+    # Runs on the report thread over its own connection; every metric of a
+    # report is read inside one read transaction, so the cards and charts
+    # all come from the same snapshot
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        return compute(cursor, start_date, end_date)
+    finally:
+        conn.rollback()
+
+
+# Set in each report worker process; the GUI sets it to abort running scans
+report_cancel_event = None
+
+
+def init_report_worker(cancel_event):
+    global report_cancel_event
+    report_cancel_event = cancel_event
+
+
+def run_report_scan(snapshot_path, archive_paths, scan, start_date, end_date):
+    # Runs in a worker process against read-only snapshot copies of the
+    # main database and of each archive
+    conn = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+    try:
+        for alias, path in archive_paths:
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (f"file:{path}?mode=ro",))
+        create_history_views(conn.cursor(), [alias for alias, _ in archive_paths])
+        
+        if report_cancel_event is not None:
+            conn.set_progress_handler(report_cancel_event.is_set, REPORT_PROGRESS_OPCODES)
+        return REPORT_SCANS[scan](conn.cursor(), start_date, end_date)
+    finally:
+        conn.close()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def backup_sources():
+    # (name inside the set, live path) of every database file
+    sources = [(os.path.basename(DATABASE_PATH), DATABASE_PATH)]
+    if os.path.isdir(ARCHIVE_DIR):
+        for name in sorted(os.listdir(ARCHIVE_DIR)):
+            if name.startswith("gym_archive_") and name.endswith(".db"):
+                sources.append((f"{ARCHIVE_DIR}/{name}", os.path.join(ARCHIVE_DIR, name)))
+    return sources
+
+
+def create_backup(directory=BACKUP_DIR, compress=True):
+    # Written under a .partial name and renamed once the manifest is in
+    # place, so an interrupted backup never looks like a usable set
+    name = datetime.now().strftime("%Y%m%d_%H%M%S")
+    partial = os.path.join(directory, name + ".partial")
+    os.makedirs(os.path.join(partial, ARCHIVE_DIR), exist_ok=True)
+    
+    # Every file is copied from one connection inside one read transaction.
+    # The pinned snapshot keeps the backup API from restarting each time a
+    # check-in commits (WAL writers carry on meanwhile), and main and archive
+    # copies agree even if an archive run commits half-way through.
+    source = sqlite3.connect(DATABASE_PATH)
+    try:
+        schemas = {}
+        for index, (entry, source_path) in enumerate(backup_sources()):
+            if source_path == DATABASE_PATH:
+                schemas[entry] = "main"
+            else:
+                schemas[entry] = f"backup_{index}"
+                source.execute(f"ATTACH DATABASE ? AS {schemas[entry]}", (source_path,))
+        
+        source.execute("BEGIN")
+        source.execute(
+            " UNION ALL ".join(f"SELECT COUNT(*) FROM {schema}.sqlite_master" for schema in schemas.values())
+        ).fetchall()
+        
+        for entry, schema in schemas.items():
+            target = sqlite3.connect(os.path.join(partial, entry))
+            try:
+                source.backup(target, pages=BACKUP_PAGES, name=schema,
+                              progress=lambda status, remaining, total: time.sleep(BACKUP_STEP_SLEEP))
+                target.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                target.close()
+    finally:
+        source.close()
+    
+    files = {}
+    for entry in schemas:
+        target_path = os.path.join(partial, entry)
+        if compress:
+            with open(target_path, "rb") as plain, gzip.open(target_path + ".gz", "wb") as packed:
+                shutil.copyfileobj(plain, packed)
+            os.remove(target_path)
+            target_path += ".gz"
+        
+        files[entry] = {"stored": os.path.relpath(target_path, partial), "sha256": file_sha256(target_path)}
+    
+    with open(os.path.join(partial, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "files": files}, f, indent=2)
+    
+    final = os.path.join(directory, name)
+    os.rename(partial, final)
+    return final
+
 
-from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-    QLabel, QPushButton, QStackedWidget, QLineEdit, QComboBox, 
-    QDateEdit, QTableWidget, QTableWidgetItem, QHeaderView, 
-    QScrollArea, QFrame, QMessageBox, QSizePolicy, QSpacerItem,
-    QGraphicsDropShadowEffect, QToolButton, QTabWidget, QDialog,QTabWidget,  QFormLayout, QDialog
-)
+def list_backups(directory=BACKUP_DIR):
+    # Complete sets, oldest first
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, name) for name in sorted(os.listdir(directory))
+        if os.path.isfile(os.path.join(directory, name, "manifest.json"))
+    ]
+
+
+def rotate_backups(directory=BACKUP_DIR, keep=DEFAULT_BACKUP_KEEP):
+    for set_path in list_backups(directory)[:-keep]:
+        shutil.rmtree(set_path, ignore_errors=True)
+    
+    # Leftovers of interrupted runs
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        if name.endswith(".partial"):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def unpacked_copy(set_path, stored):
+    # Path of a plain database file for a stored copy; compressed copies are
+    # expanded into a temporary file the caller removes
+    path = os.path.join(set_path, stored)
+    if not stored.endswith(".gz"):
+        return path, False
+    
+    fd, plain_path = tempfile.mkstemp(prefix="gym_restore_", suffix=".db")
+    with os.fdopen(fd, "wb") as plain, gzip.open(path, "rb") as packed:
+        shutil.copyfileobj(packed, plain)
+    return plain_path, True
+
+
+def verify_backup(set_path):
+    # Problems found in a set: checksum mismatches and failed integrity checks
+    with open(os.path.join(set_path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    
+    problems = []
+    for entry, info in manifest["files"].items():
+        stored_path = os.path.join(set_path, info["stored"])
+        if not os.path.isfile(stored_path) or file_sha256(stored_path) != info["sha256"]:
+            problems.append(f"{entry}: checksum mismatch")
+            continue
+        
+        plain_path, temporary = unpacked_copy(set_path, info["stored"])
+        try:
+            conn = sqlite3.connect(f"file:{plain_path}?mode=ro", uri=True)
+            try:
+                result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            result = str(e)
+        finally:
+            if temporary:
+                os.remove(plain_path)
+        
+        if result != "ok":
+            problems.append(f"{entry}: {result}")
+    return problems
+
+
+def restore_backup(set_path, conn, archive):
+    # Copies a verified set into the open databases through the backup API,
+    # so the restore is atomic per file and needs no reconnect
+    problems = verify_backup(set_path)
+    if problems:
+        raise ValueError(f"Backup failed verification: {problems[0]}")
+    
+    with open(os.path.join(set_path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    
+    check_no_transaction(conn, "restore_backup")
+    
+    restored_years = set()
+    for entry, info in manifest["files"].items():
+        # The backup API only writes to a connection's main database, so
+        # archives are restored through a connection of their own
+        if entry == os.path.basename(DATABASE_PATH):
+            target = conn
+        else:
+            year = entry[len(f"{ARCHIVE_DIR}/gym_archive_"):-len(".db")]
+            archive.attach(year)
+            restored_years.add(year)
+            target = sqlite3.connect(archive.path(year))
+        
+        plain_path, temporary = unpacked_copy(set_path, info["stored"])
+        try:
+            source = sqlite3.connect(plain_path)
+            try:
+                source.backup(target, pages=BACKUP_PAGES)
+            finally:
+                source.close()
+        finally:
+            if target is not conn:
+                target.close()
+            if temporary:
+                os.remove(plain_path)
+    
+    # Years archived after the backup was taken held rows that were still
+    # in the main database then
+    with write_transaction(conn):
+        for year, alias in archive.aliases.items():
+            if year not in restored_years:
+                for table in HISTORY_TABLES:
+                    conn.execute(f"DELETE FROM {alias}.{table}")
+    archive.create_views()
+
+
+class BackupService:
+    # Runs create_backup on a background thread with its own connections;
+    # the GUI polls finished() and reads the outcome
+    def __init__(self, directory=BACKUP_DIR):
+        self.directory = directory
+        self.thread = None
+        self.result = None
+        self.error = None
+    
+    def start(self, compress, keep):
+        if self.running():
+            return False
+        
+        self.result = self.error = None
+        self.thread = threading.Thread(target=self.run, args=(compress, keep), daemon=True)
+        self.thread.start()
+        return True
+    
+    def run(self, compress, keep):
+        try:
+            self.result = create_backup(self.directory, compress)
+            rotate_backups(self.directory, keep)
+        except (sqlite3.Error, OSError) as e:
+            self.error = str(e)
+    
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
 
 
 class GymManagementSystem(QMainWindow):
@@ -28,15 +1679,111 @@ class GymManagementSystem(QMainWindow):
         # Database setup
         self.init_db()
         
+        # Server-side sort column/order of each list table, the sort key
+        # values each page visited so far starts after (None for the first
+        # page), and where the next page starts
+        self.sort_state = {
+            "members": (1, Qt.AscendingOrder),
+            "attendance": (2, Qt.DescendingOrder),
+            "payments": (3, Qt.DescendingOrder)
+        }
+        self.page_state = {"members": [None], "attendance": [None], "payments": [None]}
+        self.next_page_start = {}
+        self.pagers = {}
+        self.sortable_tables = {}
+        
+        # Each report type: (compute its dataset, render it)
+        self.report_builders = {
+            "Attendance Summary": (self.attendance_report_data, self.generate_attendance_report),
+            "Membership Types": (self.membership_report_data, self.generate_membership_report),
+            "Revenue Analysis": (self.revenue_report_data, self.generate_revenue_report),
+            "Member Growth": (self.growth_report_data, self.generate_growth_report),
+            "Peak Hours": (self.peak_hours_report_data, self.generate_peak_hours_report),
+            "Retention Cohorts": (self.retention_report_data, self.generate_retention_report)
+        }
+        
+        # Reports that add up day by day: a stored result plus the data of
+        # the days after its watermark gives the whole range
+        self.report_mergers = {
+            "Attendance Summary": self.merge_attendance_report,
+            "Peak Hours": self.merge_peak_hours_report,
+            "Revenue Analysis": self.merge_revenue_report,
+        }
+        
+        self.backup_service = BackupService()
+        self.reminder_service = ReminderService()
+        
+        # Reports are read on their own thread and connection; worker
+        # processes for long report scans are started on first use
+        self.report_thread = ThreadPoolExecutor(max_workers=1)
+        self.report_reader = None
+        self.report_reader_archives = None
+        self.report_running = False
+        self.report_cancel = threading.Event()
+        self.report_pool = None
+        self.report_cancel_event = None
+        self.report_snapshot = None
+        
         # UI Setup
         self.init_ui()
         
+        self.table_loaders = {
+            "members": self.load_members,
+            "attendance": self.load_attendance,
+            "payments": self.load_payments
+        }
+        self.row_queries = {
+            "members": self.members_query,
+            "attendance": self.attendance_query,
+            "payments": self.payments_query
+        }
+        self.row_fillers = {
+            "members": self.fill_member_row,
+            "attendance": self.fill_attendance_row,
+            "payments": self.fill_payment_row
+        }
+        
+        # Pages and dashboard cards follow row-level change events
+        self.today_attendance = (None, 0)
+        self.change_bus.subscribe(self.on_data_changed)
+        
+        # Close sessions left open since the last run, then keep doing so
+        self.auto_checkout_sessions()
+        self.auto_checkout_timer = QTimer(self)
+        self.auto_checkout_timer.timeout.connect(self.auto_checkout_sessions)
+        self.auto_checkout_timer.start(AUTO_CHECKOUT_INTERVAL_MS)
+        
+        # Precompute the standard report set once the gym has closed
+        self.report_precompute_timer = QTimer(self)
+        self.report_precompute_timer.timeout.connect(self.check_report_precompute)
+        self.report_precompute_timer.start(REPORT_PRECOMPUTE_CHECK_MS)
+        
+        # Scheduled online backups; the poll timer only runs while one is
+        # in progress
+        self.backup_timer = QTimer(self)
+        self.backup_timer.timeout.connect(self.check_backup_schedule)
+        self.backup_timer.start(BACKUP_CHECK_MS)
+        self.backup_poll_timer = QTimer(self)
+        self.backup_poll_timer.timeout.connect(self.poll_backup)
+        
+        # Records reminder outcomes while a send is in progress
+        self.reminder_poll_timer = QTimer(self)
+        self.reminder_poll_timer.timeout.connect(self.poll_reminders)
+        
+        # Pick up check-ins and payments made at other front desks
+        self.change_poll_timer = QTimer(self)
+        self.change_poll_timer.timeout.connect(self.poll_changes)
+        self.change_poll_timer.start(CHANGE_POLL_MS)
+        
         # Load initial data
         self.load_members()
         self.load_attendance()
         self.load_payments()
         self.update_dashboard()
         
+        # Finish a billing run that was interrupted last session
+        self.resume_billing_run()
+        
         # Start clock
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_clock)
@@ -46,9 +1793,22 @@ class GymManagementSystem(QMainWindow):
         self.setStyleSheet(self.get_stylesheet())
         
     def init_db(self):
-        self.conn = sqlite3.connect("gym_management.db")
+        self.conn = sqlite3.connect(DATABASE_PATH, timeout=BUSY_TIMEOUT_SECONDS)
         self.cursor = self.conn.cursor()
         
+        # WAL lets check-ins commit while a report is still reading
+        self.cursor.execute("PRAGMA journal_mode = WAL")
+        self.member_cache = MemberCache(self.conn)
+        self.occupancy = OccupancyTracker(self.conn)
+        self.attendance_columns = AttendanceColumnStore(self.conn) if np is not None else None
+        self.attendance_bitmaps = AttendanceBitmaps(self.conn)
+        
+        self.change_bus = ChangeBus()
+        self.change_bus.subscribe(self.member_cache.on_change, ["members"])
+        if self.attendance_columns is not None:
+            self.change_bus.subscribe(self.attendance_columns.on_change, ["members"])
+        self.change_bus.subscribe(self.attendance_bitmaps.on_change, ["members"])
+        
         # Create tables if they don't exist
         self.cursor.execute("""
         CREATE TABLE IF NOT EXISTS members (
@@ -73,7 +1833,7 @@ class GymManagementSystem(QMainWindow):
             date TEXT,
             time_in TEXT,
             time_out TEXT,
-            FOREIGN KEY(member_id) REFERENCES members(id)
+            FOREIGN KEY(member_id) REFERENCES members(id) ON DELETE CASCADE
         )
         """)
         
@@ -86,11 +1846,428 @@ class GymManagementSystem(QMainWindow):
             due_date TEXT,
             payment_method TEXT,
             status TEXT DEFAULT 'Paid',
+            FOREIGN KEY(member_id) REFERENCES members(id) ON DELETE CASCADE
+        )
+        """)
+        
+        self.migrate_cascade_foreign_keys()
+        self.cursor.execute("PRAGMA foreign_keys = ON")
+        
+        # Archived years, and the views that read across them
+        self.history_archive = HistoryArchive(self.conn)
+        self.change_bus.subscribe(self.history_archive.on_change, ["members"])
+        
+        # Scratch table holding the member ids targeted by a bulk action
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_ids (id INTEGER PRIMARY KEY)")
+        
+        # Membership plans and key/value settings edited on the Settings page
+        self.cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS membership_plans (
+            name TEXT PRIMARY KEY,
+            duration_months INTEGER NOT NULL,
+            sort_order INTEGER DEFAULT 0,
+            price REAL DEFAULT 0
+        );
+        
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        
+        -- One row per billing cycle; last_member_id is the resume checkpoint
+        CREATE TABLE IF NOT EXISTS billing_runs (
+            cycle_date TEXT PRIMARY KEY,
+            bill_through TEXT,
+            last_member_id INTEGER DEFAULT 0,
+            generated INTEGER DEFAULT 0,
+            started_at TEXT,
+            finished_at TEXT
+        );
+        
+        -- Backs the duplicate check of the billing run
+        CREATE INDEX IF NOT EXISTS idx_payments_member_due ON payments(member_id, due_date);
+        
+        -- Reminders waiting to go out; the unique key makes queueing idempotent
+        CREATE TABLE IF NOT EXISTS reminder_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            member_id INTEGER,
+            kind TEXT NOT NULL,
+            ref_date TEXT NOT NULL,
+            amount REAL,
+            queued_at TEXT,
+            sent_at TEXT,
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            UNIQUE(member_id, kind, ref_date),
+            FOREIGN KEY(member_id) REFERENCES members(id) ON DELETE CASCADE
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_reminder_outbox_unsent ON reminder_outbox(id) WHERE sent_at IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_payments_status_due ON payments(status, due_date);
+        
+        -- Which member ids attended each day, see AttendanceBitmaps
+        CREATE TABLE IF NOT EXISTS attendance_bitmaps (
+            day TEXT PRIMARY KEY,
+            members BLOB
+        );
+        
+        -- Report datasets computed ahead of time, as JSON
+        CREATE TABLE IF NOT EXISTS report_results (
+            report_type TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            data TEXT NOT NULL,
+            computed_at TEXT NOT NULL,
+            watermark TEXT,
+            PRIMARY KEY (report_type, start_date, end_date)
+        );
+        """)
+        
+        # First day not covered by a stored result, for the reports whose
+        # last day is added when served
+        self.cursor.execute("PRAGMA table_info(report_results)")
+        if "watermark" not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE report_results ADD COLUMN watermark TEXT")
+        
+        # Databases created before plans had a price
+        self.cursor.execute("PRAGMA table_info(membership_plans)")
+        if "price" not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE membership_plans ADD COLUMN price REAL DEFAULT 0")
+        
+        # Reminders that can't be sent, e.g. to members without an email
+        self.cursor.execute("PRAGMA table_info(reminder_outbox)")
+        if "skipped_at" not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE reminder_outbox ADD COLUMN skipped_at TEXT")
+        
+        # Sessions closed by the auto-checkout job rather than by the member
+        self.cursor.execute("PRAGMA table_info(attendance)")
+        if "auto_closed" not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE attendance ADD COLUMN auto_closed INTEGER DEFAULT 0")
+        
+        # Denormalized last visit and engagement, updated on each check-in
+        self.cursor.execute("PRAGMA table_info(members)")
+        if "engagement_key" not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.executescript("""
+            ALTER TABLE members ADD COLUMN last_visit TEXT;
+            ALTER TABLE members ADD COLUMN engagement_key REAL;
+            """)
+            self.backfill_engagement()
+        
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_members_status_engagement ON members(status, engagement_key)"
+        )
+        
+        # Version of each member's editable fields, see save_member_edits
+        self.cursor.execute("PRAGMA table_info(members)")
+        if "row_version" not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE members ADD COLUMN row_version INTEGER DEFAULT 0")
+        
+        self.cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_members_row_version
+        AFTER UPDATE OF {', '.join(MEMBER_EDIT_FIELDS)} ON members
+        WHEN {' OR '.join(f'OLD.{field} IS NOT NEW.{field}' for field in MEMBER_EDIT_FIELDS)}
+        BEGIN
+            UPDATE members SET row_version = OLD.row_version + 1 WHERE id = NEW.id;
+        END
+        """)
+        
+        self.cursor.execute("SELECT COUNT(*) FROM membership_plans")
+        if self.cursor.fetchone()[0] == 0:
+            self.cursor.executemany(
+                "INSERT INTO membership_plans (name, duration_months, sort_order, price) VALUES (?, ?, ?, ?)",
+                [(name, months, order, price) for order, (name, months, price) in enumerate(DEFAULT_MEMBERSHIP_PLANS)]
+            )
+        
+        # Indexes backing the sortable columns and filters of the list pages
+        self.cursor.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_members_name ON members(name);
+        CREATE INDEX IF NOT EXISTS idx_members_phone ON members(phone);
+        CREATE INDEX IF NOT EXISTS idx_members_type ON members(membership_type);
+        CREATE INDEX IF NOT EXISTS idx_members_status ON members(status);
+        CREATE INDEX IF NOT EXISTS idx_members_status_name ON members(status, name);
+        CREATE INDEX IF NOT EXISTS idx_members_type_name ON members(membership_type, name);
+        CREATE INDEX IF NOT EXISTS idx_members_join_date ON members(join_date);
+        CREATE INDEX IF NOT EXISTS idx_members_expiry_date ON members(expiry_date);
+        CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date, time_in);
+        CREATE INDEX IF NOT EXISTS idx_attendance_member ON attendance(member_id, date, time_in);
+        CREATE INDEX IF NOT EXISTS idx_attendance_open ON attendance(date, member_id) WHERE time_out IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(payment_date);
+        CREATE INDEX IF NOT EXISTS idx_payments_due_date ON payments(due_date);
+        CREATE INDEX IF NOT EXISTS idx_payments_amount ON payments(amount);
+        CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status);
+        CREATE INDEX IF NOT EXISTS idx_payments_method ON payments(payment_method);
+        CREATE INDEX IF NOT EXISTS idx_payments_status_date ON payments(status, payment_date);
+        CREATE INDEX IF NOT EXISTS idx_payments_method_date ON payments(payment_method, payment_date);
+        CREATE INDEX IF NOT EXISTS idx_payments_member ON payments(member_id, payment_date);
+        """)
+        
+        # Per-member summary kept current by triggers, so the details dialog
+        # can show totals without scanning the member's whole history
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'member_stats'")
+        backfill_stats = self.cursor.fetchone() is None
+        backfill_ledger = False
+        
+        if not backfill_stats:
+            # Stats tables from before the ledger columns: add them and swap
+            # in the payment triggers that maintain them
+            self.cursor.execute("PRAGMA table_info(member_stats)")
+            if "pending_amount" not in [column[1] for column in self.cursor.fetchall()]:
+                self.cursor.executescript("""
+                ALTER TABLE member_stats ADD COLUMN pending_amount REAL DEFAULT 0;
+                ALTER TABLE member_stats ADD COLUMN last_payment_date TEXT;
+                ALTER TABLE member_stats ADD COLUMN next_due_date TEXT;
+                DROP TRIGGER IF EXISTS trg_member_stats_payment;
+                DROP TRIGGER IF EXISTS trg_member_stats_payment_update;
+                """)
+                backfill_ledger = True
+        
+        # total_paid and last_payment_date cover Paid rows, pending_amount and
+        # next_due_date (earliest outstanding due date) cover Pending rows.
+        # The re-deriving triggers are recreated on start, in one transaction
+        # so no other desk's write lands between drop and create, and older
+        # databases pick up the current lookups below.
+        self.cursor.executescript("""
+        BEGIN IMMEDIATE;
+        DROP TRIGGER IF EXISTS trg_member_stats_payment_update;
+        DROP TRIGGER IF EXISTS trg_member_stats_payment_delete;
+        
+        CREATE TABLE IF NOT EXISTS member_stats (
+            member_id INTEGER PRIMARY KEY,
+            visits INTEGER DEFAULT 0,
+            last_visit TEXT,
+            total_paid REAL DEFAULT 0,
+            pending_amount REAL DEFAULT 0,
+            last_payment_date TEXT,
+            next_due_date TEXT,
             FOREIGN KEY(member_id) REFERENCES members(id)
+        );
+        
+        CREATE TRIGGER IF NOT EXISTS trg_member_stats_attendance
+        AFTER INSERT ON attendance
+        BEGIN
+            INSERT OR IGNORE INTO member_stats (member_id) VALUES (NEW.member_id);
+            UPDATE member_stats SET
+                visits = visits + 1,
+                last_visit = MAX(COALESCE(last_visit, ''), NEW.date)
+            WHERE member_id = NEW.member_id;
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS trg_member_stats_payment
+        AFTER INSERT ON payments
+        BEGIN
+            INSERT OR IGNORE INTO member_stats (member_id) VALUES (NEW.member_id);
+            UPDATE member_stats SET
+                total_paid = total_paid + CASE WHEN NEW.status = 'Paid' THEN NEW.amount ELSE 0 END,
+                last_payment_date = CASE WHEN NEW.status = 'Paid'
+                    THEN NULLIF(MAX(COALESCE(last_payment_date, ''), COALESCE(NEW.payment_date, '')), '')
+                    ELSE last_payment_date END,
+                pending_amount = pending_amount + CASE WHEN NEW.status = 'Pending' THEN NEW.amount ELSE 0 END,
+                next_due_date = CASE WHEN NEW.status = 'Pending'
+                    THEN MIN(COALESCE(next_due_date, NEW.due_date), NEW.due_date)
+                    ELSE next_due_date END
+            WHERE member_id = NEW.member_id;
+        END;
+        
+        -- Status changes re-derive the dates from the member's own payments,
+        -- a short range over idx_payments_member / idx_payments_member_due.
+        -- The unary + keeps SQLite off idx_payments_status_due, which would
+        -- walk every pending payment looking for this member's earliest one.
+        CREATE TRIGGER IF NOT EXISTS trg_member_stats_payment_update
+        AFTER UPDATE OF amount, status, payment_date, due_date ON payments
+        BEGIN
+            INSERT OR IGNORE INTO member_stats (member_id) VALUES (NEW.member_id);
+            UPDATE member_stats SET
+                total_paid = total_paid
+                    - CASE WHEN OLD.status = 'Paid' THEN OLD.amount ELSE 0 END
+                    + CASE WHEN NEW.status = 'Paid' THEN NEW.amount ELSE 0 END,
+                pending_amount = pending_amount
+                    - CASE WHEN OLD.status = 'Pending' THEN OLD.amount ELSE 0 END
+                    + CASE WHEN NEW.status = 'Pending' THEN NEW.amount ELSE 0 END,
+                last_payment_date = (SELECT MAX(payment_date) FROM payments
+                                     WHERE member_id = NEW.member_id AND +status = 'Paid'),
+                next_due_date = (SELECT MIN(due_date) FROM payments
+                                 WHERE member_id = NEW.member_id AND +status = 'Pending')
+            WHERE member_id = NEW.member_id;
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS trg_member_stats_payment_delete
+        AFTER DELETE ON payments
+        BEGIN
+            UPDATE member_stats SET
+                total_paid = total_paid - CASE WHEN OLD.status = 'Paid' THEN OLD.amount ELSE 0 END,
+                pending_amount = pending_amount - CASE WHEN OLD.status = 'Pending' THEN OLD.amount ELSE 0 END,
+                last_payment_date = (SELECT MAX(payment_date) FROM payments
+                                     WHERE member_id = OLD.member_id AND +status = 'Paid'),
+                next_due_date = (SELECT MIN(due_date) FROM payments
+                                 WHERE member_id = OLD.member_id AND +status = 'Pending')
+            WHERE member_id = OLD.member_id;
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS trg_member_stats_member_delete
+        AFTER DELETE ON members
+        BEGIN
+            DELETE FROM member_stats WHERE member_id = OLD.id;
+        END;
+        
+        COMMIT;
+        """)
+        
+        # Precomputed reports are dropped when a table they read changes,
+        # unless the changed row is dated after what the result covers.
+        # Recreated on every start so older definitions are replaced.
+        for table, (date_column, columns, report_types) in REPORT_SOURCES.items():
+            stale = ", ".join(f"'{report_type}'" for report_type in report_types)
+            for action, event, rows in [
+                ("insert", "INSERT", ["NEW"]),
+                ("update", f"UPDATE OF {columns}", ["OLD", "NEW"]),
+                ("delete", "DELETE", ["OLD"])
+            ]:
+                covered = " OR ".join(f"{row}.{date_column} < watermark" for row in rows) if date_column else "1"
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS trg_report_results_{table}_{action}")
+                self.cursor.execute(f"""
+                CREATE TRIGGER trg_report_results_{table}_{action}
+                AFTER {event} ON {table}
+                BEGIN
+                    DELETE FROM report_results
+                    WHERE report_type IN ({stale}) AND (watermark IS NULL OR {covered});
+                END
+                """)
+        
+        # Row changes for other workstations, see poll_changes
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            action TEXT NOT NULL,
+            row_id INTEGER
         )
         """)
         
+        # TEMP triggers belong to this connection only, so the workstation
+        # id can be written into them and other tools' writes stay unlogged
+        self.workstation_id = uuid.uuid4().hex
+        for table in CHANGE_LOG_TABLES:
+            for action, row in [("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")]:
+                self.cursor.execute(f"""
+                CREATE TEMP TRIGGER IF NOT EXISTS trg_change_log_{table}_{action}
+                AFTER {action.upper()} ON main.{table}
+                BEGIN
+                    INSERT INTO change_log (source, table_name, action, row_id)
+                    VALUES ('{self.workstation_id}', '{table}', '{action}', {row}.id);
+                END
+                """)
+        
+        if backfill_stats:
+            self.cursor.execute("""
+            INSERT INTO member_stats (member_id, visits, last_visit, total_paid)
+            SELECT
+                m.id,
+                (SELECT COUNT(*) FROM attendance a WHERE a.member_id = m.id),
+                (SELECT MAX(date) FROM attendance a WHERE a.member_id = m.id),
+                (SELECT COALESCE(SUM(amount), 0) FROM payments p
+                 WHERE p.member_id = m.id AND p.status = 'Paid')
+            FROM members m
+            """)
+        
+        if backfill_stats or backfill_ledger:
+            self.cursor.execute("""
+            UPDATE member_stats SET
+                pending_amount = (SELECT COALESCE(SUM(amount), 0) FROM payments p
+                                  WHERE p.member_id = member_stats.member_id AND p.status = 'Pending'),
+                last_payment_date = (SELECT MAX(payment_date) FROM payments p
+                                     WHERE p.member_id = member_stats.member_id AND p.status = 'Paid'),
+                next_due_date = (SELECT MIN(due_date) FROM payments p
+                                 WHERE p.member_id = member_stats.member_id AND p.status = 'Pending')
+            """)
+        
         self.conn.commit()
+        self.load_membership_plans()
+        
+        # 0 means no limit on check-ins
+        self.capacity_limit = int(self.get_setting("capacity_limit", 0))
+        
+        # Open sessions older than auto_checkout_hours (0 = never) are closed
+        # with a time out of time in + imputed_session_minutes
+        self.auto_checkout_hours = int(self.get_setting("auto_checkout_hours", 6))
+        self.imputed_session_minutes = int(self.get_setting("imputed_session_minutes", 60))
+        
+        # Start watching from the current end of the change log
+        self.prune_change_log()
+        self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM change_log")
+        self.change_log_seen = self.cursor.fetchone()[0]
+        self.cursor.execute("PRAGMA data_version")
+        self.data_version = self.cursor.fetchone()[0]
+        self.change_poll_count = 0
+    
+    def prune_change_log(self):
+        with self.write_transaction():
+            self.cursor.execute(
+                "DELETE FROM change_log WHERE id <= (SELECT MAX(id) FROM change_log) - ?", (CHANGE_LOG_KEEP,)
+            )
+    
+    def write_transaction(self):
+        return write_transaction(self.conn)
+    
+    def backfill_engagement(self):
+        # One pass over attendance in member order, replaying the same
+        # per-visit update the check-in path uses
+        self.cursor.execute("SELECT member_id, date FROM attendance WHERE member_id IS NOT NULL ORDER BY member_id, date")
+        
+        updates = []
+        member_id, key, last_visit = None, None, None
+        for visit_member_id, visit_date in self.cursor.fetchall():
+            if visit_member_id != member_id:
+                if member_id is not None:
+                    updates.append((last_visit, key, member_id))
+                member_id, key = visit_member_id, None
+            key = engagement_key_after_visit(key, day_number(visit_date))
+            last_visit = visit_date
+        
+        if member_id is not None:
+            updates.append((last_visit, key, member_id))
+        
+        self.cursor.executemany("UPDATE members SET last_visit = ?, engagement_key = ? WHERE id = ?", updates)
+    
+    def load_membership_plans(self):
+        # In-memory plan cache: name -> duration in months, in display order
+        self.cursor.execute("SELECT name, duration_months, price FROM membership_plans ORDER BY sort_order, name")
+        plans = self.cursor.fetchall()
+        self.membership_plans = {name: months for name, months, price in plans}
+        self.plan_prices = {name: price or 0.0 for name, months, price in plans}
+    
+    def get_setting(self, key, default=None):
+        self.cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
+        row = self.cursor.fetchone()
+        return row[0] if row else default
+    
+    def set_setting(self, key, value):
+        # Part of the caller's transaction; the caller commits
+        self.cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+    
+    def migrate_cascade_foreign_keys(self):
+        # Older databases declared the member foreign keys without ON DELETE
+        # CASCADE. SQLite can't alter a constraint, so those tables are rebuilt
+        # once; their indexes and triggers are recreated by init_db afterwards.
+        for table in ("attendance", "payments"):
+            self.cursor.execute(f"PRAGMA foreign_key_list({table})")
+            if all(foreign_key[6] == "CASCADE" for foreign_key in self.cursor.fetchall()):
+                continue
+            
+            self.cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            create_sql = self.cursor.fetchone()[0]
+            create_sql = create_sql.replace(f"CREATE TABLE {table}", f"CREATE TABLE {table}_rebuild", 1)
+            create_sql = create_sql.replace("REFERENCES members(id)", "REFERENCES members(id) ON DELETE CASCADE")
+            
+            self.cursor.executescript(f"""
+            PRAGMA foreign_keys = OFF;
+            BEGIN;
+            {create_sql};
+            INSERT INTO {table}_rebuild SELECT * FROM {table};
+            DROP TABLE {table};
+            ALTER TABLE {table}_rebuild RENAME TO {table};
+            COMMIT;
+            """)
     
     def init_ui(self):
         # Main widget and layout
@@ -256,11 +2433,13 @@ class GymManagementSystem(QMainWindow):
         self.active_members_card = self.create_stat_card("Active Members", "0", QColor(60, 179, 113), ":/icons/active.png")
         self.expired_members_card = self.create_stat_card("Expired Members", "0", QColor(220, 20, 60), ":/icons/expired.png")
         self.today_attendance_card = self.create_stat_card("Today's Attendance", "0", QColor(255, 140, 0), ":/icons/attendance_today.png")
+        self.occupancy_card = self.create_stat_card("In The Gym Now", "0", QColor(138, 43, 226), ":/icons/attendance_today.png")
         
         stats_layout.addWidget(self.total_members_card)
         stats_layout.addWidget(self.active_members_card)
         stats_layout.addWidget(self.expired_members_card)
         stats_layout.addWidget(self.today_attendance_card)
+        stats_layout.addWidget(self.occupancy_card)
         
         layout.addLayout(stats_layout)
         
@@ -385,16 +2564,23 @@ class GymManagementSystem(QMainWindow):
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Search members...")
         self.search_input.setObjectName("searchInput")
-        self.search_input.textChanged.connect(self.load_members)
+        self.search_input.textChanged.connect(lambda: self.reload_first_page("members"))
         
         self.status_filter = QComboBox()
-        self.status_filter.addItems(["All", "Active", "Expired"])
+        self.status_filter.addItems(["All", "Active", "Expired", "At Risk"])
         self.status_filter.setObjectName("filterCombo")
-        self.status_filter.currentIndexChanged.connect(self.load_members)
+        self.status_filter.currentIndexChanged.connect(lambda: self.reload_first_page("members"))
+        
+        self.membership_filter = QComboBox()
+        self.membership_filter.addItems(["All"] + list(self.membership_plans))
+        self.membership_filter.setObjectName("filterCombo")
+        self.membership_filter.currentIndexChanged.connect(lambda: self.reload_first_page("members"))
         
         filter_layout.addWidget(self.search_input)
         filter_layout.addWidget(QLabel("Status:"))
         filter_layout.addWidget(self.status_filter)
+        filter_layout.addWidget(QLabel("Membership:"))
+        filter_layout.addWidget(self.membership_filter)
         filter_layout.addStretch()
         
         layout.addLayout(filter_layout)
@@ -402,8 +2588,8 @@ class GymManagementSystem(QMainWindow):
         # Members table
         self.members_table = QTableWidget()
         self.members_table.setObjectName("membersTable")
-        self.members_table.setColumnCount(8)
-        self.members_table.setHorizontalHeaderLabels(["ID", "Name", "Phone", "Membership", "Join Date", "Expiry Date", "Status", "Actions"])
+        self.members_table.setColumnCount(9)
+        self.members_table.setHorizontalHeaderLabels(["ID", "Name", "Phone", "Membership", "Join Date", "Expiry Date", "Status", "Balance", "Actions"])
         self.members_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
         self.members_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
         self.members_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
@@ -412,11 +2598,58 @@ class GymManagementSystem(QMainWindow):
         self.members_table.horizontalHeader().setSectionResizeMode(5, QHeaderView.ResizeToContents)
         self.members_table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeToContents)
         self.members_table.horizontalHeader().setSectionResizeMode(7, QHeaderView.ResizeToContents)
+        self.members_table.horizontalHeader().setSectionResizeMode(8, QHeaderView.ResizeToContents)
         self.members_table.verticalHeader().setVisible(False)
         self.members_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.members_table.setSelectionBehavior(QTableWidget.SelectRows)
-        
+        self.members_table.setSelectionMode(QTableWidget.ExtendedSelection)
+        self.setup_sortable_header(self.members_table, "members")
+        
+        # Bulk actions over the selected rows or everything matching the filters
+        bulk_layout = QHBoxLayout()
+        bulk_layout.setSpacing(10)
+        
+        self.bulk_scope_combo = QComboBox()
+        self.bulk_scope_combo.addItems(["Selected Rows", "All Matching Filter"])
+        self.bulk_scope_combo.setObjectName("filterCombo")
+        
+        bulk_renew_btn = QPushButton("Renew by Plan")
+        bulk_renew_btn.setObjectName("actionButton")
+        bulk_renew_btn.clicked.connect(self.bulk_renew_members)
+        
+        self.bulk_extend_days = QSpinBox()
+        self.bulk_extend_days.setRange(1, 365)
+        self.bulk_extend_days.setValue(30)
+        self.bulk_extend_days.setSuffix(" days")
+        
+        bulk_extend_btn = QPushButton("Extend Expiry")
+        bulk_extend_btn.setObjectName("actionButton")
+        bulk_extend_btn.clicked.connect(self.bulk_extend_expiry)
+        
+        self.bulk_status_combo = QComboBox()
+        self.bulk_status_combo.addItems(["Active", "Expired"])
+        
+        bulk_status_btn = QPushButton("Set Status")
+        bulk_status_btn.setObjectName("actionButton")
+        bulk_status_btn.clicked.connect(self.bulk_set_status)
+        
+        bulk_delete_btn = QPushButton("Delete")
+        bulk_delete_btn.setObjectName("actionButton")
+        bulk_delete_btn.clicked.connect(self.bulk_delete_members)
+        
+        bulk_layout.addWidget(QLabel("Bulk:"))
+        bulk_layout.addWidget(self.bulk_scope_combo)
+        bulk_layout.addWidget(bulk_renew_btn)
+        bulk_layout.addWidget(self.bulk_extend_days)
+        bulk_layout.addWidget(bulk_extend_btn)
+        bulk_layout.addWidget(self.bulk_status_combo)
+        bulk_layout.addWidget(bulk_status_btn)
+        bulk_layout.addWidget(bulk_delete_btn)
+        bulk_layout.addStretch()
+        
+        layout.addLayout(bulk_layout)
         layout.addWidget(self.members_table)
+        layout.addLayout(self.create_pager("members"))
         
         self.stacked_widget.addWidget(page)
     
@@ -454,9 +2687,17 @@ class GymManagementSystem(QMainWindow):
         self.date_filter.setDate(QDate.currentDate())
         self.date_filter.setCalendarPopup(True)
         self.date_filter.setObjectName("dateFilter")
-        self.date_filter.dateChanged.connect(self.load_attendance)
+        self.date_filter.dateChanged.connect(lambda: self.reload_first_page("attendance"))
+        
+        self.date_to_filter = QDateEdit()
+        self.date_to_filter.setDate(QDate.currentDate())
+        self.date_to_filter.setCalendarPopup(True)
+        self.date_to_filter.setObjectName("dateFilter")
+        self.date_to_filter.dateChanged.connect(lambda: self.reload_first_page("attendance"))
         
         date_filter_layout.addWidget(self.date_filter)
+        date_filter_layout.addWidget(QLabel("to"))
+        date_filter_layout.addWidget(self.date_to_filter)
         date_filter_layout.addStretch()
         
         layout.addLayout(date_filter_layout)
@@ -475,8 +2716,10 @@ class GymManagementSystem(QMainWindow):
         self.attendance_table.verticalHeader().setVisible(False)
         self.attendance_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.attendance_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.setup_sortable_header(self.attendance_table, "attendance")
         
         layout.addWidget(self.attendance_table)
+        layout.addLayout(self.create_pager("attendance"))
         
         self.stacked_widget.addWidget(page)
     
@@ -498,8 +2741,20 @@ class GymManagementSystem(QMainWindow):
         self.record_payment_btn.setCursor(Qt.PointingHandCursor)
         self.record_payment_btn.clicked.connect(self.show_record_payment_dialog)
         
+        self.run_billing_btn = QPushButton("Run Billing")
+        self.run_billing_btn.setObjectName("addButton")
+        self.run_billing_btn.setCursor(Qt.PointingHandCursor)
+        self.run_billing_btn.clicked.connect(self.run_billing_cycle)
+        
+        self.mark_paid_btn = QPushButton("Mark Paid")
+        self.mark_paid_btn.setObjectName("addButton")
+        self.mark_paid_btn.setCursor(Qt.PointingHandCursor)
+        self.mark_paid_btn.clicked.connect(self.mark_selected_payments_paid)
+        
         header_layout.addWidget(payments_label)
         header_layout.addStretch()
+        header_layout.addWidget(self.mark_paid_btn)
+        header_layout.addWidget(self.run_billing_btn)
         header_layout.addWidget(self.record_payment_btn)
         
         layout.addLayout(header_layout)
@@ -511,16 +2766,43 @@ class GymManagementSystem(QMainWindow):
         self.payment_search_input = QLineEdit()
         self.payment_search_input.setPlaceholderText("Search payments...")
         self.payment_search_input.setObjectName("searchInput")
-        self.payment_search_input.textChanged.connect(self.load_payments)
+        self.payment_search_input.textChanged.connect(lambda: self.reload_first_page("payments"))
         
         self.payment_status_filter = QComboBox()
         self.payment_status_filter.addItems(["All", "Paid", "Pending"])
         self.payment_status_filter.setObjectName("filterCombo")
-        self.payment_status_filter.currentIndexChanged.connect(self.load_payments)
+        self.payment_status_filter.currentIndexChanged.connect(lambda: self.reload_first_page("payments"))
+        
+        self.payment_method_filter = QComboBox()
+        self.payment_method_filter.addItems(["All"] + PAYMENT_METHODS)
+        self.payment_method_filter.setObjectName("filterCombo")
+        self.payment_method_filter.currentIndexChanged.connect(lambda: self.reload_first_page("payments"))
+        
+        # Optional payment date range, off by default so all payments are listed
+        self.payment_date_range_check = QCheckBox("Date:")
+        self.payment_date_range_check.toggled.connect(lambda: self.reload_first_page("payments"))
+        
+        self.payment_start_date = QDateEdit()
+        self.payment_start_date.setDate(QDate.currentDate().addMonths(-1))
+        self.payment_start_date.setCalendarPopup(True)
+        self.payment_start_date.setObjectName("dateFilter")
+        self.payment_start_date.dateChanged.connect(lambda: self.reload_first_page("payments"))
+        
+        self.payment_end_date = QDateEdit()
+        self.payment_end_date.setDate(QDate.currentDate())
+        self.payment_end_date.setCalendarPopup(True)
+        self.payment_end_date.setObjectName("dateFilter")
+        self.payment_end_date.dateChanged.connect(lambda: self.reload_first_page("payments"))
         
         filter_layout.addWidget(self.payment_search_input)
         filter_layout.addWidget(QLabel("Status:"))
         filter_layout.addWidget(self.payment_status_filter)
+        filter_layout.addWidget(QLabel("Method:"))
+        filter_layout.addWidget(self.payment_method_filter)
+        filter_layout.addWidget(self.payment_date_range_check)
+        filter_layout.addWidget(self.payment_start_date)
+        filter_layout.addWidget(QLabel("to"))
+        filter_layout.addWidget(self.payment_end_date)
         filter_layout.addStretch()
         
         layout.addLayout(filter_layout)
@@ -540,8 +2822,10 @@ class GymManagementSystem(QMainWindow):
         self.payments_table.verticalHeader().setVisible(False)
         self.payments_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.payments_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.setup_sortable_header(self.payments_table, "payments")
         
         layout.addWidget(self.payments_table)
+        layout.addLayout(self.create_pager("payments"))
         
         self.stacked_widget.addWidget(page)
     
@@ -567,7 +2851,9 @@ class GymManagementSystem(QMainWindow):
             "Attendance Summary", 
             "Membership Types", 
             "Revenue Analysis", 
-            "Member Growth"
+            "Member Growth",
+            "Peak Hours",
+            "Retention Cohorts"
         ])
         self.report_type_combo.setObjectName("reportCombo")
         
@@ -577,6 +2863,12 @@ class GymManagementSystem(QMainWindow):
         # Date range
         report_type_layout.addWidget(QLabel("Date Range:"))
         
+        self.report_range_combo = QComboBox()
+        self.report_range_combo.addItems(REPORT_WINDOWS + ["Custom"])
+        self.report_range_combo.setObjectName("reportCombo")
+        self.report_range_combo.currentTextChanged.connect(self.apply_report_range)
+        report_type_layout.addWidget(self.report_range_combo)
+        
         self.report_start_date = QDateEdit()
         self.report_start_date.setDate(QDate.currentDate().addMonths(-1))
         self.report_start_date.setCalendarPopup(True)
@@ -591,6 +2883,10 @@ class GymManagementSystem(QMainWindow):
         report_type_layout.addWidget(QLabel("to"))
         report_type_layout.addWidget(self.report_end_date)
         
+        # Editing a date by hand switches the range to Custom
+        self.report_start_date.dateChanged.connect(self.on_report_date_edited)
+        self.report_end_date.dateChanged.connect(self.on_report_date_edited)
+        
         self.generate_report_btn = QPushButton("Generate Report")
         self.generate_report_btn.setObjectName("actionButton")
         self.generate_report_btn.clicked.connect(self.generate_report)
@@ -604,6 +2900,9 @@ class GymManagementSystem(QMainWindow):
         self.report_display.setObjectName("reportDisplay")
         self.report_display.setMinimumHeight(500)
         
+        self.report_layout = QVBoxLayout(self.report_display)
+        self.report_layout.setContentsMargins(20, 20, 20, 20)
+        
         layout.addWidget(self.report_display)
         
         self.stacked_widget.addWidget(page)
@@ -633,31 +2932,79 @@ class GymManagementSystem(QMainWindow):
         gym_name_layout = QHBoxLayout()
         gym_name_layout.addWidget(QLabel("Gym Name:"))
         
-        self.gym_name_input = QLineEdit("FitPro Gym")
+        self.gym_name_input = QLineEdit(self.get_setting("gym_name", "FitPro Gym"))
         gym_name_layout.addWidget(self.gym_name_input)
         gym_name_layout.addStretch()
         
         general_layout.addLayout(gym_name_layout)
         
+        # Billing lead time
+        billing_layout = QHBoxLayout()
+        billing_layout.addWidget(QLabel("Bill Members:"))
+        
+        self.billing_lead_days = QSpinBox()
+        self.billing_lead_days.setRange(0, 60)
+        self.billing_lead_days.setValue(int(self.get_setting("billing_lead_days", 7)))
+        self.billing_lead_days.setSuffix(" days before expiry")
+        billing_layout.addWidget(self.billing_lead_days)
+        billing_layout.addStretch()
+        
+        general_layout.addLayout(billing_layout)
+        
+        # Capacity
+        capacity_layout = QHBoxLayout()
+        capacity_layout.addWidget(QLabel("Capacity:"))
+        
+        self.capacity_input = QSpinBox()
+        self.capacity_input.setRange(0, 10000)
+        self.capacity_input.setValue(self.capacity_limit)
+        self.capacity_input.setSpecialValueText("No limit")
+        self.capacity_input.setSuffix(" members")
+        capacity_layout.addWidget(self.capacity_input)
+        capacity_layout.addStretch()
+        
+        general_layout.addLayout(capacity_layout)
+        
+        # Auto checkout
+        auto_checkout_layout = QHBoxLayout()
+        auto_checkout_layout.addWidget(QLabel("Auto Check-Out After:"))
+        
+        self.auto_checkout_input = QSpinBox()
+        self.auto_checkout_input.setRange(0, 24)
+        self.auto_checkout_input.setValue(self.auto_checkout_hours)
+        self.auto_checkout_input.setSpecialValueText("Never")
+        self.auto_checkout_input.setSuffix(" hours")
+        auto_checkout_layout.addWidget(self.auto_checkout_input)
+        
+        auto_checkout_layout.addWidget(QLabel("Record Session As:"))
+        
+        self.imputed_session_input = QSpinBox()
+        self.imputed_session_input.setRange(1, 24 * 60)
+        self.imputed_session_input.setValue(self.imputed_session_minutes)
+        self.imputed_session_input.setSuffix(" minutes")
+        auto_checkout_layout.addWidget(self.imputed_session_input)
+        auto_checkout_layout.addStretch()
+        
+        general_layout.addLayout(auto_checkout_layout)
+        
         # Membership types
         membership_types_label = QLabel("Membership Types:")
         general_layout.addWidget(membership_types_label)
         
         self.membership_types_table = QTableWidget()
-        self.membership_types_table.setColumnCount(2)
-        self.membership_types_table.setHorizontalHeaderLabels(["Type", "Duration (months)"])
+        self.membership_types_table.setColumnCount(3)
+        self.membership_types_table.setHorizontalHeaderLabels(["Type", "Duration (months)", "Price ($)"])
         self.membership_types_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.membership_types_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        self.membership_types_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
         self.membership_types_table.verticalHeader().setVisible(False)
         
-        # Add default membership types
-        self.membership_types_table.setRowCount(3)
-        self.membership_types_table.setItem(0, 0, QTableWidgetItem("Basic"))
-        self.membership_types_table.setItem(0, 1, QTableWidgetItem("1"))
-        self.membership_types_table.setItem(1, 0, QTableWidgetItem("Standard"))
-        self.membership_types_table.setItem(1, 1, QTableWidgetItem("3"))
-        self.membership_types_table.setItem(2, 0, QTableWidgetItem("Premium"))
-        self.membership_types_table.setItem(2, 1, QTableWidgetItem("12"))
+        # Saved membership plans
+        self.membership_types_table.setRowCount(len(self.membership_plans))
+        for row, (plan, months) in enumerate(self.membership_plans.items()):
+            self.membership_types_table.setItem(row, 0, QTableWidgetItem(plan))
+            self.membership_types_table.setItem(row, 1, QTableWidgetItem(str(months)))
+            self.membership_types_table.setItem(row, 2, QTableWidgetItem(f"{self.plan_prices[plan]:.2f}"))
         
         general_layout.addWidget(self.membership_types_table)
         
@@ -688,6 +3035,223 @@ class GymManagementSystem(QMainWindow):
         
         settings_tabs.addTab(general_tab, "General")
         
+        # Batch renewals
+        renewals_tab = QWidget()
+        renewals_layout = QVBoxLayout(renewals_tab)
+        renewals_layout.setContentsMargins(20, 20, 20, 20)
+        renewals_layout.setSpacing(15)
+        
+        renewals_form = QFormLayout()
+        renewals_form.setHorizontalSpacing(20)
+        renewals_form.setVerticalSpacing(15)
+        
+        self.renewal_plan_combo = QComboBox()
+        self.renewal_plan_combo.addItems(["All Plans"] + list(self.membership_plans))
+        
+        self.renewal_window_days = QSpinBox()
+        self.renewal_window_days.setRange(0, 365)
+        self.renewal_window_days.setValue(7)
+        self.renewal_window_days.setSuffix(" days")
+        
+        self.renewal_include_expired = QCheckBox("Include members already marked Expired")
+        
+        renewals_form.addRow("Plan:", self.renewal_plan_combo)
+        renewals_form.addRow("Expiring within:", self.renewal_window_days)
+        renewals_form.addRow("", self.renewal_include_expired)
+        
+        renewals_layout.addLayout(renewals_form)
+        
+        self.run_renewal_btn = QPushButton("Run Batch Renewal")
+        self.run_renewal_btn.setObjectName("saveButton")
+        self.run_renewal_btn.clicked.connect(self.run_batch_renewal)
+        
+        renewals_layout.addStretch()
+        renewals_layout.addWidget(self.run_renewal_btn)
+        
+        settings_tabs.addTab(renewals_tab, "Renewals")
+        
+        # Reminders
+        reminders_tab = QWidget()
+        reminders_layout = QVBoxLayout(reminders_tab)
+        reminders_layout.setContentsMargins(20, 20, 20, 20)
+        reminders_layout.setSpacing(15)
+        
+        reminders_form = QFormLayout()
+        reminders_form.setHorizontalSpacing(20)
+        reminders_form.setVerticalSpacing(15)
+        
+        self.reminder_window_days = QSpinBox()
+        self.reminder_window_days.setRange(1, 60)
+        self.reminder_window_days.setValue(int(self.get_setting("reminder_days", 7)))
+        self.reminder_window_days.setSuffix(" days")
+        
+        self.reminder_sender_combo = QComboBox()
+        self.reminder_sender_combo.addItems(["File", "SMTP"])
+        self.reminder_sender_combo.setCurrentText(self.get_setting("reminder_sender", "File"))
+        
+        self.reminder_file_input = QLineEdit(self.get_setting("reminder_file", "reminders.mbox"))
+        self.reminder_smtp_input = QLineEdit(self.get_setting("reminder_smtp", "localhost:1025"))
+        self.reminder_from_input = QLineEdit(self.get_setting("reminder_from", "noreply@example.com"))
+        
+        reminders_form.addRow("Remind ahead:", self.reminder_window_days)
+        reminders_form.addRow("Send via:", self.reminder_sender_combo)
+        reminders_form.addRow("Outbox file:", self.reminder_file_input)
+        reminders_form.addRow("SMTP server:", self.reminder_smtp_input)
+        reminders_form.addRow("From address:", self.reminder_from_input)
+        
+        reminders_layout.addLayout(reminders_form)
+        
+        self.reminder_status_label = QLabel()
+        reminders_layout.addWidget(self.reminder_status_label)
+        self.update_reminder_status()
+        
+        self.run_reminders_btn = QPushButton("Queue && Send Reminders")
+        self.run_reminders_btn.setObjectName("saveButton")
+        self.run_reminders_btn.clicked.connect(self.run_reminders)
+        
+        reminders_layout.addStretch()
+        reminders_layout.addWidget(self.run_reminders_btn)
+        
+        settings_tabs.addTab(reminders_tab, "Reminders")
+        
+        # Precomputed reports
+        precompute_tab = QWidget()
+        precompute_layout = QVBoxLayout(precompute_tab)
+        precompute_layout.setContentsMargins(20, 20, 20, 20)
+        precompute_layout.setSpacing(15)
+        
+        precompute_form = QFormLayout()
+        precompute_form.setHorizontalSpacing(20)
+        precompute_form.setVerticalSpacing(15)
+        
+        self.precompute_hour_input = QSpinBox()
+        self.precompute_hour_input.setRange(-1, 23)
+        self.precompute_hour_input.setValue(int(self.get_setting("report_precompute_hour", DEFAULT_PRECOMPUTE_HOUR)))
+        self.precompute_hour_input.setSpecialValueText("Never")
+        self.precompute_hour_input.setSuffix(":00")
+        precompute_form.addRow("Precompute after:", self.precompute_hour_input)
+        
+        # One row per report type: include it, and over which range
+        presets = self.precompute_presets()
+        self.precompute_inputs = {}
+        for report_type in self.report_builders:
+            checkbox = QCheckBox(report_type)
+            checkbox.setChecked(report_type in presets)
+            
+            window_combo = QComboBox()
+            window_combo.addItems(REPORT_WINDOWS)
+            window_combo.setCurrentText(presets.get(report_type, REPORT_WINDOWS[0]))
+            
+            precompute_form.addRow(checkbox, window_combo)
+            self.precompute_inputs[report_type] = (checkbox, window_combo)
+        
+        precompute_layout.addLayout(precompute_form)
+        
+        self.precompute_status_label = QLabel()
+        precompute_layout.addWidget(self.precompute_status_label)
+        self.update_precompute_status()
+        
+        self.run_precompute_btn = QPushButton("Save && Precompute Now")
+        self.run_precompute_btn.setObjectName("saveButton")
+        self.run_precompute_btn.clicked.connect(self.run_report_precompute)
+        
+        precompute_layout.addStretch()
+        precompute_layout.addWidget(self.run_precompute_btn)
+        
+        settings_tabs.addTab(precompute_tab, "Reports")
+        
+        # Archive
+        archive_tab = QWidget()
+        archive_layout = QVBoxLayout(archive_tab)
+        archive_layout.setContentsMargins(20, 20, 20, 20)
+        archive_layout.setSpacing(15)
+        
+        archive_form = QFormLayout()
+        archive_form.setHorizontalSpacing(20)
+        archive_form.setVerticalSpacing(15)
+        
+        self.archive_months_input = QSpinBox()
+        self.archive_months_input.setRange(1, 240)
+        self.archive_months_input.setValue(int(self.get_setting("archive_months", DEFAULT_ARCHIVE_MONTHS)))
+        self.archive_months_input.setSuffix(" months")
+        archive_form.addRow("Archive records older than:", self.archive_months_input)
+        
+        archive_layout.addLayout(archive_form)
+        
+        self.archive_status_label = QLabel()
+        archive_layout.addWidget(self.archive_status_label)
+        self.update_archive_status()
+        
+        self.run_archive_btn = QPushButton("Archive Old Records")
+        self.run_archive_btn.setObjectName("saveButton")
+        self.run_archive_btn.clicked.connect(self.run_archive)
+        
+        archive_layout.addStretch()
+        archive_layout.addWidget(self.run_archive_btn)
+        
+        settings_tabs.addTab(archive_tab, "Archive")
+        
+        # Backups
+        backup_tab = QWidget()
+        backup_layout = QVBoxLayout(backup_tab)
+        backup_layout.setContentsMargins(20, 20, 20, 20)
+        backup_layout.setSpacing(15)
+        
+        backup_form = QFormLayout()
+        backup_form.setHorizontalSpacing(20)
+        backup_form.setVerticalSpacing(15)
+        
+        self.backup_interval_input = QSpinBox()
+        self.backup_interval_input.setRange(0, 24 * 7)
+        self.backup_interval_input.setValue(int(self.get_setting("backup_interval_hours", DEFAULT_BACKUP_INTERVAL_HOURS)))
+        self.backup_interval_input.setSpecialValueText("Never")
+        self.backup_interval_input.setSuffix(" hours")
+        
+        self.backup_keep_input = QSpinBox()
+        self.backup_keep_input.setRange(1, 365)
+        self.backup_keep_input.setValue(int(self.get_setting("backup_keep", DEFAULT_BACKUP_KEEP)))
+        self.backup_keep_input.setSuffix(" backups")
+        
+        self.backup_compress_input = QCheckBox("Compress backups")
+        self.backup_compress_input.setChecked(self.get_setting("backup_compress", "1") == "1")
+        
+        self.backup_sets_combo = QComboBox()
+        
+        backup_form.addRow("Back up every:", self.backup_interval_input)
+        backup_form.addRow("Keep:", self.backup_keep_input)
+        backup_form.addRow("", self.backup_compress_input)
+        backup_form.addRow("Backup set:", self.backup_sets_combo)
+        
+        backup_layout.addLayout(backup_form)
+        
+        self.backup_status_label = QLabel()
+        backup_layout.addWidget(self.backup_status_label)
+        self.update_backup_status()
+        
+        backup_buttons_layout = QHBoxLayout()
+        
+        self.run_backup_btn = QPushButton("Save && Back Up Now")
+        self.run_backup_btn.setObjectName("saveButton")
+        self.run_backup_btn.clicked.connect(self.run_backup)
+        
+        self.verify_backup_btn = QPushButton("Verify")
+        self.verify_backup_btn.setObjectName("actionButton")
+        self.verify_backup_btn.clicked.connect(self.verify_selected_backup)
+        
+        self.restore_backup_btn = QPushButton("Restore")
+        self.restore_backup_btn.setObjectName("actionButton")
+        self.restore_backup_btn.clicked.connect(self.restore_selected_backup)
+        
+        backup_buttons_layout.addWidget(self.verify_backup_btn)
+        backup_buttons_layout.addWidget(self.restore_backup_btn)
+        backup_buttons_layout.addStretch()
+        backup_buttons_layout.addWidget(self.run_backup_btn)
+        
+        backup_layout.addStretch()
+        backup_layout.addLayout(backup_buttons_layout)
+        
+        settings_tabs.addTab(backup_tab, "Backups")
+        
         # Add more tabs as needed...
         
         layout.addWidget(settings_tabs)
@@ -724,112 +3288,270 @@ class GymManagementSystem(QMainWindow):
             else:
                 btn.setStyleSheet("")
     
-    def load_members(self):
+    def setup_sortable_header(self, table, key):
+        # Header clicks sort in SQL rather than client-side
+        self.sortable_tables[key] = table
+        header = table.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        column, order = self.sort_state[key]
+        header.setSortIndicator(column, order)
+        header.sortIndicatorChanged.connect(lambda column, order: self.sort_table(key, column, order))
+    
+    def sort_table(self, key, column, order):
+        if column not in SORT_COLUMNS[key]:
+            # Not sortable (e.g. the Actions column) - put the indicator back
+            header = self.sortable_tables[key].horizontalHeader()
+            previous_column, previous_order = self.sort_state[key]
+            header.blockSignals(True)
+            header.setSortIndicator(previous_column, previous_order)
+            header.blockSignals(False)
+            return
+        
+        self.sort_state[key] = (column, order)
+        self.reload_first_page(key)
+    
+    def sort_expressions(self, key):
+        column, _ = self.sort_state[key]
+        return [expression for expression, _ in SORT_COLUMNS[key][column]] + [SORT_TIEBREAKERS[key]]
+    
+    def order_by_clause(self, key):
+        _, order = self.sort_state[key]
+        direction = "ASC" if order == Qt.AscendingOrder else "DESC"
+        return " ORDER BY " + ", ".join(f"{expression} {direction}" for expression in self.sort_expressions(key))
+    
+    def sort_key_values(self, key, row):
+        column, _ = self.sort_state[key]
+        return tuple(row[position] for _, position in SORT_COLUMNS[key][column]) + (row[0],)
+    
+    def seek_conditions(self, key, start):
+        # Conditions selecting the rows after `start` in sort order, each a
+        # range on the sort key's index; read one after another until the
+        # page is full. SQLite sorts NULLs first, so a nullable key's NULL
+        # rows come before the rest ascending and after them descending.
+        if start is None:
+            return [("", [])]
+        
+        _, order = self.sort_state[key]
+        ascending = order == Qt.AscendingOrder
+        comparison = ">" if ascending else "<"
+        expressions = self.sort_expressions(key)
+        tiebreaker = expressions[-1]
+        
+        if len(expressions) > 2:
+            columns = ", ".join(expressions)
+            placeholders = ", ".join("?" * len(expressions))
+            return [(f"({columns}) {comparison} ({placeholders})", list(start))]
+        
+        expression = expressions[0]
+        value, last_id = start
+        if value is None:
+            conditions = [(f"{expression} IS NULL AND {tiebreaker} {comparison} ?", [last_id])]
+            if ascending:
+                conditions.append((f"{expression} IS NOT NULL", []))
+            return conditions
+        
+        conditions = [(f"({expression}, {tiebreaker}) {comparison} (?, ?)", [value, last_id])]
+        if not ascending:
+            conditions.append((f"{expression} IS NULL", []))
+        return conditions
+    
+    def create_pager(self, key):
+        pager_layout = QHBoxLayout()
+        
+        prev_btn = QPushButton("Previous")
+        prev_btn.setObjectName("actionButton")
+        prev_btn.setCursor(Qt.PointingHandCursor)
+        prev_btn.clicked.connect(lambda: self.change_page(key, -1))
+        
+        page_label = QLabel("Page 1")
+        
+        next_btn = QPushButton("Next")
+        next_btn.setObjectName("actionButton")
+        next_btn.setCursor(Qt.PointingHandCursor)
+        next_btn.clicked.connect(lambda: self.change_page(key, 1))
+        
+        pager_layout.addStretch()
+        pager_layout.addWidget(prev_btn)
+        pager_layout.addWidget(page_label)
+        pager_layout.addWidget(next_btn)
+        
+        self.pagers[key] = (prev_btn, page_label, next_btn)
+        return pager_layout
+    
+    def change_page(self, key, step):
+        pages = self.page_state[key]
+        if step > 0 and self.next_page_start.get(key) is not None:
+            pages.append(self.next_page_start[key])
+        elif step < 0 and len(pages) > 1:
+            pages.pop()
+        self.table_loaders[key]()
+    
+    def reload_first_page(self, key):
+        self.page_state[key] = [None]
+        self.table_loaders[key]()
+    
+    def fetch_page(self, key, query, params):
+        # Seek past the previous page's last sort key rather than OFFSET, so
+        # a deep page costs the same as the first
+        pages = self.page_state[key]
+        order_by = self.order_by_clause(key)
+        
+        # One extra row tells us whether there is a next page without a COUNT(*)
+        rows = []
+        for condition, condition_params in self.seek_conditions(key, pages[-1]):
+            where = f" AND {condition}" if condition else ""
+            self.cursor.execute(
+                query + where + order_by + " LIMIT ?",
+                list(params) + condition_params + [PAGE_SIZE + 1 - len(rows)]
+            )
+            rows.extend(self.cursor.fetchall())
+            if len(rows) > PAGE_SIZE:
+                break
+        
+        rows = rows[:PAGE_SIZE + 1]
+        has_next = len(rows) > PAGE_SIZE
+        self.next_page_start[key] = self.sort_key_values(key, rows[PAGE_SIZE - 1]) if has_next else None
+        
+        prev_btn, page_label, next_btn = self.pagers[key]
+        prev_btn.setEnabled(len(pages) > 1)
+        next_btn.setEnabled(has_next)
+        page_label.setText(f"Page {len(pages)}")
+        
+        return rows[:PAGE_SIZE]
+    
+    def members_query(self):
         search_text = self.search_input.text().strip()
         status_filter = self.status_filter.currentText()
         
-        query = "SELECT id, name, phone, membership_type, join_date, expiry_date, status FROM members WHERE 1=1"
+        # Balance is a primary-key lookup into the materialized ledger
+        query = """
+        SELECT id, name, phone, membership_type, join_date, expiry_date, status,
+            (SELECT pending_amount FROM member_stats s WHERE s.member_id = members.id)
+        FROM members WHERE 1=1
+        """
         params = []
         
         if search_text:
             query += " AND (name LIKE ? OR phone LIKE ?)"
             params.extend([f"%{search_text}%", f"%{search_text}%"])
         
-        if status_filter != "All":
+        if status_filter == "At Risk":
+            # Active members whose engagement has decayed below the threshold,
+            # or who haven't visited since joining a while ago; a range on
+            # idx_members_status_engagement
+            today = datetime.now()
+            grace_date = (today - timedelta(days=ENGAGEMENT_HALF_LIFE_DAYS)).strftime("%Y-%m-%d")
+            query += " AND status = 'Active' AND (engagement_key < ? OR (engagement_key IS NULL AND join_date < ?))"
+            params.extend([at_risk_key(day_number(today.strftime("%Y-%m-%d"))), grace_date])
+        elif status_filter != "All":
             query += " AND status = ?"
             params.append(status_filter)
         
-        query += " ORDER BY name"
+        membership_filter = self.membership_filter.currentText()
+        if membership_filter != "All":
+            query += " AND membership_type = ?"
+            params.append(membership_filter)
         
-        self.cursor.execute(query, params)
-        members = self.cursor.fetchall()
+        return query, params
+    
+    def load_members(self):
+        query, params = self.members_query()
+        members = self.fetch_page("members", query, params)
         
         self.members_table.setRowCount(len(members))
         
         for row, member in enumerate(members):
-            for col, value in enumerate(member[:7]):  # First 7 columns
-                item = QTableWidgetItem(str(value))
-                self.members_table.setItem(row, col, item)
-            
-            # Add action buttons
-            btn_layout = QHBoxLayout()
-            btn_layout.setContentsMargins(0, 0, 0, 0)
-            btn_layout.setSpacing(5)
-            
-            btn_widget = QWidget()
-            btn_widget.setLayout(btn_layout)
-            
-            view_btn = QPushButton()
-            view_btn.setIcon(QIcon(":/icons/view.png"))
-            view_btn.setToolTip("View Details")
-            view_btn.setCursor(Qt.PointingHandCursor)
-            view_btn.setObjectName("actionButton")
-            view_btn.clicked.connect(lambda _, m=member: self.view_member_details(m[0]))
-            
-            edit_btn = QPushButton()
-            edit_btn.setIcon(QIcon(":/icons/edit.png"))
-            edit_btn.setToolTip("Edit")
-            edit_btn.setCursor(Qt.PointingHandCursor)
-            edit_btn.setObjectName("actionButton")
-            edit_btn.clicked.connect(lambda _, m=member: self.edit_member(m[0]))
-            
-            delete_btn = QPushButton()
-            delete_btn.setIcon(QIcon(":/icons/delete.png"))
-            delete_btn.setToolTip("Delete")
-            delete_btn.setCursor(Qt.PointingHandCursor)
-            delete_btn.setObjectName("actionButton")
-            delete_btn.clicked.connect(lambda _, m=member: self.delete_member(m[0]))
-            
-            btn_layout.addWidget(view_btn)
-            btn_layout.addWidget(edit_btn)
-            btn_layout.addWidget(delete_btn)
-            
-            self.members_table.setCellWidget(row, 7, btn_widget)
+            self.fill_member_row(row, member)
     
-    def load_attendance(self):
-        date = self.date_filter.date().toString("yyyy-MM-dd")
+    def fill_member_row(self, row, member):
+        for col, value in enumerate(member[:7]):  # First 7 columns
+            item = QTableWidgetItem(str(value))
+            self.members_table.setItem(row, col, item)
+        
+        self.members_table.setItem(row, 7, QTableWidgetItem(f"${member[7] or 0:.2f}"))
+        
+        # Add action buttons
+        btn_layout = QHBoxLayout()
+        btn_layout.setContentsMargins(0, 0, 0, 0)
+        btn_layout.setSpacing(5)
+        
+        btn_widget = QWidget()
+        btn_widget.setLayout(btn_layout)
+        
+        view_btn = QPushButton()
+        view_btn.setIcon(QIcon(":/icons/view.png"))
+        view_btn.setToolTip("View Details")
+        view_btn.setCursor(Qt.PointingHandCursor)
+        view_btn.setObjectName("actionButton")
+        view_btn.clicked.connect(lambda _, m=member: self.view_member_details(m[0]))
+        
+        edit_btn = QPushButton()
+        edit_btn.setIcon(QIcon(":/icons/edit.png"))
+        edit_btn.setToolTip("Edit")
+        edit_btn.setCursor(Qt.PointingHandCursor)
+        edit_btn.setObjectName("actionButton")
+        edit_btn.clicked.connect(lambda _, m=member: self.edit_member(m[0]))
+        
+        delete_btn = QPushButton()
+        delete_btn.setIcon(QIcon(":/icons/delete.png"))
+        delete_btn.setToolTip("Delete")
+        delete_btn.setCursor(Qt.PointingHandCursor)
+        delete_btn.setObjectName("actionButton")
+        delete_btn.clicked.connect(lambda _, m=member: self.delete_member(m[0]))
+        
+        btn_layout.addWidget(view_btn)
+        btn_layout.addWidget(edit_btn)
+        btn_layout.addWidget(delete_btn)
+        
+        self.members_table.setCellWidget(row, 8, btn_widget)
+    
+    def attendance_query(self):
+        start_date = self.date_filter.date().toString("yyyy-MM-dd")
+        end_date = self.date_to_filter.date().toString("yyyy-MM-dd")
         
         query = """
-        SELECT a.id, m.name, a.date, a.time_in, a.time_out 
+        SELECT a.id, m.name, a.date, a.time_in, a.time_out, a.auto_closed
         FROM attendance a
         JOIN members m ON a.member_id = m.id
-        WHERE a.date = ?
-        ORDER BY a.time_in DESC
+        WHERE a.date BETWEEN ? AND ?
         """
+        return query, [start_date, end_date]
+    
+    def load_attendance(self):
+        query, params = self.attendance_query()
+        attendance_records = self.fetch_page("attendance", query, params)
         
-        self.cursor.execute(query, (date,))
-        attendance_records = self.cursor.fetchall()
-        
+        # Clear leftover Check Out buttons from the previous page
+        self.attendance_table.clearContents()
         self.attendance_table.setRowCount(len(attendance_records))
         
         for row, record in enumerate(attendance_records):
-            for col, value in enumerate(record[:5]):  # First 5 columns
-                item = QTableWidgetItem(str(value))
-                self.attendance_table.setItem(row, col, item)
-            
-            # Calculate duration if time_out exists
-            if record[4]:  # time_out
-                time_in = datetime.strptime(record[3], "%H:%M:%S")
-                time_out = datetime.strptime(record[4], "%H:%M:%S")
-                duration = time_out - time_in
-                hours, remainder = divmod(duration.seconds, 3600)
-                minutes, _ = divmod(remainder, 60)
-                duration_str = f"{hours}h {minutes}m"
-            else:
-                duration_str = "In Progress"
-            
-            duration_item = QTableWidgetItem(duration_str)
-            self.attendance_table.setItem(row, 5, duration_item)
-            
-            # Add action button for check-out if needed
-            if not record[4]:  # No time_out
-                btn_checkout = QPushButton("Check Out")
-                btn_checkout.setObjectName("actionButton")
-                btn_checkout.setCursor(Qt.PointingHandCursor)
-                btn_checkout.clicked.connect(lambda _, r=record: self.check_out_member(r[0]))
-                self.attendance_table.setCellWidget(row, 5, btn_checkout)
+            self.fill_attendance_row(row, record)
     
-    def load_payments(self):
+    def fill_attendance_row(self, row, record):
+        for col, value in enumerate(record[:5]):  # First 5 columns
+            item = QTableWidgetItem(str(value))
+            self.attendance_table.setItem(row, col, item)
+        
+        duration = format_duration(record[3], record[4])
+        if record[5]:
+            duration += " (auto)"
+        
+        duration_item = QTableWidgetItem(duration)
+        self.attendance_table.setItem(row, 5, duration_item)
+        
+        # Add action button for check-out if needed
+        if not record[4]:  # No time_out
+            btn_checkout = QPushButton("Check Out")
+            btn_checkout.setObjectName("actionButton")
+            btn_checkout.setCursor(Qt.PointingHandCursor)
+            btn_checkout.clicked.connect(lambda _, r=record: self.check_out_member(r[0]))
+            self.attendance_table.setCellWidget(row, 5, btn_checkout)
+        else:
+            self.attendance_table.removeCellWidget(row, 5)
+    
+    def payments_query(self):
         search_text = self.payment_search_input.text().strip()
         status_filter = self.payment_status_filter.currentText()
         
@@ -849,42 +3571,142 @@ class GymManagementSystem(QMainWindow):
             query += " AND p.status = ?"
             params.append(status_filter)
         
-        query += " ORDER BY p.payment_date DESC"
+        method_filter = self.payment_method_filter.currentText()
+        if method_filter != "All":
+            query += " AND p.payment_method = ?"
+            params.append(method_filter)
         
-        self.cursor.execute(query, params)
-        payments = self.cursor.fetchall()
+        if self.payment_date_range_check.isChecked():
+            query += " AND p.payment_date BETWEEN ? AND ?"
+            params.extend([
+                self.payment_start_date.date().toString("yyyy-MM-dd"),
+                self.payment_end_date.date().toString("yyyy-MM-dd")
+            ])
+        
+        return query, params
+    
+    def load_payments(self):
+        query, params = self.payments_query()
+        payments = self.fetch_page("payments", query, params)
         
         self.payments_table.setRowCount(len(payments))
         
         for row, payment in enumerate(payments):
-            for col, value in enumerate(payment[:7]):  # All 7 columns
-                item = QTableWidgetItem(str(value))
-                
-                # Format amount as currency
-                if col == 2:
-                    item.setText(f"${float(value):.2f}")
-                
-                self.payments_table.setItem(row, col, item)
+            self.fill_payment_row(row, payment)
     
-    def update_dashboard(self):
-        # Update stats cards
-        self.cursor.execute("SELECT COUNT(*) FROM members")
-        total_members = self.cursor.fetchone()[0]
-        self.total_members_card.findChild(QLabel, "statValue").setText(str(total_members))
+    def fill_payment_row(self, row, payment):
+        for col, value in enumerate(payment[:7]):  # All 7 columns
+            # Pending payments have no payment date or method yet
+            item = QTableWidgetItem("" if value is None else str(value))
+            
+            # Format amount as currency
+            if col == 2:
+                item.setText(f"${float(value):.2f}")
+            
+            self.payments_table.setItem(row, col, item)
+    
+    def on_data_changed(self, table, action, ids):
+        # Apply a row-level change event to the visible pages and dashboard
+        if table in self.sortable_tables:
+            self.apply_row_changes(table, action, ids)
+        
+        if table == "members":
+            self.update_member_cards()
+            if action != "insert":
+                # Attendance and payment rows show member names and cascade
+                # on delete, so re-read just their current page
+                self.load_attendance()
+                self.load_payments()
+            if action == "delete":
+                # Deleting a member cascades to their open session
+                self.occupancy.remove_members(ids)
+                self.update_occupancy_card()
+                self.update_attendance_cards()
+                self.load_recent_activity()
+        elif table == "attendance":
+            self.update_attendance_cards(action, ids)
+            self.update_occupancy_card()
+            self.load_recent_activity()
+        elif table == "payments":
+            # Payments move member balances; re-read the visible members page
+            self.load_members()
+    
+    def apply_row_changes(self, key, action, ids):
+        table = self.sortable_tables[key]
+        
+        if action == "insert":
+            # Where a new row lands depends on the sort, so re-read the current page
+            self.table_loaders[key]()
+            return
+        
+        # Visible rows affected by the event, by id
+        rows_by_id = {}
+        for row in range(table.rowCount()):
+            item = table.item(row, 0)
+            if item is not None and int(item.text()) in ids:
+                rows_by_id[int(item.text())] = row
         
-        self.cursor.execute("SELECT COUNT(*) FROM members WHERE status = 'Active'")
-        active_members = self.cursor.fetchone()[0]
-        self.active_members_card.findChild(QLabel, "statValue").setText(str(active_members))
+        if not rows_by_id:
+            return
+        
+        records = {}
+        if action == "update":
+            query, params = self.row_queries[key]()
+            placeholders = ", ".join("?" * len(rows_by_id))
+            self.cursor.execute(
+                f"{query} AND {SORT_TIEBREAKERS[key]} IN ({placeholders})",
+                list(params) + list(rows_by_id)
+            )
+            records = {record[0]: record for record in self.cursor.fetchall()}
+        
+        # Bottom-up so removing a row doesn't shift the ones still to visit;
+        # rows that no longer match the filters drop out of the page
+        for row_id, row in sorted(rows_by_id.items(), key=lambda entry: entry[1], reverse=True):
+            if row_id in records:
+                self.row_fillers[key](row, records[row_id])
+            else:
+                table.removeRow(row)
+    
+    def update_dashboard(self):
+        self.update_member_cards()
+        self.update_attendance_cards()
+        self.update_occupancy_card()
+        self.load_recent_activity()
+    
+    def update_occupancy_card(self):
+        self.occupancy.sync(datetime.now().strftime("%Y-%m-%d"))
         
-        self.cursor.execute("SELECT COUNT(*) FROM members WHERE status = 'Expired'")
-        expired_members = self.cursor.fetchone()[0]
-        self.expired_members_card.findChild(QLabel, "statValue").setText(str(expired_members))
+        occupancy = str(self.occupancy.count())
+        if self.capacity_limit:
+            occupancy += f" / {self.capacity_limit}"
         
+        self.occupancy_card.findChild(QLabel, "statValue").setText(occupancy)
+    
+    def update_member_cards(self):
+        # Counts are kept incrementally by the member cache
+        status_counts = self.member_cache.counts()
+        self.total_members_card.findChild(QLabel, "statValue").setText(str(sum(status_counts.values())))
+        self.active_members_card.findChild(QLabel, "statValue").setText(str(status_counts["Active"]))
+        self.expired_members_card.findChild(QLabel, "statValue").setText(str(status_counts["Expired"]))
+    
+    def update_attendance_cards(self, action=None, ids=None):
         today = datetime.now().strftime("%Y-%m-%d")
-        self.cursor.execute("SELECT COUNT(*) FROM attendance WHERE date = ?", (today,))
-        today_attendance = self.cursor.fetchone()[0]
-        self.today_attendance_card.findChild(QLabel, "statValue").setText(str(today_attendance))
         
+        if action == "insert" and self.today_attendance[0] == today:
+            # Only the new rows need checking against today's date
+            placeholders = ", ".join("?" * len(ids))
+            self.cursor.execute(
+                f"SELECT COUNT(*) FROM attendance WHERE date = ? AND id IN ({placeholders})",
+                [today] + list(ids)
+            )
+            self.today_attendance = (today, self.today_attendance[1] + self.cursor.fetchone()[0])
+        elif action != "update" or self.today_attendance[0] != today:
+            self.cursor.execute("SELECT COUNT(*) FROM attendance WHERE date = ?", (today,))
+            self.today_attendance = (today, self.cursor.fetchone()[0])
+        
+        self.today_attendance_card.findChild(QLabel, "statValue").setText(str(self.today_attendance[1]))
+    
+    def load_recent_activity(self):
         # Load recent activity (last 10 attendance records)
         self.cursor.execute("""
         SELECT m.name, a.date, a.time_in, a.time_out 
@@ -940,7 +3762,7 @@ class GymManagementSystem(QMainWindow):
         self.member_address_input = QLineEdit()
         
         self.member_type_combo = QComboBox()
-        self.member_type_combo.addItems(["Basic", "Standard", "Premium"])
+        self.member_type_combo.addItems(list(self.membership_plans))
         
         join_date = QDate.currentDate()
         self.member_join_date_input = QDateEdit(join_date)
@@ -990,11 +3812,7 @@ class GymManagementSystem(QMainWindow):
         membership_type = self.member_type_combo.currentText()
         join_date = self.member_join_date_input.date()
         
-        months = 1  # Default to Basic (1 month)
-        if membership_type == "Standard":
-            months = 3
-        elif membership_type == "Premium":
-            months = 12
+        months = self.membership_plans.get(membership_type, 1)
         
         expiry_date = join_date.addMonths(months)
         self.member_expiry_date_input.setDate(expiry_date)
@@ -1008,34 +3826,32 @@ class GymManagementSystem(QMainWindow):
             return
         
         try:
-            self.cursor.execute("""
-            INSERT INTO members (
-                name, gender, dob, phone, email, address, 
-                membership_type, join_date, expiry_date
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                name,
-                self.member_gender_combo.currentText(),
-                self.member_dob_input.date().toString("yyyy-MM-dd"),
-                phone,
-                self.member_email_input.text().strip(),
-                self.member_address_input.text().strip(),
-                self.member_type_combo.currentText(),
-                self.member_join_date_input.date().toString("yyyy-MM-dd"),
-                self.member_expiry_date_input.date().toString("yyyy-MM-dd")
-            ))
-            
-            self.conn.commit()
+            with self.write_transaction():
+                self.cursor.execute("""
+                INSERT INTO members (
+                    name, gender, dob, phone, email, address, 
+                    membership_type, join_date, expiry_date
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    name,
+                    self.member_gender_combo.currentText(),
+                    self.member_dob_input.date().toString("yyyy-MM-dd"),
+                    phone,
+                    self.member_email_input.text().strip(),
+                    self.member_address_input.text().strip(),
+                    self.member_type_combo.currentText(),
+                    self.member_join_date_input.date().toString("yyyy-MM-dd"),
+                    self.member_expiry_date_input.date().toString("yyyy-MM-dd")
+                ))
+            
+            self.change_bus.emit("members", "insert", [self.cursor.lastrowid])
             QMessageBox.information(self, "Success", "Member added successfully!")
-            self.load_members()
-            self.update_dashboard()
             dialog.accept()
         except sqlite3.Error as e:
             QMessageBox.critical(self, "Database Error", f"Failed to add member: {str(e)}")
     
     def view_member_details(self, member_id):
-        self.cursor.execute("SELECT * FROM members WHERE id = ?", (member_id,))
-        member = self.cursor.fetchone()
+        member = self.member_cache.get(member_id)
         
         if not member:
             QMessageBox.warning(self, "Not Found", "Member not found.")
@@ -1058,12 +3874,53 @@ class GymManagementSystem(QMainWindow):
             "Expiry Date:", "Status:"
         ]
         
-        for i, label in enumerate(labels):
-            value = str(member[i]) if member[i] is not None else "N/A"
-            info_layout.addRow(QLabel(label), QLabel(value))
+        for label, field in zip(labels, MEMBER_COLUMNS):
+            value = getattr(member, field)
+            info_layout.addRow(QLabel(label), QLabel(str(value) if value is not None else "N/A"))
         
         layout.addLayout(info_layout)
         
+        # Summary header from the precomputed member_stats row
+        self.cursor.execute("""
+        SELECT visits, total_paid, last_visit, pending_amount, last_payment_date, next_due_date
+        FROM member_stats WHERE member_id = ?
+        """, (member_id,))
+        visits, total_paid, last_visit, pending_amount, last_payment_date, next_due_date = (
+            self.cursor.fetchone() or (0, 0, None, 0, None, None)
+        )
+        
+        today = datetime.now().strftime("%Y-%m-%d")
+        
+        # Attendance cards on one row, payment cards on the next
+        for cards in [
+            [
+                ("Visits", str(visits)),
+                ("Last Visit", last_visit or "Never"),
+                ("Engagement", f"{engagement_score(member.engagement_key, day_number(today)):.1f}"),
+                ("Current Streak", f"{self.attendance_bitmaps.streak(member_id, today)} days"),
+                ("Last 30 Days", f"{self.attendance_bitmaps.days_attended(member_id, today, 30)} visits")
+            ],
+            [
+                ("Total Paid", f"${total_paid:,.2f}"),
+                ("Last Payment", last_payment_date or "Never"),
+                ("Balance Due", f"${pending_amount or 0:,.2f}"),
+                ("Next Due", next_due_date or "-")
+            ]
+        ]:
+            summary_layout = QHBoxLayout()
+            
+            for title, value in cards:
+                card = QFrame()
+                card.setObjectName("statCard")
+                
+                card_layout = QVBoxLayout(card)
+                card_layout.addWidget(QLabel(title))
+                card_layout.addWidget(QLabel(value))
+                
+                summary_layout.addWidget(card)
+            
+            layout.addLayout(summary_layout)
+        
         # Tabs for additional info
         tabs = QTabWidget()
         
@@ -1071,86 +3928,63 @@ class GymManagementSystem(QMainWindow):
         attendance_tab = QWidget()
         attendance_layout = QVBoxLayout(attendance_tab)
         
-        self.member_attendance_table = QTableWidget()
-        self.member_attendance_table.setColumnCount(4)
-        self.member_attendance_table.setHorizontalHeaderLabels(["Date", "Time In", "Time Out", "Duration"])
-        self.member_attendance_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.member_attendance_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.member_attendance_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.member_attendance_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
-        self.member_attendance_table.verticalHeader().setVisible(False)
-        self.member_attendance_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        
-        # Load attendance data
-        self.cursor.execute("""
-        SELECT date, time_in, time_out 
-        FROM attendance 
-        WHERE member_id = ? 
-        ORDER BY date DESC, time_in DESC
-        """, (member_id,))
-        
-        attendance_records = self.cursor.fetchall()
-        self.member_attendance_table.setRowCount(len(attendance_records))
-        
-        for row, record in enumerate(attendance_records):
-            for col, value in enumerate(record[:3]):  # First 3 columns
-                item = QTableWidgetItem(str(value))
-                self.member_attendance_table.setItem(row, col, item)
-            
-            # Calculate duration if time_out exists
-            if record[2]:  # time_out
-                time_in = datetime.strptime(record[1], "%H:%M:%S")
-                time_out = datetime.strptime(record[2], "%H:%M:%S")
-                duration = time_out - time_in
-                hours, remainder = divmod(duration.seconds, 3600)
-                minutes, _ = divmod(remainder, 60)
-                duration_str = f"{hours}h {minutes}m"
-            else:
-                duration_str = "In Progress"
-            
-            duration_item = QTableWidgetItem(duration_str)
-            self.member_attendance_table.setItem(row, 3, duration_item)
+        attendance_table = QTableWidget()
+        attendance_table.setColumnCount(4)
+        attendance_table.setHorizontalHeaderLabels(["Date", "Time In", "Time Out", "Duration"])
+        attendance_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        attendance_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        attendance_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        attendance_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        attendance_table.verticalHeader().setVisible(False)
+        attendance_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        
+        # History is paged in as the user scrolls
+        attendance_pager = HistoryPager(
+            self.conn, attendance_table,
+            """
+            SELECT date, time_in, time_out 
+            FROM all_attendance 
+            WHERE member_id = ? 
+            ORDER BY date DESC, time_in DESC
+            """,
+            (member_id,),
+            lambda r: [str(r[0]), str(r[1]), str(r[2]), format_duration(r[1], r[2])]
+        )
         
-        attendance_layout.addWidget(self.member_attendance_table)
+        attendance_layout.addWidget(attendance_table)
         tabs.addTab(attendance_tab, "Attendance")
         
         # Payment history
         payment_tab = QWidget()
         payment_layout = QVBoxLayout(payment_tab)
         
-        self.member_payments_table = QTableWidget()
-        self.member_payments_table.setColumnCount(5)
-        self.member_payments_table.setHorizontalHeaderLabels(["Date", "Amount", "Due Date", "Status", "Method"])
-        self.member_payments_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.member_payments_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.member_payments_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.member_payments_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
-        self.member_payments_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
-        self.member_payments_table.verticalHeader().setVisible(False)
-        self.member_payments_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        
-        # Load payment data
-        self.cursor.execute("""
-        SELECT payment_date, amount, due_date, status, payment_method 
-        FROM payments 
-        WHERE member_id = ? 
-        ORDER BY payment_date DESC
-        """, (member_id,))
-        
-        payment_records = self.cursor.fetchall()
-        self.member_payments_table.setRowCount(len(payment_records))
+        payments_table = QTableWidget()
+        payments_table.setColumnCount(5)
+        payments_table.setHorizontalHeaderLabels(["Date", "Amount", "Due Date", "Status", "Method"])
+        payments_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        payments_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        payments_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        payments_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        payments_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        payments_table.verticalHeader().setVisible(False)
+        payments_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        
+        payments_pager = HistoryPager(
+            self.conn, payments_table,
+            """
+            SELECT payment_date, amount, due_date, status, payment_method 
+            FROM all_payments 
+            WHERE member_id = ? 
+            ORDER BY payment_date DESC, id DESC
+            """,
+            (member_id,),
+            lambda r: [r[0] or "", f"${float(r[1]):.2f}", str(r[2]), str(r[3]), r[4] or ""]
+        )
         
-        for row, record in enumerate(payment_records):
-            for col, value in enumerate(record[:5]):  # All 5 columns
-                item = QTableWidgetItem(str(value))
-                
-                # Format amount as currency
-                if col == 1:
-                    item.setText(f"${float(value):.2f}")
-                
-                self.member_payments_table.setItem(row, col, item)
+        # Keep the pagers alive for as long as the dialog is open
+        dialog.history_pagers = [attendance_pager, payments_pager]
         
-        payment_layout.addWidget(self.member_payments_table)
+        payment_layout.addWidget(payments_table)
         tabs.addTab(payment_tab, "Payments")
         
         layout.addWidget(tabs)
@@ -1169,8 +4003,7 @@ class GymManagementSystem(QMainWindow):
         dialog.exec_()
     
     def edit_member(self, member_id):
-        self.cursor.execute("SELECT * FROM members WHERE id = ?", (member_id,))
-        member = self.cursor.fetchone()
+        member = self.member_cache.get(member_id)
         
         if not member:
             QMessageBox.warning(self, "Not Found", "Member not found.")
@@ -1188,36 +4021,40 @@ class GymManagementSystem(QMainWindow):
         form_layout.setVerticalSpacing(15)
         
         self.edit_member_id = member_id
-        self.edit_name_input = QLineEdit(member[1])
+        # What the dialog started from, for merging with edits saved meanwhile
+        self.edit_member_base = {field: getattr(member, field) for field in MEMBER_EDIT_FIELDS}
+        self.edit_member_version = member.row_version
+        self.edit_name_input = QLineEdit(member.name)
         self.edit_gender_combo = QComboBox()
         self.edit_gender_combo.addItems(["Male", "Female", "Other"])
-        self.edit_gender_combo.setCurrentText(member[2] if member[2] else "Male")
+        self.edit_gender_combo.setCurrentText(member.gender if member.gender else "Male")
         
-        dob = QDate.fromString(member[3], "yyyy-MM-dd") if member[3] else QDate.currentDate()
+        dob = QDate.fromString(member.dob, "yyyy-MM-dd") if member.dob else QDate.currentDate()
         self.edit_dob_input = QDateEdit(dob)
         self.edit_dob_input.setCalendarPopup(True)
         self.edit_dob_input.setMaximumDate(QDate.currentDate())
         
-        self.edit_phone_input = QLineEdit(member[4])
-        self.edit_email_input = QLineEdit(member[5])
-        self.edit_address_input = QLineEdit(member[6])
+        self.edit_phone_input = QLineEdit(member.phone)
+        self.edit_email_input = QLineEdit(member.email)
+        self.edit_address_input = QLineEdit(member.address)
         
         self.edit_type_combo = QComboBox()
-        self.edit_type_combo.addItems(["Basic", "Standard", "Premium"])
-        self.edit_type_combo.setCurrentText(member[7] if member[7] else "Basic")
+        self.edit_type_combo.addItems(list(self.membership_plans))
+        if member.membership_type:
+            self.edit_type_combo.setCurrentText(member.membership_type)
         
-        join_date = QDate.fromString(member[8], "yyyy-MM-dd") if member[8] else QDate.currentDate()
+        join_date = QDate.fromString(member.join_date, "yyyy-MM-dd") if member.join_date else QDate.currentDate()
         self.edit_join_date_input = QDateEdit(join_date)
         self.edit_join_date_input.setCalendarPopup(True)
         self.edit_join_date_input.setMaximumDate(QDate.currentDate())
         
-        expiry_date = QDate.fromString(member[9], "yyyy-MM-dd") if member[9] else QDate.currentDate().addMonths(1)
+        expiry_date = QDate.fromString(member.expiry_date, "yyyy-MM-dd") if member.expiry_date else QDate.currentDate().addMonths(1)
         self.edit_expiry_date_input = QDateEdit(expiry_date)
         self.edit_expiry_date_input.setCalendarPopup(True)
         
         self.edit_status_combo = QComboBox()
         self.edit_status_combo.addItems(["Active", "Expired"])
-        self.edit_status_combo.setCurrentText(member[10] if member[10] else "Active")
+        self.edit_status_combo.setCurrentText(member.status if member.status else "Active")
         
         # Connect signals for auto-updating expiry date
         self.edit_type_combo.currentTextChanged.connect(lambda: self.update_edit_expiry_date())
@@ -1259,11 +4096,7 @@ class GymManagementSystem(QMainWindow):
         membership_type = self.edit_type_combo.currentText()
         join_date = self.edit_join_date_input.date()
         
-        months = 1  # Default to Basic (1 month)
-        if membership_type == "Standard":
-            months = 3
-        elif membership_type == "Premium":
-            months = 12
+        months = self.membership_plans.get(membership_type, 1)
         
         expiry_date = join_date.addMonths(months)
         self.edit_expiry_date_input.setDate(expiry_date)
@@ -1276,33 +4109,80 @@ class GymManagementSystem(QMainWindow):
             QMessageBox.warning(self, "Validation Error", "Name and phone are required fields.")
             return
         
+        mine = {
+            "name": name,
+            "gender": self.edit_gender_combo.currentText(),
+            "dob": self.edit_dob_input.date().toString("yyyy-MM-dd"),
+            "phone": phone,
+            "email": self.edit_email_input.text().strip(),
+            "address": self.edit_address_input.text().strip(),
+            "membership_type": self.edit_type_combo.currentText(),
+            "join_date": self.edit_join_date_input.date().toString("yyyy-MM-dd"),
+            "expiry_date": self.edit_expiry_date_input.date().toString("yyyy-MM-dd"),
+            "status": self.edit_status_combo.currentText(),
+        }
+        
         try:
-            self.cursor.execute("""
-            UPDATE members SET
-                name = ?, gender = ?, dob = ?, phone = ?, email = ?, address = ?,
-                membership_type = ?, join_date = ?, expiry_date = ?, status = ?
-            WHERE id = ?
-            """, (
-                name,
-                self.edit_gender_combo.currentText(),
-                self.edit_dob_input.date().toString("yyyy-MM-dd"),
-                phone,
-                self.edit_email_input.text().strip(),
-                self.edit_address_input.text().strip(),
-                self.edit_type_combo.currentText(),
-                self.edit_join_date_input.date().toString("yyyy-MM-dd"),
-                self.edit_expiry_date_input.date().toString("yyyy-MM-dd"),
-                self.edit_status_combo.currentText(),
-                self.edit_member_id
-            ))
-            
-            self.conn.commit()
-            QMessageBox.information(self, "Success", "Member updated successfully!")
-            self.load_members()
-            self.update_dashboard()
-            dialog.accept()
+            # Optimistic concurrency: if row_version moved since the dialog
+            # opened, someone else saved first and their changes are merged in
+            while True:
+                with self.write_transaction():
+                    self.cursor.execute(
+                        f"SELECT {', '.join(MEMBER_EDIT_FIELDS)}, row_version FROM members WHERE id = ?",
+                        (self.edit_member_id,)
+                    )
+                    row = self.cursor.fetchone()
+                    if row is None:
+                        break
+                    
+                    theirs = dict(zip(MEMBER_EDIT_FIELDS, row))
+                    if row[-1] == self.edit_member_version:
+                        values, conflicts = mine, []
+                    else:
+                        values, conflicts = merge_member_edits(self.edit_member_base, theirs, mine)
+                    
+                    if not conflicts:
+                        self.cursor.execute(
+                            f"UPDATE members SET {', '.join(f'{field} = :{field}' for field in MEMBER_EDIT_FIELDS)} "
+                            "WHERE id = :id",
+                            dict(values, id=self.edit_member_id)
+                        )
+                        break
+                
+                # Conflicts are settled with the user outside the transaction,
+                # then the save is retried against the version they were shown
+                details = "\n".join(
+                    f"{MEMBER_EDIT_FIELDS[field]}: yours \"{mine[field]}\", theirs \"{theirs[field] or ''}\""
+                    for field in conflicts
+                )
+                reply = QMessageBox.question(
+                    self, "Edit Conflict",
+                    f"This member was changed on another workstation while you were editing:\n\n{details}\n\n"
+                    "Keep your values? Choose No to keep theirs.",
+                    QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Cancel
+                )
+                if reply == QMessageBox.Cancel:
+                    return
+                
+                if reply == QMessageBox.No:
+                    for field in conflicts:
+                        values[field] = theirs[field]
+                
+                mine = values
+                self.edit_member_base = theirs
+                self.edit_member_version = row[-1]
         except sqlite3.Error as e:
             QMessageBox.critical(self, "Database Error", f"Failed to update member: {str(e)}")
+            return
+        
+        if row is None:
+            QMessageBox.warning(self, "Not Found", "This member was deleted on another workstation.")
+            dialog.reject()
+            return
+        
+        self.change_bus.emit("members", "update", [self.edit_member_id])
+        QMessageBox.information(self, "Success", "Member updated successfully!")
+        dialog.accept()
     
     def delete_member(self, member_id):
         reply = QMessageBox.question(
@@ -1313,22 +4193,124 @@ class GymManagementSystem(QMainWindow):
         
         if reply == QMessageBox.Yes:
             try:
-                # Delete attendance records first (foreign key constraint)
-                self.cursor.execute("DELETE FROM attendance WHERE member_id = ?", (member_id,))
-                
-                # Delete payment records
-                self.cursor.execute("DELETE FROM payments WHERE member_id = ?", (member_id,))
+                # Attendance and payment records go with it via ON DELETE CASCADE
+                with self.write_transaction():
+                    self.cursor.execute("DELETE FROM members WHERE id = ?", (member_id,))
                 
-                # Delete member
-                self.cursor.execute("DELETE FROM members WHERE id = ?", (member_id,))
-                
-                self.conn.commit()
+                self.change_bus.emit("members", "delete", [member_id])
                 QMessageBox.information(self, "Success", "Member deleted successfully!")
-                self.load_members()
-                self.update_dashboard()
             except sqlite3.Error as e:
                 QMessageBox.critical(self, "Database Error", f"Failed to delete member: {str(e)}")
     
+    def stage_bulk_member_ids(self, stage_query=None):
+        # Put the targeted ids in a temp table so each bulk statement is a
+        # single set-based UPDATE/DELETE joined against it
+        self.cursor.execute("DELETE FROM temp.bulk_ids")
+        
+        if stage_query is not None:
+            query, params = stage_query
+            self.cursor.execute(f"INSERT INTO temp.bulk_ids {query}", params)
+        elif self.bulk_scope_combo.currentText() == "All Matching Filter":
+            query, params = self.members_query()
+            self.cursor.execute(f"INSERT INTO temp.bulk_ids SELECT id FROM ({query})", params)
+        else:
+            selected_rows = self.members_table.selectionModel().selectedRows()
+            self.cursor.executemany(
+                "INSERT INTO temp.bulk_ids (id) VALUES (?)",
+                [(int(self.members_table.item(index.row(), 0).text()),) for index in selected_rows]
+            )
+        
+        self.cursor.execute("SELECT id FROM temp.bulk_ids")
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def run_bulk_member_action(self, description, statements, action="update", stage_query=None):
+        try:
+            # Counted for the confirmation, then rolled back so no snapshot is
+            # held while the question is open; a write from another
+            # workstation meanwhile would make the write below fail
+            member_ids = self.stage_bulk_member_ids(stage_query)
+            self.conn.rollback()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            QMessageBox.critical(self, "Database Error", f"Bulk action failed: {str(e)}")
+            return
+        
+        if not member_ids:
+            QMessageBox.warning(self, "No Members", "No members matched this action.")
+            return
+        
+        reply = QMessageBox.question(
+            self, "Confirm Bulk Action",
+            f"{description} for {len(member_ids)} member(s)?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        
+        if reply != QMessageBox.Yes:
+            return
+        
+        try:
+            # Staged again and written in one short transaction
+            with self.write_transaction():
+                member_ids = self.stage_bulk_member_ids(stage_query)
+                for statement, params in statements:
+                    self.cursor.execute(statement, params)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Bulk action failed: {str(e)}")
+            return
+        
+        self.change_bus.emit("members", action, member_ids)
+        QMessageBox.information(self, "Success", f"Updated {len(member_ids)} member(s).")
+    
+    def bulk_renew_members(self):
+        today = datetime.now().strftime("%Y-%m-%d")
+        self.run_bulk_member_action("Renew membership by plan", [(RENEWAL_SQL, {"today": today})])
+    
+    def run_batch_renewal(self):
+        # Renew every member of a plan whose membership ends within the window,
+        # as one UPDATE over the expiry_date index
+        today = datetime.now().strftime("%Y-%m-%d")
+        through = (datetime.now() + timedelta(days=self.renewal_window_days.value())).strftime("%Y-%m-%d")
+        
+        query = "SELECT id FROM members WHERE expiry_date <= ?"
+        params = [through]
+        
+        plan = self.renewal_plan_combo.currentText()
+        if plan != "All Plans":
+            query += " AND membership_type = ?"
+            params.append(plan)
+        
+        if not self.renewal_include_expired.isChecked():
+            query += " AND status = 'Active'"
+        
+        self.run_bulk_member_action(
+            f"Renew {plan} memberships expiring by {through}",
+            [(RENEWAL_SQL, {"today": today})],
+            stage_query=(query, params)
+        )
+    
+    def bulk_extend_expiry(self):
+        days = self.bulk_extend_days.value()
+        today = datetime.now().strftime("%Y-%m-%d")
+        
+        self.run_bulk_member_action(f"Extend expiry by {days} days", [("""
+            UPDATE members SET expiry_date = date(COALESCE(expiry_date, ?), ?)
+            WHERE id IN (SELECT id FROM temp.bulk_ids)
+            """, (today, f"+{days} days"))])
+    
+    def bulk_set_status(self):
+        status = self.bulk_status_combo.currentText()
+        
+        self.run_bulk_member_action(f"Set status to {status}", [(
+            "UPDATE members SET status = ? WHERE id IN (SELECT id FROM temp.bulk_ids)", (status,)
+        )])
+    
+    def bulk_delete_members(self):
+        self.run_bulk_member_action(
+            "Delete members with their attendance and payment records",
+            [("DELETE FROM members WHERE id IN (SELECT id FROM temp.bulk_ids)", ())],
+            action="delete"
+        )
+    
     def show_mark_attendance_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Mark Attendance")
@@ -1340,17 +4322,11 @@ class GymManagementSystem(QMainWindow):
         member_layout = QHBoxLayout()
         member_layout.addWidget(QLabel("Member:"))
         
-        self.attendance_member_combo = QComboBox()
-        self.attendance_member_combo.setObjectName("memberCombo")
+        # Typeahead over the shared member cache's active members
+        self.attendance_member_picker = MemberPicker(self.member_cache)
+        self.attendance_member_picker.setObjectName("memberCombo")
         
-        # Load active members
-        self.cursor.execute("SELECT id, name FROM members WHERE status = 'Active' ORDER BY name")
-        members = self.cursor.fetchall()
-        
-        for member in members:
-            self.attendance_member_combo.addItem(member[1], member[0])
-        
-        member_layout.addWidget(self.attendance_member_combo)
+        member_layout.addWidget(self.attendance_member_picker)
         layout.addLayout(member_layout)
         
         # Check-in/out selection
@@ -1379,182 +4355,928 @@ class GymManagementSystem(QMainWindow):
         dialog.exec_()
     
     def save_attendance(self, dialog):
-        member_id = self.attendance_member_combo.currentData()
+        member_id = self.attendance_member_picker.member_id()
         action = self.attendance_action_combo.currentText()
         today = datetime.now().strftime("%Y-%m-%d")
         now = datetime.now().strftime("%H:%M:%S")
         
+        if member_id is None:
+            QMessageBox.warning(self, "Validation Error", "Please choose a member from the suggestions.")
+            return
+        
+        # Open sessions come from the occupancy tracker, not a query
+        self.occupancy.sync(today)
+        session_id = self.occupancy.session_for(member_id)
+        
         try:
             if action == "Check In":
-                # Check if already checked in today
-                self.cursor.execute("""
-                SELECT id FROM attendance 
-                WHERE member_id = ? AND date = ? AND time_out IS NULL
-                """, (member_id, today))
-                
-                if self.cursor.fetchone():
+                if session_id is not None:
                     QMessageBox.warning(self, "Already Checked In", "This member is already checked in today.")
                     return
                 
-                # Record check-in
-                self.cursor.execute("""
-                INSERT INTO attendance (member_id, date, time_in)
-                VALUES (?, ?, ?)
-                """, (member_id, today, now))
+                if self.capacity_limit and self.occupancy.count() >= self.capacity_limit:
+                    QMessageBox.warning(self, "At Capacity", f"The gym is at its capacity of {self.capacity_limit} members.")
+                    return
                 
-                self.conn.commit()
-                QMessageBox.information(self, "Success", "Check-in recorded successfully!")
-            else:  # Check Out
-                # Find open check-in record
-                self.cursor.execute("""
-                SELECT id FROM attendance 
-                WHERE member_id = ? AND date = ? AND time_out IS NULL
-                ORDER BY time_in DESC
-                LIMIT 1
-                """, (member_id, today))
+                # Loaded up front, a first load may rebuild and commit
+                self.attendance_bitmaps.ensure_loaded()
                 
-                record = self.cursor.fetchone()
+                with self.write_transaction():
+                    # Another workstation may have checked them in since the last poll
+                    self.cursor.execute(
+                        "SELECT id FROM attendance WHERE date = ? AND member_id = ? AND time_out IS NULL",
+                        (today, member_id)
+                    )
+                    open_session = self.cursor.fetchone()
+                    
+                    if open_session is None:
+                        # Record check-in
+                        self.cursor.execute("""
+                        INSERT INTO attendance (member_id, date, time_in)
+                        VALUES (?, ?, ?)
+                        """, (member_id, today, now))
+                        session_id = self.cursor.lastrowid
+                        
+                        # Engagement update from the stored key, no history read
+                        self.cursor.execute("SELECT engagement_key FROM members WHERE id = ?", (member_id,))
+                        key = engagement_key_after_visit(self.cursor.fetchone()[0], day_number(today))
+                        self.cursor.execute(
+                            "UPDATE members SET last_visit = ?, engagement_key = ? WHERE id = ?", (today, key, member_id)
+                        )
+                        day_bits = self.attendance_bitmaps.add(today, member_id)
                 
-                if not record:
+                if open_session is not None:
+                    QMessageBox.warning(self, "Already Checked In", "This member is already checked in today.")
+                    return
+                
+                self.attendance_bitmaps.set_day(today, day_bits)
+                self.occupancy.check_in(member_id, session_id)
+                self.change_bus.emit("attendance", "insert", [session_id])
+                # last_visit and engagement_key changed too (the member
+                # cache drops its copy on this event)
+                self.change_bus.emit("members", "update", [member_id])
+                QMessageBox.information(self, "Success", "Check-in recorded successfully!")
+            else:  # Check Out
+                if session_id is None:
                     QMessageBox.warning(self, "No Check-In", "No check-in found for this member today.")
                     return
                 
                 # Record check-out
-                self.cursor.execute("""
-                UPDATE attendance SET time_out = ?
-                WHERE id = ?
-                """, (now, record[0]))
+                with self.write_transaction():
+                    self.cursor.execute("""
+                    UPDATE attendance SET time_out = ?
+                    WHERE id = ?
+                    """, (now, session_id))
                 
-                self.conn.commit()
+                self.occupancy.check_out(session_id)
+                self.change_bus.emit("attendance", "update", [session_id])
                 QMessageBox.information(self, "Success", "Check-out recorded successfully!")
             
-            self.load_attendance()
-            self.update_dashboard()
             dialog.accept()
         except sqlite3.Error as e:
             QMessageBox.critical(self, "Database Error", f"Failed to record attendance: {str(e)}")
     
-    def check_out_member(self, attendance_id):
-        now = datetime.now().strftime("%H:%M:%S")
+    def auto_checkout_sessions(self):
+        if not self.auto_checkout_hours:
+            return
+        
+        cutoff = datetime.now() - timedelta(hours=self.auto_checkout_hours)
+        cutoff_date = cutoff.strftime("%Y-%m-%d")
+        cutoff_time = cutoff.strftime("%H:%M:%S")
+        
+        # Each session is closed at time_in plus the imputed length, capped
+        # at the auto-checkout window and at midnight of the session's day
+        minutes = min(self.imputed_session_minutes, self.auto_checkout_hours * 60)
+        
+        # Stale sessions, found through the open-session partial index
+        stale = """
+        time_out IS NULL AND date <= :cutoff_date
+        AND (date < :cutoff_date OR time_in <= :cutoff_time)
+        """
+        params = {"cutoff_date": cutoff_date, "cutoff_time": cutoff_time, "offset": f"+{minutes} minutes"}
+        
+        try:
+            # One statement, so the sessions reported are exactly those closed
+            with self.write_transaction():
+                self.cursor.execute(f"""
+                UPDATE attendance SET
+                    time_out = CASE WHEN time(time_in, :offset) < time_in THEN '23:59:59'
+                                    ELSE time(time_in, :offset) END,
+                    auto_closed = 1
+                WHERE {stale}
+                RETURNING id
+                """, params)
+                session_ids = [row[0] for row in self.cursor.fetchall()]
+        except sqlite3.Error:
+            # Nothing was closed; the next scheduled run tries again
+            return
+        
+        if not session_ids:
+            return
+        
+        for session_id in session_ids:
+            self.occupancy.check_out(session_id)
+        
+        self.change_bus.emit("attendance", "update", session_ids)
+    
+    def check_out_member(self, attendance_id):
+        now = datetime.now().strftime("%H:%M:%S")
+        
+        try:
+            with self.write_transaction():
+                self.cursor.execute("""
+                UPDATE attendance SET time_out = ?
+                WHERE id = ?
+                """, (now, attendance_id))
+            
+            self.occupancy.check_out(attendance_id)
+            self.change_bus.emit("attendance", "update", [attendance_id])
+            QMessageBox.information(self, "Success", "Check-out recorded successfully!")
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to record check-out: {str(e)}")
+    
+    def show_record_payment_dialog(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Record Payment")
+        dialog.setMinimumWidth(500)
+        
+        layout = QVBoxLayout(dialog)
+        
+        # Form fields
+        form_layout = QFormLayout()
+        form_layout.setHorizontalSpacing(20)
+        form_layout.setVerticalSpacing(15)
+        
+        # Member selection
+        # Typeahead over the shared member cache's active members
+        self.payment_member_picker = MemberPicker(self.member_cache)
+        self.payment_member_picker.setObjectName("memberCombo")
+        
+        form_layout.addRow("Member:", self.payment_member_picker)
+        
+        # Amount
+        self.payment_amount_input = QLineEdit()
+        self.payment_amount_input.setValidator(QDoubleValidator(0, 9999, 2))
+        form_layout.addRow("Amount ($):", self.payment_amount_input)
+        
+        # Payment date
+        self.payment_date_input = QDateEdit(QDate.currentDate())
+        self.payment_date_input.setCalendarPopup(True)
+        form_layout.addRow("Payment Date:", self.payment_date_input)
+        
+        # Due date (default to 1 month from now)
+        self.payment_due_date_input = QDateEdit(QDate.currentDate().addMonths(1))
+        self.payment_due_date_input.setCalendarPopup(True)
+        form_layout.addRow("Due Date:", self.payment_due_date_input)
+        
+        # Payment method
+        self.payment_method_combo = QComboBox()
+        self.payment_method_combo.addItems(PAYMENT_METHODS)
+        form_layout.addRow("Payment Method:", self.payment_method_combo)
+        
+        layout.addLayout(form_layout)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        
+        save_btn = QPushButton("Record Payment")
+        save_btn.setObjectName("saveButton")
+        save_btn.clicked.connect(lambda: self.save_payment(dialog))
+        
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.setObjectName("cancelButton")
+        cancel_btn.clicked.connect(dialog.reject)
+        
+        button_layout.addStretch()
+        button_layout.addWidget(cancel_btn)
+        button_layout.addWidget(save_btn)
+        
+        layout.addLayout(button_layout)
+        
+        dialog.exec_()
+    
+    def save_payment(self, dialog):
+        member_id = self.payment_member_picker.member_id()
+        amount = self.payment_amount_input.text().strip()
+        
+        if member_id is None:
+            QMessageBox.warning(self, "Validation Error", "Please choose a member from the suggestions.")
+            return
+        
+        if not amount or float(amount) <= 0:
+            QMessageBox.warning(self, "Validation Error", "Please enter a valid payment amount.")
+            return
+        
+        try:
+            with self.write_transaction():
+                self.cursor.execute("""
+                INSERT INTO payments (
+                    member_id, amount, payment_date, due_date, payment_method
+                ) VALUES (?, ?, ?, ?, ?)
+                """, (
+                    member_id,
+                    float(amount),
+                    self.payment_date_input.date().toString("yyyy-MM-dd"),
+                    self.payment_due_date_input.date().toString("yyyy-MM-dd"),
+                    self.payment_method_combo.currentText()
+                ))
+            
+                # Update member's expiry date if this is a membership payment
+                # (This is a simplified approach - you might want to make it more sophisticated)
+                self.cursor.execute("""
+                UPDATE members SET expiry_date = ?
+                WHERE id = ? AND expiry_date < ?
+                """, (
+                    self.payment_due_date_input.date().toString("yyyy-MM-dd"),
+                    member_id,
+                    self.payment_due_date_input.date().toString("yyyy-MM-dd")
+                ))
+            
+            self.change_bus.emit("payments", "insert", [self.cursor.lastrowid])
+            self.change_bus.emit("members", "update", [member_id])
+            QMessageBox.information(self, "Success", "Payment recorded successfully!")
+            dialog.accept()
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to record payment: {str(e)}")
+    
+    def run_billing_cycle(self):
+        today = datetime.now().strftime("%Y-%m-%d")
+        lead_days = int(self.get_setting("billing_lead_days", 7))
+        bill_through = (datetime.now() + timedelta(days=lead_days)).strftime("%Y-%m-%d")
+        
+        reply = QMessageBox.question(
+            self, "Run Billing",
+            f"Generate pending payments for active members expiring by {bill_through}?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        
+        if reply != QMessageBox.Yes:
+            return
+        
+        try:
+            # A finished cycle for today starts over; the duplicate guard
+            # keeps already-billed members from being charged twice
+            with self.write_transaction():
+                self.cursor.execute("""
+                INSERT INTO billing_runs (cycle_date, bill_through, started_at) VALUES (?, ?, ?)
+                ON CONFLICT(cycle_date) DO UPDATE SET
+                    bill_through = excluded.bill_through,
+                    last_member_id = 0,
+                    generated = 0,
+                    started_at = excluded.started_at,
+                    finished_at = NULL
+                WHERE finished_at IS NOT NULL
+                """, (today, bill_through, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            
+            generated = self.process_billing_run(today)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Billing run failed: {str(e)}")
+            return
+        
+        QMessageBox.information(self, "Billing Complete", f"Generated {generated} pending payment(s).")
+    
+    def resume_billing_run(self):
+        self.cursor.execute("SELECT cycle_date FROM billing_runs WHERE finished_at IS NULL")
+        
+        for (cycle_date,) in self.cursor.fetchall():
+            try:
+                self.process_billing_run(cycle_date)
+            except sqlite3.Error:
+                # Left unfinished; the next Run Billing picks it up again
+                self.conn.rollback()
+    
+    def process_billing_run(self, cycle_date):
+        self.cursor.execute(
+            "SELECT bill_through, last_member_id FROM billing_runs WHERE cycle_date = ?", (cycle_date,)
+        )
+        bill_through, last_member_id = self.cursor.fetchone()
+        
+        self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM members")
+        max_member_id = self.cursor.fetchone()[0]
+        
+        # Only this run's own inserts, not other workstations' payments
+        payment_ids = []
+        
+        while last_member_id < max_member_id:
+            chunk_end = min(last_member_id + BILLING_CHUNK_SIZE, max_member_id)
+            
+            # The next charge is due when the current membership ends; the
+            # NOT EXISTS guard makes re-running a chunk a no-op
+            with self.write_transaction():
+                self.cursor.execute("""
+                INSERT INTO payments (member_id, amount, payment_date, due_date, payment_method, status)
+                SELECT m.id, p.price, NULL, m.expiry_date, NULL, 'Pending'
+                FROM members m
+                JOIN membership_plans p ON p.name = m.membership_type
+                WHERE m.id > ? AND m.id <= ?
+                  AND m.status = 'Active'
+                  AND m.expiry_date <= ?
+                  AND p.price > 0
+                  AND NOT EXISTS (
+                      SELECT 1 FROM payments x
+                      WHERE x.member_id = m.id AND x.due_date = m.expiry_date
+                  )
+                RETURNING id
+                """, (last_member_id, chunk_end, bill_through))
+                chunk_ids = [row[0] for row in self.cursor.fetchall()]
+                
+                self.cursor.execute("""
+                UPDATE billing_runs SET last_member_id = ?, generated = generated + ?
+                WHERE cycle_date = ?
+                """, (chunk_end, len(chunk_ids), cycle_date))
+            
+            payment_ids.extend(chunk_ids)
+            last_member_id = chunk_end
+        
+        with self.write_transaction():
+            self.cursor.execute(
+                "UPDATE billing_runs SET finished_at = ? WHERE cycle_date = ?",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), cycle_date)
+            )
+        
+        if payment_ids:
+            self.change_bus.emit("payments", "insert", payment_ids)
+        
+        return len(payment_ids)
+    
+    def mark_selected_payments_paid(self):
+        rows = set(index.row() for index in self.payments_table.selectedIndexes())
+        payment_ids = [int(self.payments_table.item(row, 0).text()) for row in rows]
+        
+        if not payment_ids:
+            QMessageBox.warning(self, "No Selection", "Please select one or more pending payments.")
+            return
+        
+        today = datetime.now().strftime("%Y-%m-%d")
+        placeholders = ", ".join("?" * len(payment_ids))
+        
+        try:
+            with self.write_transaction():
+                self.cursor.execute(f"""
+                SELECT id, member_id FROM payments
+                WHERE status = 'Pending' AND id IN ({placeholders})
+                """, payment_ids)
+                pending = self.cursor.fetchall()
+                
+                pending_ids = [payment_id for payment_id, member_id in pending]
+                member_ids = sorted(set(member_id for payment_id, member_id in pending))
+                placeholders = ", ".join("?" * len(pending_ids))
+                
+                if pending:
+                    self.cursor.execute(f"""
+                    UPDATE payments SET status = 'Paid', payment_date = ?, payment_method = COALESCE(payment_method, 'Cash')
+                    WHERE id IN ({placeholders})
+                    """, [today] + pending_ids)
+                    
+                    # A paid bill renews the membership it was issued for
+                    self.cursor.execute("DELETE FROM temp.bulk_ids")
+                    self.cursor.executemany("INSERT INTO temp.bulk_ids (id) VALUES (?)", [(member_id,) for member_id in member_ids])
+                    self.cursor.execute(RENEWAL_SQL, {"today": today})
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to mark payments paid: {str(e)}")
+            return
+        
+        if not pending:
+            QMessageBox.warning(self, "No Pending Payments", "None of the selected payments are pending.")
+            return
+        
+        self.change_bus.emit("payments", "update", pending_ids)
+        self.change_bus.emit("members", "update", member_ids)
+        QMessageBox.information(self, "Success", f"Marked {len(pending_ids)} payment(s) as paid.")
+    
+    def queue_reminders(self, remind_through):
+        # Range scans over the expiry and due-date indexes; INSERT OR IGNORE
+        # drops reminders already queued for the same member, kind and date
+        today = datetime.now().strftime("%Y-%m-%d")
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        with self.write_transaction():
+            self.cursor.execute("""
+            INSERT OR IGNORE INTO reminder_outbox (member_id, kind, ref_date, queued_at)
+            SELECT id, 'expiry', expiry_date, ?
+            FROM members
+            WHERE expiry_date BETWEEN ? AND ? AND status = 'Active'
+            """, (now, today, remind_through))
+            queued = self.cursor.rowcount
+            
+            self.cursor.execute("""
+            INSERT OR IGNORE INTO reminder_outbox (member_id, kind, ref_date, amount, queued_at)
+            SELECT member_id, CASE WHEN due_date < ? THEN 'overdue' ELSE 'payment_due' END, due_date, amount, ?
+            FROM payments
+            WHERE status = 'Pending' AND due_date <= ?
+            """, (today, now, remind_through))
+            queued += self.cursor.rowcount
+            
+            # Nowhere to send these, so they don't wait in the outbox
+            self.cursor.execute("""
+            UPDATE reminder_outbox SET skipped_at = ?, last_error = 'No email address'
+            WHERE sent_at IS NULL AND skipped_at IS NULL
+              AND member_id IN (SELECT id FROM members WHERE COALESCE(email, '') = '')
+            """, (now,))
+        
+        return queued
+    
+    def create_reminder_sender(self):
+        from_address = self.reminder_from_input.text().strip()
+        
+        if self.reminder_sender_combo.currentText() == "SMTP":
+            host, _, port = self.reminder_smtp_input.text().strip().partition(":")
+            return SmtpReminderSender(host or "localhost", int(port or 25), from_address)
+        
+        return FileReminderSender(self.reminder_file_input.text().strip(), from_address)
+    
+    def run_reminders(self):
+        if self.reminder_service.running():
+            QMessageBox.information(self, "Reminders", "Reminders are already being sent.")
+            return
+        
+        remind_through = (datetime.now() + timedelta(days=self.reminder_window_days.value())).strftime("%Y-%m-%d")
+        
+        try:
+            with self.write_transaction():
+                self.set_setting("reminder_days", self.reminder_window_days.value())
+                self.set_setting("reminder_sender", self.reminder_sender_combo.currentText())
+                self.set_setting("reminder_file", self.reminder_file_input.text().strip())
+                self.set_setting("reminder_smtp", self.reminder_smtp_input.text().strip())
+                self.set_setting("reminder_from", self.reminder_from_input.text().strip())
+            queued = self.queue_reminders(remind_through)
+            sender = self.create_reminder_sender()
+            
+            # Unsent reminders with the member details the templates need
+            self.cursor.execute("""
+            SELECT o.id, o.kind, o.ref_date, m.name, m.email, m.membership_type, o.amount
+            FROM reminder_outbox o
+            JOIN members m ON o.member_id = m.id
+            WHERE o.sent_at IS NULL AND o.skipped_at IS NULL AND o.attempts < ?
+            ORDER BY o.id
+            """, (REMINDER_MAX_ATTEMPTS,))
+            reminders = self.cursor.fetchall()
+        except (sqlite3.Error, ValueError) as e:
+            self.conn.rollback()
+            QMessageBox.critical(self, "Reminder Error", f"Failed to run reminders: {str(e)}")
+            return
+        
+        # Sent in the background; poll_reminders records each outcome
+        self.reminder_run = {"queued": queued, "sent": 0, "failed": 0}
+        self.reminder_service.start(sender, reminders, self.get_setting("gym_name", "FitPro Gym"))
+        self.reminder_poll_timer.start(REMINDER_POLL_MS)
+        self.run_reminders_btn.setEnabled(False)
+        self.update_reminder_status()
+    
+    def poll_reminders(self):
+        finished = not self.reminder_service.running()
+        if not self.record_reminder_outcomes():
+            return
+        
+        if not finished:
+            self.update_reminder_status()
+            return
+        
+        self.reminder_poll_timer.stop()
+        self.run_reminders_btn.setEnabled(True)
+        self.update_reminder_status()
+        QMessageBox.information(
+            self, "Reminders",
+            "Queued {queued} new reminder(s). Sent {sent}, failed {failed}.".format(**self.reminder_run)
+        )
+    
+    def record_reminder_outcomes(self):
+        # Marks each reminder the service finished with sent or failed
+        outcomes = self.reminder_service.take()
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        try:
+            with self.write_transaction():
+                self.cursor.executemany(
+                    "UPDATE reminder_outbox SET attempts = attempts + 1, sent_at = ?, last_error = NULL WHERE id = ?",
+                    [(now, outbox_id) for outbox_id, error in outcomes if error is None]
+                )
+                self.cursor.executemany(
+                    "UPDATE reminder_outbox SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                    [(error, outbox_id) for outbox_id, error in outcomes if error is not None]
+                )
+        except sqlite3.Error:
+            # Handed back and recorded on the next poll
+            self.reminder_service.outcomes.extendleft(reversed(outcomes))
+            return False
+        
+        self.reminder_run["sent"] += sum(error is None for outbox_id, error in outcomes)
+        self.reminder_run["failed"] += sum(error is not None for outbox_id, error in outcomes)
+        return True
+    
+    def update_reminder_status(self):
+        self.cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(last_error IS NOT NULL), 0)
+        FROM reminder_outbox WHERE sent_at IS NULL AND skipped_at IS NULL
+        """)
+        waiting, with_errors = self.cursor.fetchone()
+        status = f"Outbox: {waiting} unsent reminder(s), {with_errors} with errors"
+        if self.reminder_service.running():
+            status += " (sending...)"
+        self.reminder_status_label.setText(status)
+    
+    def precompute_presets(self):
+        # report type -> named range, as saved on the Reports settings tab
+        saved = self.get_setting("precomputed_reports")
+        return json.loads(saved) if saved else dict(DEFAULT_PRECOMPUTED_REPORTS)
+    
+    def check_report_precompute(self):
+        # After closing hour, compute tomorrow's ranges once: nothing is
+        # recorded overnight, so they are what managers open in the morning
+        hour = int(self.get_setting("report_precompute_hour", DEFAULT_PRECOMPUTE_HOUR))
+        if hour < 0 or datetime.now().hour < hour:
+            return
+        
+        day = QDate.currentDate().addDays(1)
+        if self.get_setting("report_precompute_day") == day.toString("yyyy-MM-dd"):
+            return
+        
+        # The timer can fire while a report waits on the report thread
+        if self.report_running:
+            return
+        
+        try:
+            self.precompute_reports(day)
+        except sqlite3.Error:
+            # Tried again on the next check
+            self.conn.rollback()
+    
+    def precompute_reports(self, day):
+        # One report after another, each in its own read transaction; only
+        # the scans of long ranges fan out to the report worker processes.
+        # Mergeable reports are stored up to the day before the range ends,
+        # so that day's check-ins and payments don't make them stale.
+        computed = []
+        for report_type, window in self.precompute_presets().items():
+            if report_type not in self.report_builders:
+                continue
+            
+            start_date, end_date = report_window(window, day)
+            compute = self.report_builders[report_type][0]
+            if report_type in self.report_mergers:
+                watermark = end_date
+                through = day.addDays(-1).toString("yyyy-MM-dd")
+                data = self.read_report_data(compute, start_date, through) if through >= start_date else None
+            else:
+                watermark = None
+                data = self.read_report_data(compute, start_date, end_date)
+            computed.append((report_type, start_date, end_date, json.dumps(data), watermark))
+        
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # Results for ranges that have already ended are never asked for again
+        with self.write_transaction():
+            self.cursor.execute("DELETE FROM report_results WHERE end_date < ?", (QDate.currentDate().toString("yyyy-MM-dd"),))
+            self.cursor.executemany("""
+            INSERT OR REPLACE INTO report_results (report_type, start_date, end_date, data, watermark, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, [row + (now,) for row in computed])
+            self.set_setting("report_precompute_day", day.toString("yyyy-MM-dd"))
+        return len(computed)
+    
+    def run_report_precompute(self):
+        presets = {
+            report_type: window_combo.currentText()
+            for report_type, (checkbox, window_combo) in self.precompute_inputs.items()
+            if checkbox.isChecked()
+        }
         
         try:
-            self.cursor.execute("""
-            UPDATE attendance SET time_out = ?
-            WHERE id = ?
-            """, (now, attendance_id))
-            
-            self.conn.commit()
-            QMessageBox.information(self, "Success", "Check-out recorded successfully!")
-            self.load_attendance()
-            self.update_dashboard()
+            with self.write_transaction():
+                self.set_setting("report_precompute_hour", self.precompute_hour_input.value())
+                self.set_setting("precomputed_reports", json.dumps(presets))
+            computed = self.precompute_reports(QDate.currentDate())
         except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to record check-out: {str(e)}")
-    
-    def show_record_payment_dialog(self):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Record Payment")
-        dialog.setMinimumWidth(500)
+            self.conn.rollback()
+            QMessageBox.critical(self, "Report Error", f"Failed to precompute reports: {str(e)}")
+            return
         
-        layout = QVBoxLayout(dialog)
+        self.update_precompute_status()
+        QMessageBox.information(self, "Reports", f"Precomputed {computed} report(s).")
+    
+    def update_precompute_status(self):
+        self.cursor.execute("SELECT COUNT(*), MAX(computed_at) FROM report_results")
+        count, computed_at = self.cursor.fetchone()
+        self.precompute_status_label.setText(f"Stored: {count} precomputed report(s), last computed {computed_at or 'never'}")
+    
+    def run_archive(self):
+        months = self.archive_months_input.value()
+        cutoff = QDate.currentDate().addMonths(-months).toString("yyyy-MM-dd")
         
-        # Form fields
-        form_layout = QFormLayout()
-        form_layout.setHorizontalSpacing(20)
-        form_layout.setVerticalSpacing(15)
+        progress = QProgressDialog("Archiving old records...", "Cancel", 0, 0, self)
+        progress.setWindowTitle("Archive")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(REPORT_PROGRESS_DELAY_MS)
+        progress.setValue(0)
         
-        # Member selection
-        self.payment_member_combo = QComboBox()
-        self.payment_member_combo.setObjectName("memberCombo")
+        # Between chunks the GUI gets a turn and Cancel is honoured
+        def cancelled():
+            QApplication.processEvents()
+            return progress.wasCanceled()
         
-        # Load active members
-        self.cursor.execute("SELECT id, name FROM members WHERE status = 'Active' ORDER BY name")
-        members = self.cursor.fetchall()
+        try:
+            with self.write_transaction():
+                self.set_setting("archive_months", months)
+            moved = self.history_archive.archive(cutoff, cancelled)
+        except (sqlite3.Error, OSError) as e:
+            self.conn.rollback()
+            QMessageBox.critical(self, "Archive Error", f"Failed to archive records: {str(e)}")
+            return
+        finally:
+            progress.close()
         
-        for member in members:
-            self.payment_member_combo.addItem(member[1], member[0])
+        # Hot-table counts and lists changed
+        self.load_attendance()
+        self.load_payments()
+        self.update_dashboard()
+        self.update_archive_status()
+        QMessageBox.information(self, "Archive", f"Moved {moved} record(s) dated before {cutoff} to the archive.")
+    
+    def update_archive_status(self):
+        counts = self.history_archive.counts()
+        if not counts:
+            self.archive_status_label.setText("Nothing archived yet")
+            return
         
-        form_layout.addRow("Member:", self.payment_member_combo)
+        self.archive_status_label.setText("\n".join(
+            f"{year}: {visits} visit(s), {payments} payment(s)" for year, (visits, payments) in counts.items()
+        ))
+    
+    def check_backup_schedule(self):
+        hours = int(self.get_setting("backup_interval_hours", DEFAULT_BACKUP_INTERVAL_HOURS))
+        if not hours:
+            return
         
-        # Amount
-        self.payment_amount_input = QLineEdit()
-        self.payment_amount_input.setValidator(QDoubleValidator(0, 9999, 2))
-        form_layout.addRow("Amount ($):", self.payment_amount_input)
+        backups = list_backups()
+        if backups:
+            last = datetime.strptime(os.path.basename(backups[-1]), "%Y%m%d_%H%M%S")
+            if datetime.now() - last < timedelta(hours=hours):
+                return
         
-        # Payment date
-        self.payment_date_input = QDateEdit(QDate.currentDate())
-        self.payment_date_input.setCalendarPopup(True)
-        form_layout.addRow("Payment Date:", self.payment_date_input)
+        self.start_backup()
+    
+    def start_backup(self):
+        started = self.backup_service.start(
+            self.get_setting("backup_compress", "1") == "1",
+            int(self.get_setting("backup_keep", DEFAULT_BACKUP_KEEP))
+        )
+        if started:
+            self.backup_poll_timer.start(1000)
+            self.update_backup_status()
+        return started
+    
+    def poll_backup(self):
+        if self.backup_service.running():
+            return
         
-        # Due date (default to 1 month from now)
-        self.payment_due_date_input = QDateEdit(QDate.currentDate().addMonths(1))
-        self.payment_due_date_input.setCalendarPopup(True)
-        form_layout.addRow("Due Date:", self.payment_due_date_input)
+        self.backup_poll_timer.stop()
+        self.update_backup_status()
+    
+    def run_backup(self):
+        try:
+            with self.write_transaction():
+                self.set_setting("backup_interval_hours", self.backup_interval_input.value())
+                self.set_setting("backup_keep", self.backup_keep_input.value())
+                self.set_setting("backup_compress", int(self.backup_compress_input.isChecked()))
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Backup Error", f"Failed to save backup settings: {str(e)}")
+            return
         
-        # Payment method
-        self.payment_method_combo = QComboBox()
-        self.payment_method_combo.addItems(["Cash", "Credit Card", "Debit Card", "Bank Transfer", "Other"])
-        form_layout.addRow("Payment Method:", self.payment_method_combo)
+        if not self.start_backup():
+            QMessageBox.information(self, "Backup", "A backup is already running.")
+    
+    def update_backup_status(self):
+        backups = list_backups()
+        
+        current = self.backup_sets_combo.currentText()
+        self.backup_sets_combo.clear()
+        self.backup_sets_combo.addItems([os.path.basename(set_path) for set_path in reversed(backups)])
+        if current:
+            self.backup_sets_combo.setCurrentText(current)
+        
+        if self.backup_service.running():
+            status = "Backup in progress..."
+        elif self.backup_service.error:
+            status = f"Last backup failed: {self.backup_service.error}"
+        elif backups:
+            status = f"{len(backups)} backup(s), latest {os.path.basename(backups[-1])}"
+        else:
+            status = "No backups yet"
+        self.backup_status_label.setText(status)
+    
+    def selected_backup(self):
+        name = self.backup_sets_combo.currentText()
+        if not name:
+            QMessageBox.warning(self, "Backup", "There is no backup to use yet.")
+            return None
+        return os.path.join(BACKUP_DIR, name)
+    
+    def verify_selected_backup(self):
+        set_path = self.selected_backup()
+        if set_path is None:
+            return
         
-        layout.addLayout(form_layout)
+        try:
+            problems = verify_backup(set_path)
+        except (OSError, ValueError) as e:
+            problems = [str(e)]
         
-        # Buttons
-        button_layout = QHBoxLayout()
+        if problems:
+            QMessageBox.warning(self, "Backup Verification", "\n".join(problems))
+        else:
+            QMessageBox.information(self, "Backup Verification", f"{os.path.basename(set_path)} is intact.")
+    
+    def restore_selected_backup(self):
+        set_path = self.selected_backup()
+        if set_path is None:
+            return
         
-        save_btn = QPushButton("Record Payment")
-        save_btn.setObjectName("saveButton")
-        save_btn.clicked.connect(lambda: self.save_payment(dialog))
+        reply = QMessageBox.question(
+            self, "Restore Backup",
+            f"Replace all current data with backup {os.path.basename(set_path)}? Changes made since then will be lost.",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
         
-        cancel_btn = QPushButton("Cancel")
-        cancel_btn.setObjectName("cancelButton")
-        cancel_btn.clicked.connect(dialog.reject)
+        # The report connection would keep the replaced archive files open
+        self.close_report_connection()
+        try:
+            restore_backup(set_path, self.conn, self.history_archive)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            self.conn.rollback()
+            QMessageBox.critical(self, "Restore Error", f"Failed to restore backup: {str(e)}")
+            return
         
-        button_layout.addStretch()
-        button_layout.addWidget(cancel_btn)
-        button_layout.addWidget(save_btn)
+        self.reload_from_database()
+        QMessageBox.information(self, "Restore Backup", "The backup has been restored.")
+    
+    def reload_from_database(self):
+        # Everything held outside the database is rebuilt from its current
+        # contents, after a restore or when change events were missed
+        self.member_cache.invalidate()
+        self.close_report_connection()
+        if self.attendance_columns is not None:
+            self.attendance_columns.reset()
+        self.attendance_bitmaps.loaded = False
+        self.occupancy.load(datetime.now().strftime("%Y-%m-%d"))
+        self.today_attendance = (None, 0)
+        
+        self.load_membership_plans()
+        self.capacity_limit = int(self.get_setting("capacity_limit", 0))
+        self.auto_checkout_hours = int(self.get_setting("auto_checkout_hours", 6))
+        self.imputed_session_minutes = int(self.get_setting("imputed_session_minutes", 60))
         
-        layout.addLayout(button_layout)
+        self.load_members()
+        self.load_attendance()
+        self.load_payments()
+        self.update_dashboard()
+        self.update_archive_status()
+        self.update_precompute_status()
+        self.update_reminder_status()
         
-        dialog.exec_()
+        self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM change_log")
+        self.change_log_seen = self.cursor.fetchone()[0]
     
-    def save_payment(self, dialog):
-        member_id = self.payment_member_combo.currentData()
-        amount = self.payment_amount_input.text().strip()
+    def poll_changes(self):
+        # Never inside a transaction: a report's read snapshot or a write in
+        # progress would be committed by the handlers below
+        if self.conn.in_transaction:
+            return
         
-        if not amount or float(amount) <= 0:
-            QMessageBox.warning(self, "Validation Error", "Please enter a valid payment amount.")
+        self.change_poll_count += 1
+        if self.change_poll_count % CHANGE_LOG_PRUNE_POLLS == 0:
+            self.prune_change_log()
+        
+        # Unchanged unless another connection committed since the last poll
+        self.cursor.execute("PRAGMA data_version")
+        version = self.cursor.fetchone()[0]
+        if version == self.data_version:
             return
+        self.data_version = version
         
-        try:
-            self.cursor.execute("""
-            INSERT INTO payments (
-                member_id, amount, payment_date, due_date, payment_method
-            ) VALUES (?, ?, ?, ?, ?)
-            """, (
-                member_id,
-                float(amount),
-                self.payment_date_input.date().toString("yyyy-MM-dd"),
-                self.payment_due_date_input.date().toString("yyyy-MM-dd"),
-                self.payment_method_combo.currentText()
-            ))
-            
-            # Update member's expiry date if this is a membership payment
-            # (This is a simplified approach - you might want to make it more sophisticated)
-            self.cursor.execute("""
-            UPDATE members SET expiry_date = ?
-            WHERE id = ? AND expiry_date < ?
-            """, (
-                self.payment_due_date_input.date().toString("yyyy-MM-dd"),
-                member_id,
-                self.payment_due_date_input.date().toString("yyyy-MM-dd")
-            ))
-            
-            self.conn.commit()
-            QMessageBox.information(self, "Success", "Payment recorded successfully!")
-            self.load_payments()
-            self.update_dashboard()
-            dialog.accept()
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to record payment: {str(e)}")
+        self.cursor.execute("SELECT MIN(id), MAX(id) FROM change_log")
+        first_id, last_id = self.cursor.fetchone()
+        if last_id is None or last_id == self.change_log_seen:
+            return
+        
+        if last_id < self.change_log_seen or first_id > self.change_log_seen + 1:
+            # Entries were pruned before this desk saw them, or the database
+            # was restored elsewhere
+            self.reload_from_database()
+            return
+        
+        self.cursor.execute(
+            "SELECT table_name, action, row_id FROM change_log WHERE id > ? AND source != ? ORDER BY id",
+            (self.change_log_seen, self.workstation_id)
+        )
+        rows = self.cursor.fetchall()
+        self.change_log_seen = last_id
+        
+        # One event per table and action, each row id once
+        events = {}
+        for table, action, row_id in rows:
+            events.setdefault((table, action), {})[row_id] = None
+        
+        if any(table == "attendance" for table, _ in events):
+            # Kept up to date by the local check-in path only
+            self.occupancy.day = None
+        
+        if ("attendance", "insert") in events:
+            # Only check-ins add bits (member deletes clear them through the
+            # members event), and the other workstation already stored them
+            inserted = list(events[("attendance", "insert")])
+            placeholders = ", ".join("?" * len(inserted))
+            self.cursor.execute(f"SELECT DISTINCT date FROM attendance WHERE id IN ({placeholders})", inserted)
+            self.attendance_bitmaps.reload_days([day for day, in self.cursor.fetchall()])
+        
+        for table in CHANGE_LOG_TABLES:
+            for action in ("insert", "update", "delete"):
+                if (table, action) in events:
+                    self.change_bus.emit(table, action, events[(table, action)])
+    
+    def apply_report_range(self, window):
+        if window not in REPORT_WINDOWS:
+            return
+        
+        start_date, end_date = report_window(window, QDate.currentDate())
+        for date_edit, value in [(self.report_start_date, start_date), (self.report_end_date, end_date)]:
+            date_edit.blockSignals(True)
+            date_edit.setDate(QDate.fromString(value, "yyyy-MM-dd"))
+            date_edit.blockSignals(False)
+    
+    def on_report_date_edited(self):
+        self.report_range_combo.blockSignals(True)
+        self.report_range_combo.setCurrentText("Custom")
+        self.report_range_combo.blockSignals(False)
+    
+    def precomputed_report(self, report_type, start_date, end_date, progress=None):
+        # (data, computed_at) when this exact report is still stored. Days
+        # from the watermark on are read now and merged into the result.
+        self.cursor.execute("""
+        SELECT data, computed_at, watermark FROM report_results
+        WHERE report_type = ? AND start_date = ? AND end_date = ?
+        """, (report_type, start_date, end_date))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        
+        data, computed_at, watermark = json.loads(row[0]), row[1], row[2]
+        if watermark is not None and watermark <= end_date:
+            delta = self.read_report_data(self.report_builders[report_type][0], watermark, end_date, progress)
+            data = self.report_mergers[report_type](data, delta, start_date, watermark, end_date)
+        return data, computed_at
+    
+    def merge_attendance_report(self, data, delta, start_date, watermark, end_date):
+        if data is None:
+            return delta
+        
+        # Distinct members don't add up; the bitmaps answer for the range
+        return {
+            "total": data["total"] + delta["total"],
+            "unique": self.attendance_bitmaps.unique_members(start_date, end_date),
+            "daily": data["daily"] + delta["daily"]
+        }
+    
+    def merge_peak_hours_report(self, data, delta, start_date, watermark, end_date):
+        if data is None:
+            return delta
+        
+        # Occupancy is averaged per weekday, so the two parts are weighted
+        # by how many of each weekday they span
+        before = weekday_counts(start_date, (datetime.strptime(watermark, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d"))
+        after = weekday_counts(watermark, end_date)
+        return {
+            "checkins": [
+                [a + b for a, b in zip(row, delta_row)] for row, delta_row in zip(data["checkins"], delta["checkins"])
+            ],
+            "occupancy": [
+                [
+                    (a * before[weekday] + b * after[weekday]) / (before[weekday] + after[weekday])
+                    if before[weekday] + after[weekday] else 0
+                    for a, b in zip(data["occupancy"][weekday], delta["occupancy"][weekday])
+                ]
+                for weekday in range(7)
+            ]
+        }
+    
+    def merge_revenue_report(self, data, delta, start_date, watermark, end_date):
+        if data is None:
+            return delta
+        
+        by_method = dict(map(tuple, data["methods"]))
+        for method, amount in delta["methods"]:
+            by_method[method] = by_method.get(method, 0) + amount
+        
+        by_month = dict(map(tuple, data["monthly"]))
+        for month, amount in delta["monthly"]:
+            by_month[month] = by_month.get(month, 0) + amount
+        
+        return {
+            "total": data["total"] + delta["total"],
+            "methods": sorted(by_method.items(), key=lambda entry: str(entry[0])),
+            "monthly": list(by_month.items())
+        }
     
     def generate_report(self):
         report_type = self.report_type_combo.currentText()
@@ -1562,38 +5284,383 @@ class GymManagementSystem(QMainWindow):
         end_date = self.report_end_date.date().toString("yyyy-MM-dd")
         
         # Clear previous report
-        for i in reversed(range(self.report_display.layout().count())): 
-            self.report_display.layout().itemAt(i).widget().setParent(None)
-        
-        layout = QVBoxLayout(self.report_display)
-        layout.setContentsMargins(20, 20, 20, 20)
+        layout = self.report_layout
+        self.clear_layout(layout)
         
         # Generate report based on type
-        if report_type == "Attendance Summary":
-            self.generate_attendance_report(layout, start_date, end_date)
-        elif report_type == "Membership Types":
-            self.generate_membership_report(layout)
-        elif report_type == "Revenue Analysis":
-            self.generate_revenue_report(layout, start_date, end_date)
-        elif report_type == "Member Growth":
-            self.generate_growth_report(layout, start_date, end_date)
+        compute, render = self.report_builders[report_type]
+        
+        # Window-modal, so no second report starts while this one is read;
+        # it only shows up for slow reports
+        progress = QProgressDialog("Computing report...", "Cancel", 0, 0, self)
+        progress.setWindowTitle("Generating Report")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(REPORT_PROGRESS_DELAY_MS)
+        progress.setValue(0)
+        self.generate_report_btn.setEnabled(False)
+        precomputed = None
+        
+        try:
+            # Served straight from the nightly precompute when it matches
+            precomputed = self.precomputed_report(report_type, start_date, end_date, progress)
+            if precomputed is not None:
+                data, computed_at = precomputed
+            else:
+                data = self.read_report_data(compute, start_date, end_date, progress)
+            
+            # Only rendering is staged: the data is all read first, from one
+            # snapshot, then renderers yield after each stage (summary cards,
+            # then charts) so the cards show while the charts are built
+            progress.setLabelText("Rendering report...")
+            for _ in render(layout, start_date, end_date, data):
+                QApplication.processEvents()
+                if progress.wasCanceled():
+                    layout.addWidget(QLabel("Report cancelled."))
+                    break
+        except sqlite3.OperationalError as e:
+            if progress.wasCanceled():
+                layout.addWidget(QLabel("Report cancelled."))
+            else:
+                QMessageBox.critical(self, "Report Error", f"Failed to generate report: {str(e)}")
+        finally:
+            progress.close()
+            self.generate_report_btn.setEnabled(True)
+        
+        if precomputed is not None:
+            layout.addWidget(QLabel(f"Precomputed at {computed_at}"))
         
         # Add stretch to push content up
         layout.addStretch()
     
-    def generate_attendance_report(self, layout, start_date, end_date):
+    def read_report_data(self, compute, start_date, end_date, progress=None):
+        # The report is computed on the report thread over a separate
+        # read-only connection, so self.conn is never mid-statement while
+        # the GUI waits. Cancel interrupts that connection.
+        self.attendance_bitmaps.ensure_loaded()
+        reader = self.report_connection()
+        self.report_running = True
+        self.report_cancel.clear()
+        future = self.report_thread.submit(run_report_compute, reader, compute, start_date, end_date)
+        
+        try:
+            # Fast reports never show the dialog; without one the GUI just
+            # waits, as for the nightly precompute
+            started = time.monotonic()
+            while progress is not None and not future.done():
+                wait([future], timeout=REPORT_POLL_SECONDS)
+                if not progress.isVisible() and time.monotonic() - started >= REPORT_PROGRESS_DELAY_MS / 1000:
+                    progress.show()
+                QApplication.processEvents()
+                if progress.wasCanceled() and not self.report_cancel.is_set():
+                    self.report_cancel.set()
+                    reader.interrupt()
+            return future.result()
+        finally:
+            wait([future])
+            self.report_running = False
+    
+    def report_connection(self):
+        # Kept open between reports, so that PRAGMA data_version can tell
+        # whether anything was committed since the scan snapshot was taken;
+        # reopened when an archive has been attached since
+        archive_paths = self.history_archive.archive_paths()
+        if self.report_reader is not None and self.report_reader_archives != archive_paths:
+            self.close_report_connection()
+        if self.report_reader is None:
+            self.report_reader = self.open_report_reader(archive_paths)
+            self.report_reader_archives = archive_paths
+        return self.report_reader
+    
+    def close_report_connection(self):
+        # Snapshot versions only mean something to the connection that read them
+        self.drop_report_snapshot()
+        if self.report_reader is not None:
+            self.report_reader.close()
+            self.report_reader = None
+            self.report_reader_archives = None
+    
+    def open_report_reader(self, archive_paths):
+        # Same archives and history views as self.conn, opened query-only;
+        # used from the report thread only
+        reader = sqlite3.connect(DATABASE_PATH, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        try:
+            for alias, path in archive_paths:
+                reader.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+            create_history_views(reader.cursor(), [alias for alias, _ in archive_paths])
+            reader.execute("PRAGMA query_only = ON")
+        except sqlite3.Error:
+            reader.close()
+            raise
+        return reader
+    
+    def report_scan(self, cursor, scan, start_date, end_date):
+        # Long ranges are split into slices scanned in parallel by worker
+        # processes; anything shorter runs inline in the read transaction
+        days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+        parts = min(REPORT_WORKERS, days // REPORT_PARTITION_MIN_DAYS)
+        if parts < 2:
+            return REPORT_SCANS[scan](cursor, start_date, end_date)
+        
+        snapshot_path, archive_paths = self.report_snapshot_paths(cursor.connection)
+        pool = self.report_executor()
+        self.report_cancel_event.clear()
+        futures = [
+            pool.submit(run_report_scan, snapshot_path, archive_paths, scan, first, last)
+            for first, last in date_partitions(start_date, end_date, parts)
+        ]
+        
+        try:
+            # Poll so Cancel on the GUI thread reaches the workers
+            pending = futures
+            while pending:
+                _, pending = wait(pending, timeout=REPORT_POLL_SECONDS)
+                if self.report_cancel.is_set():
+                    self.report_cancel_event.set()
+                    for future in pending:
+                        future.cancel()
+                    raise sqlite3.OperationalError("interrupted")
+            
+            rows = []
+            for future in futures:
+                rows.extend(future.result())
+            return rows
+        except BrokenExecutor:
+            # A worker died; start a fresh pool next time and scan inline now
+            self.report_pool = None
+            return REPORT_SCANS[scan](cursor, start_date, end_date)
+    
+    def report_snapshot_paths(self, reader):
+        # Copies of the main database and of each attached archive, taken
+        # with the backup API inside the report's read transaction, so the
+        # workers see exactly what the inline queries see. They are reused
+        # for as long as PRAGMA data_version shows no commit to any of them.
+        schemas = ["main"] + [alias for alias, _ in self.report_reader_archives]
+        versions = tuple(reader.execute(f"PRAGMA {schema}.data_version").fetchone()[0] for schema in schemas)
+        if self.report_snapshot is not None and self.report_snapshot[0] == versions:
+            return self.report_snapshot[2:]
+        
+        self.drop_report_snapshot()
+        directory = tempfile.mkdtemp(prefix="gym_report_")
+        paths = {schema: os.path.join(directory, f"{schema}.db") for schema in schemas}
+        try:
+            for schema in schemas:
+                snapshot = sqlite3.connect(paths[schema])
+                try:
+                    reader.backup(snapshot, pages=REPORT_SNAPSHOT_PAGES, progress=self.check_report_cancel, name=schema)
+                    
+                    # Workers open it read-only, which a WAL database can't do
+                    snapshot.execute("PRAGMA journal_mode = DELETE")
+                finally:
+                    snapshot.close()
+        except (sqlite3.Error, OSError):
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        
+        archive_paths = [(alias, paths[alias]) for alias in schemas[1:]]
+        self.report_snapshot = (versions, directory, paths["main"], archive_paths)
+        return self.report_snapshot[2:]
+    
+    def drop_report_snapshot(self):
+        if self.report_snapshot is not None:
+            shutil.rmtree(self.report_snapshot[1], ignore_errors=True)
+            self.report_snapshot = None
+    
+    def check_report_cancel(self, status, remaining, total):
+        # Backup progress callback; the exception aborts the copy
+        if self.report_cancel.is_set():
+            raise sqlite3.OperationalError("interrupted")
+    
+    def report_executor(self):
+        # Spawned rather than forked so workers don't inherit the Qt state
+        if self.report_pool is None:
+            context = multiprocessing.get_context("spawn")
+            self.report_cancel_event = context.Event()
+            self.report_pool = ProcessPoolExecutor(
+                REPORT_WORKERS, mp_context=context,
+                initializer=init_report_worker, initargs=(self.report_cancel_event,)
+            )
+        return self.report_pool
+    
+    def clear_layout(self, layout):
+        # Reports nest layouts inside the display layout, so clear recursively
+        while layout.count():
+            item = layout.takeAt(0)
+            if item.widget() is not None:
+                item.widget().deleteLater()
+            elif item.layout() is not None:
+                self.clear_layout(item.layout())
+    
+    def attendance_report_data(self, cursor, start_date, end_date):
+        total_attendance, unique_members, daily_data = self.attendance_summary(cursor, start_date, end_date)
+        return {"total": total_attendance, "unique": unique_members, "daily": daily_data}
+    
+    def attendance_summary(self, cursor, start_date, end_date):
+        # Distinct members come from the per-day bitmaps
+        unique_members = self.attendance_bitmaps.unique_members(start_date, end_date)
+        
+        # Vectorized over the column store when numpy is available
+        if self.attendance_columns is not None:
+            try:
+                total_attendance, daily_data = self.attendance_columns.summary(start_date, end_date, cursor)
+                return total_attendance, unique_members, daily_data
+            except (OSError, ValueError):
+                # Unreadable snapshot: rebuild it on the next report
+                self.attendance_columns.reset()
+        
+        daily_data = self.report_scan(cursor, "attendance_daily", start_date, end_date)
+        return sum(count for _, count in daily_data), unique_members, daily_data
+    
+    def peak_hours_data(self, cursor, start_date, end_date):
+        if self.attendance_columns is not None:
+            try:
+                return self.attendance_columns.peak_hours(start_date, end_date, cursor)
+            except (OSError, ValueError):
+                self.attendance_columns.reset()
+        
+        # SQL fallback; slices of a split range add up hour by hour
+        checkins = [[0] * 24 for _ in range(7)]
+        present = [[0] * 24 for _ in range(7)]
+        
+        for weekday, hour, count, minutes in self.report_scan(cursor, "peak_hours", start_date, end_date):
+            checkins[weekday][hour] += count
+            present[weekday][hour] += minutes
+        
+        return checkins, present
+    
+    def peak_hours_report_data(self, cursor, start_date, end_date):
+        checkins, present = self.peak_hours_data(cursor, start_date, end_date)
+        day_counts = weekday_counts(start_date, end_date)
+        
+        # Person-minutes in an hour / (60 x number of such weekdays)
+        occupancy = [
+            [minutes / (60 * day_counts[weekday]) if day_counts[weekday] else 0 for minutes in present[weekday]]
+            for weekday in range(7)
+        ]
+        return {"checkins": checkins, "occupancy": occupancy}
+    
+    def generate_peak_hours_report(self, layout, start_date, end_date, data):
         # Title
-        title = QLabel(f"Attendance Summary Report\n{start_date} to {end_date}")
+        title = QLabel(f"Peak Hours Report\n{start_date} to {end_date}")
         title.setObjectName("reportTitle")
         layout.addWidget(title)
         
-        # Total attendance
-        self.cursor.execute("""
-        SELECT COUNT(*) FROM attendance 
-        WHERE date BETWEEN ? AND ?
-        """, (start_date, end_date))
+        for label, grid, fmt in [
+            ("Check-ins by Hour", data["checkins"], "{:.0f}"),
+            ("Average Occupancy by Hour", data["occupancy"], "{:.1f}")
+        ]:
+            chart_label = QLabel(label)
+            chart_label.setObjectName("chartLabel")
+            layout.addWidget(chart_label)
+            
+            layout.addWidget(self.create_heatmap(grid, fmt, WEEKDAY_NAMES, [f"{hour:02d}" for hour in range(24)]))
+            yield
+    
+    def create_heatmap(self, grid, fmt, row_labels, column_labels):
+        # None cells are left blank and uncolored
+        heatmap = QTableWidget(len(row_labels), len(column_labels))
+        heatmap.setVerticalHeaderLabels(row_labels)
+        heatmap.setHorizontalHeaderLabels(column_labels)
+        heatmap.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        heatmap.setEditTriggers(QTableWidget.NoEditTriggers)
+        heatmap.setFixedHeight(min(50 + 30 * len(row_labels), 500))
+        
+        peak = max((value for row in grid for value in row if value), default=0) or 1
+        
+        for row_index, row in enumerate(grid):
+            for column_index, value in enumerate(row):
+                if value is None:
+                    continue
+                
+                item = QTableWidgetItem(fmt.format(value) if value else "")
+                item.setTextAlignment(Qt.AlignCenter)
+                item.setBackground(QColor(255, 140, 0, int(30 + 225 * value / peak) if value else 0))
+                item.setToolTip(f"{row_labels[row_index]} {column_labels[column_index]}: {fmt.format(value)}")
+                heatmap.setItem(row_index, column_index, item)
         
-        total_attendance = self.cursor.fetchone()[0]
+        return heatmap
+    
+    def retention_data(self, cursor, join_months, first_cohort, months, start_date, end_date):
+        if self.attendance_columns is not None:
+            try:
+                return self.attendance_columns.retention(join_months, first_cohort, months, cursor)
+            except (OSError, ValueError):
+                self.attendance_columns.reset()
+        
+        # SQL fallback: one grouped pass over the cohorts' attendance
+        cursor.execute("""
+        SELECT cohort, offset, COUNT(DISTINCT member_id) FROM (
+            SELECT a.member_id,
+                (CAST(strftime('%Y', m.join_date) AS INTEGER) - 1970) * 12
+                    + CAST(strftime('%m', m.join_date) AS INTEGER) - 1 AS cohort,
+                (CAST(strftime('%Y', a.date) AS INTEGER) - CAST(strftime('%Y', m.join_date) AS INTEGER)) * 12
+                    + CAST(strftime('%m', a.date) AS INTEGER) - CAST(strftime('%m', m.join_date) AS INTEGER) AS offset
+            FROM members m
+            JOIN all_attendance a ON a.member_id = m.id
+            WHERE m.join_date BETWEEN ? AND ? AND a.date >= date(m.join_date, 'start of month')
+        )
+        WHERE offset < ?
+        GROUP BY cohort, offset
+        """, (start_date, end_date, months))
+        
+        return {(cohort, offset): count for cohort, offset, count in cursor.fetchall()}
+    
+    def retention_report_data(self, cursor, start_date, end_date):
+        # Cohorts are read in the report's transaction along with attendance
+        cursor.execute("SELECT id, join_date FROM members WHERE join_date BETWEEN ? AND ?", (start_date, end_date))
+        join_months = {member_id: month_number(join_date) for member_id, join_date in cursor.fetchall()}
+        
+        if not join_months:
+            return None
+        
+        first_cohort = min(join_months.values())
+        last_cohort = max(join_months.values())
+        current_month = month_number(datetime.now().strftime("%Y-%m-%d"))
+        months = max(current_month - first_cohort + 1, 1)
+        
+        cohort_sizes = Counter(join_months.values())
+        active = self.retention_data(cursor, join_months, first_cohort, months, start_date, end_date)
+        
+        # Share of each cohort seen in the gym N months after joining;
+        # months that haven't happened yet stay blank
+        cohorts = range(first_cohort, last_cohort + 1)
+        grid = [
+            [
+                100 * active.get((cohort, offset), 0) / cohort_sizes[cohort]
+                if cohort_sizes[cohort] and cohort + offset <= current_month else None
+                for offset in range(months)
+            ]
+            for cohort in cohorts
+        ]
+        row_labels = [f"{month_label(cohort)} ({cohort_sizes[cohort]})" for cohort in cohorts]
+        return {"grid": grid, "row_labels": row_labels, "months": months}
+    
+    def generate_retention_report(self, layout, start_date, end_date, data):
+        # Title
+        title = QLabel(f"Retention Cohorts Report\nMembers joined {start_date} to {end_date}")
+        title.setObjectName("reportTitle")
+        layout.addWidget(title)
+        
+        if data is None:
+            layout.addWidget(QLabel("No members joined in this period."))
+            return
+        
+        yield
+        
+        chart_label = QLabel("Active Members by Month Since Joining (%)")
+        chart_label.setObjectName("chartLabel")
+        layout.addWidget(chart_label)
+        
+        layout.addWidget(self.create_heatmap(
+            data["grid"], "{:.0f}%", data["row_labels"], [f"M{offset}" for offset in range(data["months"])]
+        ))
+    
+    def generate_attendance_report(self, layout, start_date, end_date, data):
+        # Title
+        title = QLabel(f"Attendance Summary Report\n{start_date} to {end_date}")
+        title.setObjectName("reportTitle")
+        layout.addWidget(title)
+        
+        total_attendance, unique_members, daily_data = data["total"], data["unique"], data["daily"]
         
         stats_layout = QHBoxLayout()
         
@@ -1608,13 +5675,6 @@ class GymManagementSystem(QMainWindow):
         stats_layout.addWidget(total_card)
         
         # Unique members
-        self.cursor.execute("""
-        SELECT COUNT(DISTINCT member_id) FROM attendance 
-        WHERE date BETWEEN ? AND ?
-        """, (start_date, end_date))
-        
-        unique_members = self.cursor.fetchone()[0]
-        
         unique_card = QFrame()
         unique_card.setObjectName("statCard")
         unique_card.setFixedHeight(80)
@@ -1640,22 +5700,14 @@ class GymManagementSystem(QMainWindow):
         
         layout.addLayout(stats_layout)
         
+        # Summary cards are on screen; the charts follow
+        yield
+        
         # Daily attendance chart (simplified - in a real app you'd use a proper charting library)
         chart_label = QLabel("Daily Attendance")
         chart_label.setObjectName("chartLabel")
         layout.addWidget(chart_label)
         
-        # Get daily counts
-        self.cursor.execute("""
-        SELECT date, COUNT(*) 
-        FROM attendance 
-        WHERE date BETWEEN ? AND ?
-        GROUP BY date
-        ORDER BY date
-        """, (start_date, end_date))
-        
-        daily_data = self.cursor.fetchall()
-        
         # Create a simple bar chart using labels
         chart_frame = QFrame()
         chart_frame.setObjectName("chartFrame")
@@ -1681,20 +5733,20 @@ class GymManagementSystem(QMainWindow):
         
         layout.addWidget(chart_frame)
     
-    def generate_membership_report(self, layout):
-        # Title
-        title = QLabel("Membership Types Report")
-        title.setObjectName("reportTitle")
-        layout.addWidget(title)
-        
-        # Get counts by membership type
-        self.cursor.execute("""
+    def membership_report_data(self, cursor, start_date, end_date):
+        # Counts by membership type; the report covers all members
+        cursor.execute("""
         SELECT membership_type, COUNT(*) 
         FROM members 
         GROUP BY membership_type
         """)
-        
-        membership_data = self.cursor.fetchall()
+        return cursor.fetchall()
+    
+    def generate_membership_report(self, layout, start_date, end_date, membership_data):
+        # Title
+        title = QLabel("Membership Types Report")
+        title.setObjectName("reportTitle")
+        layout.addWidget(title)
         
         # Stats cards
         stats_layout = QHBoxLayout()
@@ -1712,6 +5764,9 @@ class GymManagementSystem(QMainWindow):
         
         layout.addLayout(stats_layout)
         
+        # Summary cards are on screen; the charts follow
+        yield
+        
         # Pie chart representation (simplified)
         chart_label = QLabel("Membership Distribution")
         chart_label.setObjectName("chartLabel")
@@ -1744,20 +5799,29 @@ class GymManagementSystem(QMainWindow):
         
         layout.addWidget(chart_frame)
     
-    def generate_revenue_report(self, layout, start_date, end_date):
+    def revenue_report_data(self, cursor, start_date, end_date):
+        # One scan grouped by month and method; the total, per-method and
+        # per-month figures are all rolled up from it
+        by_method = {}
+        by_month = {}
+        for month, method, amount in self.report_scan(cursor, "revenue", start_date, end_date):
+            by_method[method] = by_method.get(method, 0) + amount
+            by_month[month] = by_month.get(month, 0) + amount
+        
+        return {
+            "total": sum(by_month.values()),
+            "methods": sorted(by_method.items(), key=lambda entry: str(entry[0])),
+            "monthly": list(by_month.items())
+        }
+    
+    def generate_revenue_report(self, layout, start_date, end_date, data):
         # Title
         title = QLabel(f"Revenue Analysis Report\n{start_date} to {end_date}")
         title.setObjectName("reportTitle")
         layout.addWidget(title)
         
         # Total revenue
-        self.cursor.execute("""
-        SELECT SUM(amount) 
-        FROM payments 
-        WHERE payment_date BETWEEN ? AND ? AND status = 'Paid'
-        """, (start_date, end_date))
-        
-        total_revenue = self.cursor.fetchone()[0] or 0
+        total_revenue = data["total"]
         
         stats_layout = QHBoxLayout()
         
@@ -1772,16 +5836,7 @@ class GymManagementSystem(QMainWindow):
         stats_layout.addWidget(total_card)
         
         # Revenue by payment method
-        self.cursor.execute("""
-        SELECT payment_method, SUM(amount) 
-        FROM payments 
-        WHERE payment_date BETWEEN ? AND ? AND status = 'Paid'
-        GROUP BY payment_method
-        """, (start_date, end_date))
-        
-        method_data = self.cursor.fetchall()
-        
-        for method, amount in method_data:
+        for method, amount in data["methods"]:
             card = QFrame()
             card.setObjectName("statCard")
             card.setFixedHeight(80)
@@ -1794,21 +5849,16 @@ class GymManagementSystem(QMainWindow):
         
         layout.addLayout(stats_layout)
         
+        # Summary cards are on screen; the charts follow
+        yield
+        
         # Monthly revenue trend (simplified)
         chart_label = QLabel("Monthly Revenue Trend")
         chart_label.setObjectName("chartLabel")
         layout.addWidget(chart_label)
         
-        # Get monthly totals
-        self.cursor.execute("""
-        SELECT strftime('%Y-%m', payment_date) AS month, SUM(amount)
-        FROM payments
-        WHERE payment_date BETWEEN ? AND ? AND status = 'Paid'
-        GROUP BY month
-        ORDER BY month
-        """, (start_date, end_date))
-        
-        monthly_data = self.cursor.fetchall()
+        # Monthly totals
+        monthly_data = data["monthly"]
         
         chart_frame = QFrame()
         chart_frame.setObjectName("chartFrame")
@@ -1840,20 +5890,31 @@ class GymManagementSystem(QMainWindow):
         
         layout.addWidget(chart_frame)
     
-    def generate_growth_report(self, layout, start_date, end_date):
+    def growth_report_data(self, cursor, start_date, end_date):
+        # One scan over members, rolled up into joins and expiries by month
+        joins = Counter()
+        expires = Counter()
+        for join_month, expiry_month, joined, expired in self.report_scan(cursor, "growth", start_date, end_date):
+            if joined:
+                joins[join_month] += joined
+            if expired:
+                expires[expiry_month] += expired
+        
+        return {
+            "new": sum(joins.values()),
+            "lost": sum(expires.values()),
+            "joins": sorted(joins.items()),
+            "expires": sorted(expires.items())
+        }
+    
+    def generate_growth_report(self, layout, start_date, end_date, data):
         # Title
         title = QLabel(f"Member Growth Report\n{start_date} to {end_date}")
         title.setObjectName("reportTitle")
         layout.addWidget(title)
         
         # New members
-        self.cursor.execute("""
-        SELECT COUNT(*) 
-        FROM members 
-        WHERE join_date BETWEEN ? AND ?
-        """, (start_date, end_date))
-        
-        new_members = self.cursor.fetchone()[0]
+        new_members = data["new"]
         
         stats_layout = QHBoxLayout()
         
@@ -1868,13 +5929,7 @@ class GymManagementSystem(QMainWindow):
         stats_layout.addWidget(new_card)
         
         # Lost members (expired)
-        self.cursor.execute("""
-        SELECT COUNT(*) 
-        FROM members 
-        WHERE status = 'Expired' AND expiry_date BETWEEN ? AND ?
-        """, (start_date, end_date))
-        
-        lost_members = self.cursor.fetchone()[0]
+        lost_members = data["lost"]
         
         lost_card = QFrame()
         lost_card.setObjectName("statCard")
@@ -1901,31 +5956,17 @@ class GymManagementSystem(QMainWindow):
         
         layout.addLayout(stats_layout)
         
+        # Summary cards are on screen; the charts follow
+        yield
+        
         # Monthly growth chart
         chart_label = QLabel("Monthly Member Growth")
         chart_label.setObjectName("chartLabel")
         layout.addWidget(chart_label)
         
-        # Get monthly joins and expires
-        self.cursor.execute("""
-        SELECT strftime('%Y-%m', join_date) AS month, COUNT(*)
-        FROM members
-        WHERE join_date BETWEEN ? AND ?
-        GROUP BY month
-        ORDER BY month
-        """, (start_date, end_date))
-        
-        join_data = self.cursor.fetchall()
-        
-        self.cursor.execute("""
-        SELECT strftime('%Y-%m', expiry_date) AS month, COUNT(*)
-        FROM members
-        WHERE status = 'Expired' AND expiry_date BETWEEN ? AND ?
-        GROUP BY month
-        ORDER BY month
-        """, (start_date, end_date))
-        
-        expire_data = self.cursor.fetchall()
+        # Monthly joins and expires
+        join_data = data["joins"]
+        expire_data = data["expires"]
         
         # Combine data
         months = sorted(set([m for m, _ in join_data] + [m for m, _ in expire_data]))
@@ -1983,6 +6024,7 @@ class GymManagementSystem(QMainWindow):
         # Add empty items
         self.membership_types_table.setItem(row, 0, QTableWidgetItem(""))
         self.membership_types_table.setItem(row, 1, QTableWidgetItem("1"))
+        self.membership_types_table.setItem(row, 2, QTableWidgetItem("0.00"))
         
         # Edit the new row
         self.membership_types_table.editItem(self.membership_types_table.item(row, 0))
@@ -2002,7 +6044,72 @@ class GymManagementSystem(QMainWindow):
             self.membership_types_table.removeRow(row)
     
     def save_settings(self):
-        # In a real application, you would save these settings to a config file or database
+        plans = []
+        
+        for row in range(self.membership_types_table.rowCount()):
+            name_item = self.membership_types_table.item(row, 0)
+            months_item = self.membership_types_table.item(row, 1)
+            price_item = self.membership_types_table.item(row, 2)
+            name = name_item.text().strip() if name_item else ""
+            months = months_item.text().strip() if months_item else ""
+            price = price_item.text().strip().lstrip("$") if price_item else ""
+            
+            if not name:
+                continue
+            
+            if not months.isdigit() or int(months) <= 0:
+                QMessageBox.warning(self, "Validation Error", f"Duration for '{name}' must be a positive number of months.")
+                return
+            
+            try:
+                price = float(price or 0)
+            except ValueError:
+                price = -1
+            
+            if price < 0:
+                QMessageBox.warning(self, "Validation Error", f"Price for '{name}' must be a non-negative amount.")
+                return
+            
+            plans.append((name, int(months), row, price))
+        
+        if not plans:
+            QMessageBox.warning(self, "Validation Error", "At least one membership type is required.")
+            return
+        
+        if len(set(plan[0] for plan in plans)) != len(plans):
+            QMessageBox.warning(self, "Validation Error", "Membership type names must be unique.")
+            return
+        
+        try:
+            with self.write_transaction():
+                self.cursor.execute("DELETE FROM membership_plans")
+                self.cursor.executemany(
+                    "INSERT INTO membership_plans (name, duration_months, sort_order, price) VALUES (?, ?, ?, ?)", plans
+                )
+                self.set_setting("gym_name", self.gym_name_input.text().strip())
+                self.set_setting("billing_lead_days", self.billing_lead_days.value())
+                self.set_setting("capacity_limit", self.capacity_input.value())
+                self.set_setting("auto_checkout_hours", self.auto_checkout_input.value())
+                self.set_setting("imputed_session_minutes", self.imputed_session_input.value())
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to save settings: {str(e)}")
+            return
+        
+        self.load_membership_plans()
+        self.capacity_limit = self.capacity_input.value()
+        self.auto_checkout_hours = self.auto_checkout_input.value()
+        self.imputed_session_minutes = self.imputed_session_input.value()
+        self.update_occupancy_card()
+        
+        # Refresh the plan pickers that were built from the old plan list
+        for combo, first_item in [(self.membership_filter, "All"), (self.renewal_plan_combo, "All Plans")]:
+            current = combo.currentText()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItems([first_item] + list(self.membership_plans))
+            combo.setCurrentText(current)
+            combo.blockSignals(False)
+        
         QMessageBox.information(self, "Settings Saved", "System settings have been saved successfully.")
     
     def update_clock(self):
@@ -2233,11 +6340,92 @@ class GymManagementSystem(QMainWindow):
         """
     
     def closeEvent(self, event):
+        # Polling and scheduled jobs all use the connection closed below
+        for timer in self.findChildren(QTimer):
+            timer.stop()
+        
+        # Reminders already handed to the mail server must be recorded, or
+        # they would go out again on the next run
+        if self.reminder_service.running():
+            self.reminder_service.thread.join()
+            self.record_reminder_outcomes()
+        if self.report_running:
+            self.report_cancel.set()
+            self.report_reader.interrupt()
+        self.report_thread.shutdown(wait=True)
+        self.close_report_connection()
+        if self.report_pool is not None:
+            self.report_pool.shutdown(wait=False, cancel_futures=True)
         self.conn.close()
         event.accept()
 
+def run_backup_command(args):
+    # Command-line backup tasks; restore expects the app to be closed
+    if args.list:
+        for set_path in list_backups():
+            print(set_path)
+        return 0
+    
+    if args.backup:
+        try:
+            set_path = create_backup(compress=not args.no_compress)
+            rotate_backups(keep=args.keep)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Backup failed: {e}", file=sys.stderr)
+            return 1
+        print(f"Created {set_path}")
+        return 0
+    
+    set_path = args.verify or args.restore
+    if set_path == "latest":
+        backups = list_backups()
+        if not backups:
+            print("No backups found", file=sys.stderr)
+            return 1
+        set_path = backups[-1]
+    
+    if args.verify:
+        try:
+            problems = verify_backup(set_path)
+        except (OSError, ValueError) as e:
+            problems = [str(e)]
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        print(f"{set_path}: {'FAILED' if problems else 'ok'}")
+        return 1 if problems else 0
+    
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        restore_backup(set_path, conn, HistoryArchive(conn))
+        
+        # Column snapshots would describe the replaced data
+        if np is not None:
+            AttendanceColumnStore(conn).reset()
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Restore failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    
+    print(f"Restored {set_path}")
+    return 0
+
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="FitPro Gym Management")
+    backup_group = parser.add_mutually_exclusive_group()
+    backup_group.add_argument("--backup", action="store_true", help="create a backup set and exit")
+    backup_group.add_argument("--list", action="store_true", help="list backup sets and exit")
+    backup_group.add_argument("--verify", metavar="SET", help="verify a backup set ('latest' for the newest) and exit")
+    backup_group.add_argument("--restore", metavar="SET", help="restore a backup set ('latest' for the newest) and exit")
+    parser.add_argument("--keep", type=int, default=DEFAULT_BACKUP_KEEP, help="backup sets kept by --backup")
+    parser.add_argument("--no-compress", action="store_true", help="store --backup copies uncompressed")
+    args, qt_args = parser.parse_known_args()
+    
+    if args.backup or args.list or args.verify or args.restore:
+        sys.exit(run_backup_command(args))
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Set application font
     font = QFont()